@@ -0,0 +1,26 @@
+"""Add transaction summary index
+
+Revision ID: 3f1c2b7d9a10
+Revises: 7a144cedd042
+Create Date: 2026-10-17 09:12:04.118203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c2b7d9a10'
+down_revision = '7a144cedd042'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('transaction', schema=None) as batch_op:
+        batch_op.create_index('ix_transaction_user_id_date_type', ['user_id', 'date', 'type'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('transaction', schema=None) as batch_op:
+        batch_op.drop_index('ix_transaction_user_id_date_type')
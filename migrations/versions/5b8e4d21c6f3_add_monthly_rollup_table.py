@@ -0,0 +1,71 @@
+"""Add monthly rollup table
+
+Revision ID: 5b8e4d21c6f3
+Revises: 3f1c2b7d9a10
+Create Date: 2026-10-17 10:03:41.562910
+
+"""
+from datetime import date
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b8e4d21c6f3'
+down_revision = '3f1c2b7d9a10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    monthly_rollup = op.create_table('monthly_rollup',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('month', sa.Date(), nullable=False),
+    sa.Column('type', sa.String(length=64), nullable=False),
+    sa.Column('budget_category_id', sa.Integer(), nullable=True),
+    sa.Column('account_id', sa.Integer(), nullable=True),
+    sa.Column('total_amount', sa.Float(), nullable=False),
+    sa.Column('transaction_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['account_id'], ['account.id'], ),
+    sa.ForeignKeyConstraint(['budget_category_id'], ['budget_category.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'month', 'type', 'budget_category_id', 'account_id', name='uq_monthly_rollup_key')
+    )
+
+    # Backfill from the existing transactions. Days are summed in SQL and folded
+    # into months here, since truncating a date to its month is dialect-specific.
+    days = op.get_bind().execute(sa.text(
+        """
+        SELECT user_id,
+               date,
+               type,
+               budget_category_id,
+               CASE WHEN type = 'Income' THEN account_to_id ELSE account_from_id END,
+               SUM(amount),
+               COUNT(id)
+        FROM "transaction"
+        GROUP BY 1, 2, 3, 4, 5
+        """
+    ))
+    totals = {}
+    for user_id, day, type, budget_category_id, account_id, amount, count in days:
+        if isinstance(day, str):
+            day = date.fromisoformat(day[:10])
+        key = (user_id, day.replace(day=1), type, budget_category_id, account_id)
+        total_amount, transaction_count = totals.get(key, (0, 0))
+        totals[key] = (total_amount + amount, transaction_count + count)
+    if totals:
+        op.bulk_insert(monthly_rollup, [
+            {
+                'user_id': user_id, 'month': month, 'type': type, 'budget_category_id': budget_category_id,
+                'account_id': account_id, 'total_amount': total_amount, 'transaction_count': transaction_count,
+            }
+            for (user_id, month, type, budget_category_id, account_id), (total_amount, transaction_count)
+            in totals.items()
+        ])
+
+def downgrade():
+    op.drop_table('monthly_rollup')
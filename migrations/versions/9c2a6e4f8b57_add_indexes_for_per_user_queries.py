@@ -0,0 +1,49 @@
+"""Add indexes for per-user and scheduler queries
+
+Revision ID: 9c2a6e4f8b57
+Revises: 5b8e4d21c6f3
+Create Date: 2026-10-17 11:20:37.804116
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c2a6e4f8b57'
+down_revision = '5b8e4d21c6f3'
+branch_labels = None
+depends_on = None
+
+# (table, index name, columns). Transactions by (user_id, date) use ix_transaction_user_id_date_type.
+INDEXES = [
+    ('account', 'ix_account_user_id', ['user_id']),
+    ('budget_category', 'ix_budget_category_user_id', ['user_id']),
+    ('budget_category', 'ix_budget_category_auto_reset_next_date', ['auto_reset', 'next_date']),
+    ('subscription', 'ix_subscription_user_id', ['user_id']),
+    ('subscription', 'ix_subscription_account_id', ['account_id']),
+    ('subscription', 'ix_subscription_auto_add_transaction_next_payment_date', ['auto_add_transaction', 'next_payment_date']),
+    ('transaction', 'ix_transaction_account_from_id', ['account_from_id']),
+    ('transaction', 'ix_transaction_account_to_id', ['account_to_id']),
+    ('transaction', 'ix_transaction_budget_category_id', ['budget_category_id']),
+    ('transaction', 'ix_transaction_subscription_id', ['subscription_id']),
+    ('loan', 'ix_loan_user_id', ['user_id']),
+    ('debt', 'ix_debt_user_id', ['user_id']),
+    ('credit_card', 'ix_credit_card_user_id', ['user_id']),
+    ('credit_card_payment', 'ix_credit_card_payment_user_id', ['user_id']),
+    ('loan_payment', 'ix_loan_payment_user_id', ['user_id']),
+    ('debt_payment', 'ix_debt_payment_user_id', ['user_id']),
+    ('notification', 'ix_notification_user_id', ['user_id']),
+]
+
+
+def upgrade():
+    for table, name, columns in INDEXES:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.create_index(name, columns, unique=False)
+
+
+def downgrade():
+    for table, name, columns in reversed(INDEXES):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_index(name)
@@ -0,0 +1,26 @@
+"""Add user data version
+
+Revision ID: a8d4e2f9c361
+Revises: f3b7d1c8e290
+Create Date: 2026-10-17 17:21:09.483152
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a8d4e2f9c361'
+down_revision = 'f3b7d1c8e290'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('data_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('data_version')
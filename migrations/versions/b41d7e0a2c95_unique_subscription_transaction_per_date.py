@@ -0,0 +1,61 @@
+"""Unique automatic transaction per subscription and date
+
+Revision ID: b41d7e0a2c95
+Revises: 9c2a6e4f8b57
+Create Date: 2026-10-17 12:41:58.290334
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b41d7e0a2c95'
+down_revision = '9c2a6e4f8b57'
+branch_labels = None
+depends_on = None
+
+transaction = sa.table(
+    'transaction',
+    sa.column('id', sa.Integer),
+    sa.column('subscription_id', sa.Integer),
+    sa.column('date', sa.Date),
+    sa.column('description', sa.String),
+    sa.column('auto_posted', sa.Boolean),
+)
+
+
+def upgrade():
+    with op.batch_alter_table('transaction', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('auto_posted', sa.Boolean(), server_default=sa.false(), nullable=False))
+
+    # Rows the scheduler posted so far, recognised by the description it writes
+    op.execute(
+        transaction.update()
+        .where(transaction.c.subscription_id.isnot(None), transaction.c.description.like('Automatic payment for %'))
+        .values(auto_posted=True)
+    )
+    # Overlapping runs could post the same payment twice. Keep the first one as
+    # the automatic payment and leave the others as ordinary transactions, so
+    # balances still match the ledger and the user can delete the extras.
+    first = (
+        sa.select(sa.func.min(transaction.c.id))
+        .where(transaction.c.auto_posted == True)
+        .group_by(transaction.c.subscription_id, transaction.c.date)
+    )
+    op.execute(
+        transaction.update()
+        .where(transaction.c.auto_posted == True, transaction.c.id.notin_(first))
+        .values(auto_posted=False)
+    )
+
+    op.create_index(
+        'uq_transaction_subscription_id_date_auto_posted', 'transaction', ['subscription_id', 'date'], unique=True,
+        sqlite_where=sa.text('auto_posted'), postgresql_where=sa.text('auto_posted'),
+    )
+
+
+def downgrade():
+    op.drop_index('uq_transaction_subscription_id_date_auto_posted', table_name='transaction')
+    with op.batch_alter_table('transaction', schema=None) as batch_op:
+        batch_op.drop_column('auto_posted')
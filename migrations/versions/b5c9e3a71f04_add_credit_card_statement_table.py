@@ -0,0 +1,43 @@
+"""Add credit card statement table
+
+Revision ID: b5c9e3a71f04
+Revises: a8d4e2f9c361
+Create Date: 2026-10-17 19:44:12.630915
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5c9e3a71f04'
+down_revision = 'a8d4e2f9c361'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('credit_card_statement',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('credit_card_id', sa.Integer(), nullable=False),
+    sa.Column('closing_date', sa.Date(), nullable=False),
+    sa.Column('interest', sa.BigInteger(), nullable=False),
+    sa.Column('statement_balance', sa.BigInteger(), nullable=False),
+    sa.Column('minimum_payment', sa.BigInteger(), nullable=False),
+    sa.Column('payment_due_date', sa.Date(), nullable=True),
+    sa.Column('created_on', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['credit_card_id'], ['credit_card.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('credit_card_id', 'closing_date', name='uq_credit_card_statement_credit_card_id_closing_date')
+    )
+    with op.batch_alter_table('credit_card_statement', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_credit_card_statement_user_id'), ['user_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('credit_card_statement', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_credit_card_statement_user_id'))
+
+    op.drop_table('credit_card_statement')
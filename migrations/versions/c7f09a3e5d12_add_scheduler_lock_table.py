@@ -0,0 +1,29 @@
+"""Add scheduler lock table
+
+Revision ID: c7f09a3e5d12
+Revises: b41d7e0a2c95
+Create Date: 2026-10-17 13:55:12.640871
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7f09a3e5d12'
+down_revision = 'b41d7e0a2c95'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('scheduler_lock',
+    sa.Column('name', sa.String(length=64), nullable=False),
+    sa.Column('holder', sa.String(length=128), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('scheduler_lock')
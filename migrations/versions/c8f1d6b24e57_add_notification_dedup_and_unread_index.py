@@ -0,0 +1,37 @@
+"""Add notification dedup key and unread index
+
+Revision ID: c8f1d6b24e57
+Revises: b5c9e3a71f04
+Create Date: 2026-10-17 21:05:37.118406
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c8f1d6b24e57'
+down_revision = 'b5c9e3a71f04'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('notification', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('kind', sa.String(length=32), nullable=True))
+        batch_op.add_column(sa.Column('dedup_key', sa.String(length=128), nullable=True))
+        batch_op.create_unique_constraint('uq_notification_user_id_dedup_key', ['user_id', 'dedup_key'])
+        # The new indexes lead with user_id, so they replace the single-column one
+        batch_op.drop_index('ix_notification_user_id')
+        batch_op.create_index('ix_notification_user_id_read_created_on', ['user_id', 'read', 'created_on'], unique=False)
+        batch_op.create_index('ix_notification_user_id_created_on', ['user_id', 'created_on'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('notification', schema=None) as batch_op:
+        batch_op.drop_index('ix_notification_user_id_created_on')
+        batch_op.drop_index('ix_notification_user_id_read_created_on')
+        batch_op.create_index('ix_notification_user_id', ['user_id'], unique=False)
+        batch_op.drop_constraint('uq_notification_user_id_dedup_key', type_='unique')
+        batch_op.drop_column('dedup_key')
+        batch_op.drop_column('kind')
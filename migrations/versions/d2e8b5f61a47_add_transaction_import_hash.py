@@ -0,0 +1,28 @@
+"""Add transaction import hash
+
+Revision ID: d2e8b5f61a47
+Revises: c7f09a3e5d12
+Create Date: 2026-10-17 15:02:26.913457
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2e8b5f61a47'
+down_revision = 'c7f09a3e5d12'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('transaction', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('import_hash', sa.String(length=64), nullable=True))
+        batch_op.create_unique_constraint('uq_transaction_user_id_import_hash', ['user_id', 'import_hash'])
+
+
+def downgrade():
+    with op.batch_alter_table('transaction', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_transaction_user_id_import_hash', type_='unique')
+        batch_op.drop_column('import_hash')
@@ -0,0 +1,70 @@
+"""Key monthly rollups on coalesced ids
+
+Revision ID: d9e4a7c25b13
+Revises: c8f1d6b24e57
+Create Date: 2026-10-18 09:14:27.503186
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd9e4a7c25b13'
+down_revision = 'c8f1d6b24e57'
+branch_labels = None
+depends_on = None
+
+monthly_rollup = sa.table(
+    'monthly_rollup',
+    sa.column('id', sa.Integer),
+    sa.column('user_id', sa.Integer),
+    sa.column('month', sa.Date),
+    sa.column('type', sa.String),
+    sa.column('budget_category_id', sa.Integer),
+    sa.column('account_id', sa.Integer),
+    sa.column('total_amount', sa.BigInteger),
+    sa.column('transaction_count', sa.Integer),
+)
+
+KEY = [
+    'user_id', 'month', 'type',
+    sa.text('coalesce(budget_category_id, 0)'), sa.text('coalesce(account_id, 0)'),
+]
+
+
+def upgrade():
+    with op.batch_alter_table('monthly_rollup', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_monthly_rollup_key', type_='unique')
+
+    # The old constraint let buckets with a NULL id be inserted twice. Fold
+    # such duplicates into the lowest id, and drop buckets that sum to nothing.
+    connection = op.get_bind()
+    buckets = {}
+    for row in connection.execute(sa.select(monthly_rollup).order_by(monthly_rollup.c.id)):
+        key = (row.user_id, row.month, row.type, row.budget_category_id or 0, row.account_id or 0)
+        buckets.setdefault(key, []).append(row)
+    for rows in buckets.values():
+        total_amount = sum(row.total_amount for row in rows)
+        transaction_count = sum(row.transaction_count for row in rows)
+        extra = [row.id for row in rows[1:]]
+        if transaction_count == 0:
+            extra.append(rows[0].id)
+        elif extra:
+            connection.execute(
+                monthly_rollup.update()
+                .where(monthly_rollup.c.id == rows[0].id)
+                .values(total_amount=total_amount, transaction_count=transaction_count)
+            )
+        if extra:
+            connection.execute(monthly_rollup.delete().where(monthly_rollup.c.id.in_(extra)))
+
+    op.create_index('uq_monthly_rollup_key', 'monthly_rollup', KEY, unique=True)
+
+
+def downgrade():
+    op.drop_index('uq_monthly_rollup_key', table_name='monthly_rollup')
+    with op.batch_alter_table('monthly_rollup', schema=None) as batch_op:
+        batch_op.create_unique_constraint(
+            'uq_monthly_rollup_key', ['user_id', 'month', 'type', 'budget_category_id', 'account_id']
+        )
@@ -0,0 +1,56 @@
+"""Store money as integer minor units
+
+Revision ID: e6a3c9d47b18
+Revises: d2e8b5f61a47
+Create Date: 2026-10-17 16:28:50.377102
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6a3c9d47b18'
+down_revision = 'd2e8b5f61a47'
+branch_labels = None
+depends_on = None
+
+# Minor units per major unit, website.money.MONEY_SCALE at the time of writing
+SCALE = 100
+
+MONEY_COLUMNS = {
+    'subscription': [('amount', False)],
+    'account': [('starting_balance', False), ('current_balance', True), ('goal_amount', True)],
+    'budget_category': [('budget_amount', False), ('remaining_amount', False)],
+    'transaction': [('amount', False)],
+    'monthly_rollup': [('total_amount', False)],
+    'loan': [('amount', False)],
+    'debt': [('amount', False)],
+    'credit_card': [('limit', True), ('current_balance', True)],
+    'credit_card_payment': [('amount', False)],
+    'loan_payment': [('amount', False)],
+    'debt_payment': [('amount', False)],
+}
+
+
+def upgrade():
+    for table, columns in MONEY_COLUMNS.items():
+        assignments = ', '.join(
+            f'"{column}" = CAST(ROUND("{column}" * {SCALE}) AS BIGINT)' for column, _ in columns
+        )
+        op.execute(f'UPDATE "{table}" SET {assignments}')
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            for column, nullable in columns:
+                batch_op.alter_column(
+                    column, existing_type=sa.Float(), type_=sa.BigInteger(), existing_nullable=nullable,
+                    postgresql_using=f'"{column}"::bigint',  # Already rounded above
+                )
+
+
+def downgrade():
+    for table, columns in MONEY_COLUMNS.items():
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            for column, nullable in columns:
+                batch_op.alter_column(column, existing_type=sa.BigInteger(), type_=sa.Float(), existing_nullable=nullable)
+        assignments = ', '.join(f'"{column}" = "{column}" / {SCALE}.0' for column, _ in columns)
+        op.execute(f'UPDATE "{table}" SET {assignments}')
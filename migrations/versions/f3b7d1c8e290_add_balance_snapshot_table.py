@@ -0,0 +1,40 @@
+"""Add balance snapshot table
+
+Revision ID: f3b7d1c8e290
+Revises: e6a3c9d47b18
+Create Date: 2026-10-17 16:02:41.218530
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3b7d1c8e290'
+down_revision = 'e6a3c9d47b18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('balance_snapshot',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('account_id', sa.Integer(), nullable=False),
+    sa.Column('last_transaction_id', sa.Integer(), nullable=False),
+    sa.Column('balance', sa.BigInteger(), nullable=False),
+    sa.Column('created_on', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['account_id'], ['account.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('account_id', 'last_transaction_id', name='uq_balance_snapshot_account_id_last_transaction_id')
+    )
+    with op.batch_alter_table('balance_snapshot', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_balance_snapshot_user_id'), ['user_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('balance_snapshot', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_balance_snapshot_user_id'))
+
+    op.drop_table('balance_snapshot')
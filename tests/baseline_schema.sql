@@ -0,0 +1,176 @@
+-- Schema of the app before the first tracked migration (revision 7a144cedd042),
+-- as db.create_all() made it on SQLite, with "user" quoted so it also loads on PostgreSQL.
+
+CREATE TABLE "user" (
+	id INTEGER NOT NULL, 
+	name_prefix VARCHAR(10), 
+	first_name VARCHAR(64) NOT NULL, 
+	last_name VARCHAR(64) NOT NULL, 
+	email VARCHAR(120) NOT NULL, 
+	password_hash VARCHAR(128) NOT NULL, 
+	time_zone VARCHAR(64) NOT NULL, 
+	date_created DATETIME DEFAULT CURRENT_TIMESTAMP, 
+	currency VARCHAR(8) NOT NULL, 
+	PRIMARY KEY (id)
+);
+
+CREATE UNIQUE INDEX ix_user_email ON "user" (email);
+
+CREATE TABLE account (
+	id INTEGER NOT NULL, 
+	user_id INTEGER, 
+	name VARCHAR(128) NOT NULL, 
+	type VARCHAR(64), 
+	starting_balance FLOAT NOT NULL, 
+	current_balance FLOAT, 
+	goal_amount FLOAT, 
+	currency VARCHAR(8) NOT NULL, 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(user_id) REFERENCES "user" (id)
+);
+
+CREATE TABLE budget_category (
+	id INTEGER NOT NULL, 
+	user_id INTEGER, 
+	name VARCHAR(128) NOT NULL, 
+	description VARCHAR(256), 
+	budget_amount FLOAT NOT NULL, 
+	remaining_amount FLOAT NOT NULL, 
+	auto_reset BOOLEAN, 
+	time_period VARCHAR(32) NOT NULL, 
+	next_date DATE NOT NULL, 
+	last_reset DATE NOT NULL, 
+	currency VARCHAR(8) NOT NULL, 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(user_id) REFERENCES "user" (id)
+);
+
+CREATE TABLE loan (
+	id INTEGER NOT NULL, 
+	user_id INTEGER, 
+	counterparty_name VARCHAR(128), 
+	amount FLOAT NOT NULL, 
+	interest_rate FLOAT, 
+	start_date DATE, 
+	end_date DATE, 
+	type VARCHAR(64), 
+	currency VARCHAR(8) NOT NULL, 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(user_id) REFERENCES "user" (id)
+);
+
+CREATE TABLE debt (
+	id INTEGER NOT NULL, 
+	user_id INTEGER, 
+	type VARCHAR(128), 
+	amount FLOAT NOT NULL, 
+	interest_rate FLOAT NOT NULL, 
+	start_date DATE, 
+	end_date DATE, 
+	currency VARCHAR(8) NOT NULL, 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(user_id) REFERENCES "user" (id)
+);
+
+CREATE TABLE credit_card (
+	id INTEGER NOT NULL, 
+	user_id INTEGER, 
+	name VARCHAR(128), 
+	"limit" FLOAT, 
+	current_balance FLOAT, 
+	interest_rate FLOAT, 
+	statement_due_date DATE, 
+	minimum_payment_due_date DATE, 
+	billing_cycle_days INTEGER, 
+	currency VARCHAR(8) NOT NULL, 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(user_id) REFERENCES "user" (id)
+);
+
+CREATE TABLE notification (
+	id INTEGER NOT NULL, 
+	user_id INTEGER, 
+	message VARCHAR(256), 
+	created_on DATETIME, 
+	read BOOLEAN, 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(user_id) REFERENCES "user" (id)
+);
+
+CREATE TABLE subscription (
+	id INTEGER NOT NULL, 
+	user_id INTEGER, 
+	name VARCHAR(128) NOT NULL, 
+	amount FLOAT NOT NULL, 
+	frequency VARCHAR(32) NOT NULL, 
+	auto_add_transaction BOOLEAN NOT NULL, 
+	account_id INTEGER, 
+	last_payment_date DATE, 
+	next_payment_date DATE NOT NULL, 
+	currency VARCHAR(8) NOT NULL, 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(user_id) REFERENCES "user" (id), 
+	FOREIGN KEY(account_id) REFERENCES account (id)
+);
+
+CREATE TABLE "transaction" (
+	id INTEGER NOT NULL, 
+	user_id INTEGER, 
+	account_from_id INTEGER, 
+	account_to_id INTEGER, 
+	type VARCHAR(64) NOT NULL, 
+	amount FLOAT NOT NULL, 
+	description VARCHAR(256), 
+	date DATE NOT NULL, 
+	created_on DATETIME, 
+	budget_category_id INTEGER, 
+	subscription_id INTEGER, 
+	currency VARCHAR(8) NOT NULL, 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(user_id) REFERENCES "user" (id), 
+	FOREIGN KEY(account_from_id) REFERENCES account (id), 
+	FOREIGN KEY(account_to_id) REFERENCES account (id), 
+	FOREIGN KEY(budget_category_id) REFERENCES budget_category (id), 
+	FOREIGN KEY(subscription_id) REFERENCES subscription (id)
+);
+
+CREATE TABLE credit_card_payment (
+	id INTEGER NOT NULL, 
+	user_id INTEGER, 
+	account_id INTEGER NOT NULL, 
+	credit_card_id INTEGER NOT NULL, 
+	transaction_id INTEGER NOT NULL, 
+	amount FLOAT NOT NULL, 
+	date DATE, 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(user_id) REFERENCES "user" (id), 
+	FOREIGN KEY(account_id) REFERENCES account (id), 
+	FOREIGN KEY(credit_card_id) REFERENCES credit_card (id), 
+	FOREIGN KEY(transaction_id) REFERENCES "transaction" (id)
+);
+
+CREATE TABLE loan_payment (
+	id INTEGER NOT NULL, 
+	user_id INTEGER, 
+	loan_id INTEGER NOT NULL, 
+	transaction_id INTEGER NOT NULL, 
+	amount FLOAT NOT NULL, 
+	date DATE, 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(user_id) REFERENCES "user" (id), 
+	FOREIGN KEY(loan_id) REFERENCES loan (id), 
+	FOREIGN KEY(transaction_id) REFERENCES "transaction" (id)
+);
+
+CREATE TABLE debt_payment (
+	id INTEGER NOT NULL, 
+	user_id INTEGER, 
+	debt_id INTEGER NOT NULL, 
+	transaction_id INTEGER NOT NULL, 
+	amount FLOAT NOT NULL, 
+	date DATE, 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(user_id) REFERENCES "user" (id), 
+	FOREIGN KEY(debt_id) REFERENCES debt (id), 
+	FOREIGN KEY(transaction_id) REFERENCES "transaction" (id)
+);
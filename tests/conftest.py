@@ -0,0 +1,38 @@
+"""
+Shared fixtures: a fresh app on an in-memory SQLite database, and a logged-in client.
+"""
+import pytest
+
+from website import create_app, db
+from website.models import User, Account, BudgetCategory
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setenv('SCHEDULER_ENABLED', '0')
+    monkeypatch.setenv('DATABASE_URL', 'sqlite://')
+    app = create_app()
+    app.config['TESTING'] = True
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+@pytest.fixture
+def client(app):
+    """A client logged in as a user with a checking account of 100 and a Food budget of 50."""
+    client = app.test_client()
+    client.post('/register', data={
+        'first-name': 'Test', 'last-name': 'User', 'email': 'test@example.com',
+        'password': 'password1', 'confirmpass': 'password1', 'timezone': 'UTC',
+    })
+    client.post('/login', data={'email': 'test@example.com', 'password': 'password1'})
+    client.post('/add-account', data={'account-name': 'Checking', 'account-type': 'Checking', 'starting-balance': '100'})
+    client.post('/add-budget-category', data={
+        'budget-name': 'Food', 'amount': '50', 'auto-reset': 'on', 'frequency': 'Monthly', 'next-reset-date': '2026-11-01',
+    })
+    with app.app_context():
+        user = db.session.execute(db.select(User)).scalar_one()
+        app.config['TEST_USER_ID'] = user.id
+        app.config['TEST_ACCOUNT_ID'] = db.session.execute(db.select(Account.id)).scalar_one()
+        app.config['TEST_BUDGET_ID'] = db.session.execute(db.select(BudgetCategory.id)).scalar_one()
+    return client
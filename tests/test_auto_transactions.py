@@ -0,0 +1,73 @@
+"""
+Automatic subscription payments are posted once per due date, however often the job runs.
+"""
+from datetime import datetime, timezone
+
+from website import db
+from website.models import Account, Subscription, Transaction, MonthlyRollup
+from website.recurrence import next_date
+from website.utils import add_auto_transactions
+
+def add_subscription(app, anchor):
+    with app.app_context():
+        subscription = Subscription(
+            user_id=app.config['TEST_USER_ID'], name='Gym', amount=10, frequency='Monthly',
+            auto_add_transaction=True, account_id=app.config['TEST_ACCOUNT_ID'], next_payment_date=anchor,
+        )
+        db.session.add(subscription)
+        db.session.commit()
+        return subscription.id
+
+def posted(app):
+    with app.app_context():
+        dates = db.session.execute(
+            db.select(Transaction.date).where(Transaction.auto_posted).order_by(Transaction.date)
+        ).scalars().all()
+        balance = db.session.get(Account, app.config['TEST_ACCOUNT_ID']).current_balance
+        rollup = db.session.execute(
+            db.select(db.func.sum(MonthlyRollup.total_amount), db.func.sum(MonthlyRollup.transaction_count))
+        ).one()
+        return dates, balance, tuple(rollup)
+
+def test_overdue_payments_are_caught_up_once(app, client):
+    today = datetime.now(timezone.utc).date()
+    anchor = next_date(today, 'Monthly', -2)
+    subscription_id = add_subscription(app, anchor)
+
+    add_auto_transactions(app)
+    add_auto_transactions(app)
+
+    due = [anchor, next_date(anchor, 'Monthly', 1), next_date(anchor, 'Monthly', 2)]
+    assert posted(app) == (due, 70.0, (30.0, 3))
+    with app.app_context():
+        subscription = db.session.get(Subscription, subscription_id)
+        assert subscription.last_payment_date == due[-1]
+        assert subscription.next_payment_date == next_date(anchor, 'Monthly', 3)
+
+def test_overlapping_runs_do_not_post_twice(app, client):
+    today = datetime.now(timezone.utc).date()
+    anchor = next_date(today, 'Monthly', -1)
+    subscription_id = add_subscription(app, anchor)
+    add_auto_transactions(app)
+
+    # A second run that read the subscription before the first one committed
+    with app.app_context():
+        db.session.get(Subscription, subscription_id).next_payment_date = anchor
+        db.session.commit()
+    add_auto_transactions(app)
+
+    assert posted(app) == ([anchor, next_date(anchor, 'Monthly', 1)], 80.0, (20.0, 2))
+
+def test_manual_entries_are_not_limited(app, client):
+    today = datetime.now(timezone.utc).date()
+    subscription_id = add_subscription(app, today)
+    client.post('/add-transaction', data={
+        'transaction-type': 'Expense', 'amount': '10', 'date': today.isoformat(),
+        'account_from_id': app.config['TEST_ACCOUNT_ID'], 'subscription_id': subscription_id,
+    })
+    add_auto_transactions(app)
+
+    with app.app_context():
+        rows = db.session.execute(db.select(Transaction.auto_posted).order_by(Transaction.id)).scalars().all()
+        assert rows == [False, True]
+        assert db.session.get(Account, app.config['TEST_ACCOUNT_ID']).current_balance == 80.0
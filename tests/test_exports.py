@@ -0,0 +1,41 @@
+"""
+Exports stream the user's rows in chunks, as CSV or JSON, optionally gzipped.
+"""
+import csv
+import gzip
+import io
+import json
+
+from website import exports
+from website.exports import generate_export
+
+def add_income(client, app, amount, day):
+    client.post('/add-transaction', data={
+        'transaction-type': 'Income', 'amount': amount, 'date': day, 'account_to_id': app.config['TEST_ACCOUNT_ID'],
+    })
+
+def test_csv_export_is_written_in_chunks(app, client, monkeypatch):
+    for day in range(1, 6):
+        add_income(client, app, str(day), f'2026-10-0{day}')
+    monkeypatch.setattr(exports, 'EXPORT_FETCH_SIZE', 2)
+
+    with app.app_context():
+        chunks = list(generate_export('transactions', app.config['TEST_USER_ID'], 'csv'))
+
+    assert len(chunks) == 3
+    rows = list(csv.DictReader(io.StringIO(''.join(chunks))))
+    assert [(row['date'], row['amount']) for row in rows] == [(f'2026-10-0{day}', f'{day}.0') for day in range(1, 6)]
+
+def test_export_view_filters_and_compresses(app, client):
+    add_income(client, app, '12.5', '2026-10-01')
+    add_income(client, app, '7', '2026-11-01')
+
+    response = client.get('/export/transactions?format=json&compress=gzip&start_date=2026-11-01')
+
+    assert response.headers['Content-Disposition'] == 'attachment; filename="transactions.json.gz"'
+    [row] = json.loads(gzip.decompress(response.data))
+    assert (row['date'], row['type'], row['amount']) == ('2026-11-01', 'Income', 7.0)
+
+def test_unknown_exports_are_not_found(app, client):
+    assert client.get('/export/users').status_code == 404
+    assert client.get('/export/accounts?format=xml').status_code == 404
@@ -0,0 +1,95 @@
+"""
+CSV and OFX statements are imported in batches, and re-importing them adds nothing.
+"""
+import io
+from datetime import date
+
+from website import db
+from website.imports import import_transactions, parse_ofx
+from website.models import User, Account, BudgetCategory, Transaction, MonthlyRollup
+from website.rollups import rebuild_monthly_rollups
+
+CSV = b"""\xef\xbb\xbfDate,Amount,Description,Category
+2026-10-01,-12.50,Coffee,food
+2026-10-01,-12.50,Coffee,food
+10/02/2026,"1,000.00",Salary,
+2026-10-03,nan,Broken,
+2026-13-01,-5,Bad date,
+2026-10-04,-7,Unknown,Travel
+"""
+
+OFX = b"""OFXHEADER:100
+<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST><STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20261005120000<TRNAMT>-20.00<FITID>A1<NAME>Grocer</STMTTRN><STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20261006<TRNAMT>-20.00<FITID>A2<MEMO>Grocer</STMTTRN>
+<STMTTRN>
+<TRNTYPE>CREDIT
+<DTPOSTED>20261007
+<TRNAMT>5.25
+<FITID>A3
+</STMTTRN>
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>
+"""
+
+def run(app, data, file_format, **kwargs):
+    with app.app_context():
+        user = db.session.get(User, app.config['TEST_USER_ID'])
+        return import_transactions(user, io.BytesIO(data), file_format,
+                                   default_account_id=app.config['TEST_ACCOUNT_ID'], **kwargs)
+
+def balances(app):
+    with app.app_context():
+        return (
+            db.session.get(Account, app.config['TEST_ACCOUNT_ID']).current_balance,
+            db.session.get(BudgetCategory, app.config['TEST_BUDGET_ID']).remaining_amount,
+        )
+
+def test_csv_import_reports_bad_rows_and_posts_the_rest(app, client):
+    result = run(app, CSV, 'csv', batch_size=2)
+
+    assert (result['processed'], result['inserted'], result['duplicates'], result['error_count']) == (6, 3, 0, 3)
+    assert result['errors'] == [
+        (5, "Invalid amount 'nan'."), (6, "Invalid date '2026-13-01'."), (7, "Unknown category 'Travel'."),
+    ]
+    assert balances(app) == (1075.0, 25.0)
+    with app.app_context():
+        rows = db.session.execute(
+            db.select(Transaction.date, Transaction.type, Transaction.amount).order_by(Transaction.id)
+        ).all()
+        assert rows == [
+            (date(2026, 10, 1), 'Expense', 12.5), (date(2026, 10, 1), 'Expense', 12.5), (date(2026, 10, 2), 'Income', 1000.0),
+        ]
+
+def test_reimporting_skips_every_row(app, client):
+    run(app, CSV, 'csv')
+    with app.app_context():
+        rollups = db.session.execute(db.select(MonthlyRollup.total_amount, MonthlyRollup.transaction_count)).all()
+
+    result = run(app, CSV, 'csv', batch_size=1)
+
+    assert (result['inserted'], result['duplicates']) == (0, 3)
+    assert balances(app) == (1075.0, 25.0)
+    with app.app_context():
+        assert db.session.execute(db.select(db.func.count(Transaction.id))).scalar() == 3
+        rebuild_monthly_rollups(app.config['TEST_USER_ID'])
+        assert db.session.execute(db.select(MonthlyRollup.total_amount, MonthlyRollup.transaction_count)).all() == rollups
+
+def test_ofx_blocks_on_one_line_are_parsed():
+    rows = [row for _, row in parse_ofx(io.BytesIO(OFX))]
+
+    assert rows == [
+        {'date': '2026-10-05', 'amount': '-20.00', 'description': 'Grocer', 'fitid': 'A1'},
+        {'date': '2026-10-06', 'amount': '-20.00', 'description': 'Grocer', 'fitid': 'A2'},
+        {'date': '2026-10-07', 'amount': '5.25', 'description': '', 'fitid': 'A3'},
+    ]
+
+def test_ofx_import_dedups_on_the_transaction_id(app, client):
+    assert run(app, OFX, 'ofx')['inserted'] == 3
+    assert run(app, OFX, 'ofx')['duplicates'] == 3
+    assert balances(app) == (65.25, 50.0)
+
+def test_import_view_flashes_the_summary(app, client):
+    response = client.post('/import-transactions', data={
+        'file': (io.BytesIO(OFX), 'statement.ofx'), 'account_id': str(app.config['TEST_ACCOUNT_ID']), 'format': 'ofx',
+    }, follow_redirects=True)
+
+    assert response.status_code == 200
+    assert b'Imported 3 of 3 rows (0 duplicates skipped, 0 errors).' in response.data
@@ -0,0 +1,106 @@
+"""
+Adding, updating and deleting transactions keeps balances and rollups in step.
+"""
+from datetime import date
+
+from website import db
+from website.models import Account, BudgetCategory, Transaction, MonthlyRollup
+from website.rollups import rebuild_monthly_rollups
+
+def balances(app):
+    """The (account balance, budget remaining) of the test user."""
+    with app.app_context():
+        account = db.session.get(Account, app.config['TEST_ACCOUNT_ID'])
+        budget = db.session.get(BudgetCategory, app.config['TEST_BUDGET_ID'])
+        return account.current_balance, budget.remaining_amount
+
+def rollups(app):
+    with app.app_context():
+        return sorted(db.session.execute(db.select(
+            MonthlyRollup.month, MonthlyRollup.type, MonthlyRollup.budget_category_id, MonthlyRollup.account_id,
+            MonthlyRollup.total_amount, MonthlyRollup.transaction_count,
+        )).all(), key=repr)
+
+def transaction_count(app):
+    with app.app_context():
+        return db.session.execute(db.select(db.func.count(Transaction.id))).scalar()
+
+def assert_rollups_match_a_rebuild(app):
+    incremental = rollups(app)
+    with app.app_context():
+        rebuild_monthly_rollups(app.config['TEST_USER_ID'])
+    assert rollups(app) == incremental
+
+def add_expense(client, app, amount, day='2026-10-01'):
+    return client.post('/add-transaction', data={
+        'transaction-type': 'Expense', 'amount': amount, 'date': day,
+        'account_from_id': app.config['TEST_ACCOUNT_ID'], 'budget_category_id': app.config['TEST_BUDGET_ID'],
+    })
+
+def test_add_update_and_delete_move_balances(app, client):
+    account_id = app.config['TEST_ACCOUNT_ID']
+    add_expense(client, app, '10.05')
+    assert balances(app) == (89.95, 39.95)
+    assert rollups(app) == [(date(2026, 10, 1), 'Expense', app.config['TEST_BUDGET_ID'], account_id, 10.05, 1)]
+
+    # The update reverts the expense, then posts the income in another month
+    client.post('/update-transaction/1', data={
+        'type': 'Income', 'amount': '30', 'date': '2026-11-02', 'account_to_id': account_id, 'description': 'Refund',
+    })
+    assert balances(app) == (130.0, 50.0)
+    assert rollups(app) == [(date(2026, 11, 1), 'Income', None, account_id, 30.0, 1)]
+
+    add_expense(client, app, '5', day='2026-11-03')
+    assert_rollups_match_a_rebuild(app)
+
+    client.post('/delete-transaction/1')
+    assert balances(app) == (95.0, 45.0)
+    assert transaction_count(app) == 1
+    assert rollups(app) == [(date(2026, 11, 1), 'Expense', app.config['TEST_BUDGET_ID'], account_id, 5.0, 1)]
+
+def test_transfers_move_money_between_accounts(app, client):
+    client.post('/add-account', data={'account-name': 'Savings', 'account-type': 'Savings', 'starting-balance': '0'})
+    client.post('/add-transaction', data={
+        'transaction-type': 'Transfer', 'amount': '40', 'date': '2026-10-05',
+        'account_from_id': app.config['TEST_ACCOUNT_ID'], 'account_to_id': 2,
+    })
+    with app.app_context():
+        assert db.session.execute(db.select(Account.current_balance).order_by(Account.id)).scalars().all() == [60.0, 40.0]
+    assert_rollups_match_a_rebuild(app)
+
+def test_non_finite_amounts_are_rejected_by_the_form(app, client):
+    for amount in ('nan', 'inf', '-Infinity'):
+        response = add_expense(client, app, amount)
+        assert response.status_code == 200
+        assert b'Amount must be a valid number.' in response.data
+    assert transaction_count(app) == 0
+    assert balances(app) == (100.0, 50.0)
+
+def test_update_with_missing_fields_keeps_the_transaction(app, client):
+    add_expense(client, app, '10')
+    for form in (
+        {'type': 'Expense', 'amount': '20', 'date': '', 'account_from_id': app.config['TEST_ACCOUNT_ID']},
+        {'type': 'Expense', 'amount': '20', 'date': 'soon', 'account_from_id': app.config['TEST_ACCOUNT_ID']},
+        {'type': 'Gift', 'amount': '20', 'date': '2026-10-02', 'account_from_id': app.config['TEST_ACCOUNT_ID']},
+        {'type': 'Expense', 'amount': 'nan', 'date': '2026-10-02', 'account_from_id': app.config['TEST_ACCOUNT_ID']},
+    ):
+        response = client.post('/update-transaction/1', data=form)
+        assert response.status_code == 302
+        assert response.headers['Location'].endswith('/update-transaction/1')
+
+    with app.app_context():
+        transaction = db.session.get(Transaction, 1)
+        assert (transaction.type, transaction.amount, transaction.date) == ('Expense', 10.0, date(2026, 10, 1))
+    assert balances(app) == (90.0, 40.0)
+
+def test_failed_update_rolls_back_every_change(app, client):
+    add_expense(client, app, '10')
+    response = client.post('/update-transaction/1', data={
+        'type': 'Expense', 'amount': '20', 'date': '2026-10-02', 'account_from_id': 999,
+    })
+    assert response.status_code == 302
+
+    with app.app_context():
+        assert db.session.get(Transaction, 1).amount == 10.0
+    assert balances(app) == (90.0, 40.0)
+    assert_rollups_match_a_rebuild(app)
@@ -0,0 +1,135 @@
+"""
+Upgrade a populated baseline database to head and back through the money migration.
+
+Runs on SQLite, and also on PostgreSQL when TEST_POSTGRES_URL points at an
+empty database.
+"""
+import os
+import re
+from datetime import date
+from pathlib import Path
+
+import pytest
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from flask_migrate import Migrate, upgrade, downgrade
+from sqlalchemy import create_engine, inspect, text
+
+from website import create_app, db
+from website.models import Account, Transaction
+from website.rollups import apply_rollup_delta
+
+ROOT = Path(__file__).resolve().parent.parent
+MIGRATIONS = str(ROOT / 'migrations')
+BASELINE_SCHEMA = Path(__file__).with_name('baseline_schema.sql')
+BASELINE_REVISION = '7a144cedd042'
+BEFORE_MONEY_REVISION = 'd2e8b5f61a47'  # Revision before e6a3c9d47b18 stores money as minor units
+
+BASELINE_ROWS = [
+    """INSERT INTO "user" (id, first_name, last_name, email, password_hash, time_zone, currency)
+       VALUES (1, 'Test', 'User', 'migrate@example.com', 'x', 'UTC', 'USD')""",
+    """INSERT INTO account (id, user_id, name, type, starting_balance, current_balance, goal_amount, currency)
+       VALUES (1, 1, 'Checking', 'Checking', 100.0, 79.95, NULL, 'USD')""",
+    """INSERT INTO budget_category (id, user_id, name, budget_amount, remaining_amount, auto_reset, time_period,
+                                   next_date, last_reset, currency)
+       VALUES (1, 1, 'Food', 200.0, 189.95, TRUE, 'Monthly', '2026-11-01', '2026-10-01', 'USD')""",
+    """INSERT INTO subscription (id, user_id, name, amount, frequency, auto_add_transaction, account_id,
+                                next_payment_date, currency)
+       VALUES (1, 1, 'Gym', 10.0, 'Monthly', TRUE, 1, '2026-11-05', 'USD')""",
+    """INSERT INTO "transaction" (id, user_id, account_from_id, account_to_id, type, amount, description, date,
+                                 budget_category_id, subscription_id, currency)
+       VALUES (1, 1, 1, NULL, 'Expense', 10.05, 'Groceries', '2026-10-02', 1, NULL, 'USD'),
+              (2, 1, 1, NULL, 'Expense', 10.0, 'Automatic payment for Gym', '2026-10-05', NULL, 1, 'USD'),
+              (3, 1, 1, NULL, 'Expense', 10.0, 'Automatic payment for Gym', '2026-10-05', NULL, 1, 'USD')""",
+    """INSERT INTO credit_card (id, user_id, name, "limit", current_balance, interest_rate, statement_due_date,
+                               minimum_payment_due_date, billing_cycle_days, currency)
+       VALUES (1, 1, 'Visa', 1000.0, 250.5, 19.99, '2026-11-01', '2026-11-20', 30, 'USD')""",
+    """INSERT INTO credit_card_payment (id, user_id, account_id, credit_card_id, transaction_id, amount, date)
+       VALUES (1, 1, 1, 1, 1, 10.05, '2026-10-02')""",
+]
+
+def database_urls():
+    urls = ['sqlite']
+    if os.environ.get('TEST_POSTGRES_URL'):
+        urls.append('postgresql')
+    return urls
+
+@pytest.fixture(params=database_urls())
+def baseline_url(request, tmp_path):
+    """A database with the baseline schema and rows, stamped at BASELINE_REVISION."""
+    if request.param == 'sqlite':
+        url = f"sqlite:///{tmp_path / 'baseline.db'}"
+    else:
+        url = os.environ['TEST_POSTGRES_URL']
+    engine = create_engine(url)
+    with engine.begin() as connection:
+        schema = '\n'.join(line for line in BASELINE_SCHEMA.read_text().splitlines() if not line.startswith('--'))
+        if request.param == 'postgresql':
+            schema = re.sub(r'\bDATETIME\b', 'TIMESTAMP', schema)
+        for statement in schema.split(';'):
+            if statement.strip():
+                connection.execute(text(statement))
+        for statement in BASELINE_ROWS:
+            connection.execute(text(statement))
+        connection.execute(text('CREATE TABLE alembic_version (version_num VARCHAR(32) NOT NULL PRIMARY KEY)'))
+        connection.execute(text('INSERT INTO alembic_version VALUES (:revision)'), {'revision': BASELINE_REVISION})
+    yield url
+    if request.param == 'postgresql':
+        with engine.begin() as connection:
+            connection.execute(text('DROP SCHEMA public CASCADE'))
+            connection.execute(text('CREATE SCHEMA public'))
+    engine.dispose()
+
+@pytest.fixture
+def app(baseline_url, monkeypatch):
+    monkeypatch.setenv('SCHEDULER_ENABLED', '0')
+    monkeypatch.setenv('DATABASE_URL', baseline_url)
+    app = create_app()
+    Migrate(app, db, directory=MIGRATIONS)
+    with app.app_context():
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+def stored_version():
+    return db.session.execute(text('SELECT version_num FROM alembic_version')).scalar()
+
+def test_create_app_leaves_existing_tables_to_the_migrations(app):
+    assert not inspect(db.engine).has_table('monthly_rollup')
+
+def test_baseline_upgrades_to_head(app):
+    upgrade(directory=MIGRATIONS)
+    db.session.remove()
+
+    assert stored_version() == ScriptDirectory(MIGRATIONS).get_current_head()
+    tables = set(inspect(db.engine).get_table_names())
+    assert {'monthly_rollup', 'balance_snapshot', 'scheduler_lock', 'credit_card_statement'} <= tables
+    with db.engine.connect() as connection:
+        context = MigrationContext.configure(connection, opts={'compare_type': True})
+        assert compare_metadata(context, db.metadata) == []
+
+    # Money is stored in minor units and read back in major ones
+    assert db.session.execute(text('SELECT current_balance FROM account')).scalar() == 7995
+    assert db.session.get(Account, 1).current_balance == 79.95
+    # The backfill rolled the transactions up by month, and kept one of the duplicate automatic payments
+    assert db.session.execute(text('SELECT SUM(transaction_count), SUM(total_amount) FROM monthly_rollup')).one() == (3, 3005)
+    assert [row.auto_posted for row in db.session.query(Transaction).order_by(Transaction.id)] == [False, True, False]
+
+    # Buckets without a category or account are still one row each
+    apply_rollup_delta(1, date(2026, 9, 3), 'Transfer', 5)
+    apply_rollup_delta(1, date(2026, 9, 4), 'Transfer', 7)
+    assert db.session.execute(text("SELECT total_amount, transaction_count FROM monthly_rollup WHERE type = 'Transfer'")).all() == [(1200, 2)]
+
+def test_money_migration_downgrades_and_upgrades_again(app):
+    upgrade(directory=MIGRATIONS)
+    downgrade(directory=MIGRATIONS, revision=BEFORE_MONEY_REVISION)
+    db.session.remove()
+
+    assert stored_version() == BEFORE_MONEY_REVISION
+    assert db.session.execute(text('SELECT amount FROM "transaction" ORDER BY id')).scalars().all() == [10.05, 10.0, 10.0]
+    assert db.session.execute(text('SELECT "limit", current_balance FROM credit_card')).one() == (1000.0, 250.5)
+
+    upgrade(directory=MIGRATIONS)
+    db.session.remove()
+    assert db.session.execute(text('SELECT amount FROM "transaction" ORDER BY id')).scalars().all() == [1005, 1000, 1000]
@@ -0,0 +1,55 @@
+"""
+Money is stored as integer minor units and rounded half up on the way in.
+"""
+import math
+
+import pytest
+from sqlalchemy.exc import StatementError
+
+from website import db
+from website.ledger import apply_balance_deltas
+from website.models import Account
+from website.money import to_minor, from_minor, round_money, currency_exponent
+
+@pytest.mark.parametrize('amount, minor', [
+    (0, 0),
+    (10, 1000),
+    (1.005, 101),  # 1.005 * 100 is 100.49999... as a float
+    (2.675, 268),
+    (0.125, 13),
+    (-0.125, -13),  # Half away from zero
+    ('19.99', 1999),
+    (123456789012.34, 12345678901234),
+])
+def test_to_minor_rounds_half_up(amount, minor):
+    assert to_minor(amount) == minor
+
+def test_round_money_uses_the_currency_exponent():
+    assert currency_exponent('JPY') == 0
+    assert currency_exponent('XXX') == 2
+    assert round_money(1234.5, 'JPY') == 1235
+    assert round_money(2.675, 'USD') == 2.68
+    assert from_minor(1999) == 19.99
+
+@pytest.mark.parametrize('amount', [math.nan, math.inf, -math.inf, 'nan'])
+def test_non_finite_amounts_are_rejected(amount):
+    with pytest.raises(ValueError, match='non-finite'):
+        to_minor(amount)
+
+def test_money_columns_add_up_without_drift(app, client):
+    with app.app_context():
+        account_id = app.config['TEST_ACCOUNT_ID']
+        for _ in range(10):
+            apply_balance_deltas({account_id: 0.1})
+        db.session.commit()
+
+        assert db.session.get(Account, account_id).current_balance == 101.0
+        assert db.session.execute(db.text('SELECT current_balance FROM account')).scalar() == 10100
+
+def test_money_column_refuses_nan(app, client):
+    with app.app_context():
+        db.session.add(Account(user_id=app.config['TEST_USER_ID'], name='Cash', type='Cash', starting_balance=0,
+                               current_balance=math.nan))
+        with pytest.raises(StatementError) as error:
+            db.session.flush()
+        assert isinstance(error.value.orig, ValueError)
@@ -0,0 +1,132 @@
+"""
+Check with EXPLAIN QUERY PLAN that the hot queries are served by an index.
+
+The queries are recorded as the application code actually runs them against
+an in-memory SQLite database, then explained with the same parameters.
+"""
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from website import create_app, db
+from website.models import User, Account, BudgetCategory, Subscription
+from website.dashboard import load_dashboard_data
+from website.summary import get_period_summary
+from website.transactions import get_transactions_page
+from website.notifications import count_unread, get_notifications_page
+from website.utils import reset_budgets, add_auto_transactions
+
+@pytest.fixture(scope='module')
+def app():
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setenv('SCHEDULER_ENABLED', '0')
+        monkeypatch.setenv('DATABASE_URL', 'sqlite://')
+        app = create_app()
+
+    with app.app_context():
+        db.create_all()
+        user = User(first_name='Test', last_name='User', email='plans@example.com', password_hash='x', time_zone='UTC')
+        db.session.add(user)
+        db.session.flush()
+        account = Account(user_id=user.id, name='Checking', type='Checking', starting_balance=0, current_balance=0)
+        db.session.add(account)
+        db.session.flush()
+        later = date.today() + timedelta(days=5)  # Not due, so the jobs only read
+        db.session.add(BudgetCategory(
+            user_id=user.id, name='Food', budget_amount=100, remaining_amount=100, auto_reset=True,
+            time_period='Monthly', next_date=later, last_reset=date.today(),
+        ))
+        db.session.add(Subscription(
+            user_id=user.id, name='Gym', amount=30, frequency='Monthly', auto_add_transaction=True,
+            account_id=account.id, next_payment_date=later,
+        ))
+        db.session.commit()
+        app.config['TEST_USER_ID'] = user.id
+        app.config['TEST_ACCOUNT_ID'] = account.id
+    return app
+
+@contextmanager
+def query_plans(app):
+    """Record the SELECTs run inside the block, and fill the yielded list with (sql, plan lines)."""
+    statements, plans = [], []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            statements.append((statement, parameters))
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            yield plans
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+        connection = db.session.connection()
+        for statement, parameters in statements:
+            rows = connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).all()
+            plans.append((' '.join(statement.split()), [row[3] for row in rows]))
+
+def plans_from(plans, table):
+    """The plans of the queries whose FROM clause starts with table."""
+    return [plan for statement, plan in plans if f' FROM {table} ' in statement + ' ' or f' FROM "{table}" ' in statement + ' ']
+
+def test_transaction_pages_seek_the_user_date_range(app):
+    user_id = app.config['TEST_USER_ID']
+    with query_plans(app) as plans:
+        get_transactions_page(user_id, cursor='2026-10-01.5')
+        get_transactions_page(user_id, filters={'account_id': app.config['TEST_ACCOUNT_ID']}, cursor='2026-10-01.5')
+
+    pages = plans_from(plans, 'transaction')
+    assert len(pages) == 2
+    for plan in pages:
+        assert plan[0] == 'SEARCH transaction USING INDEX ix_transaction_user_id_date_type (user_id=? AND date<?)'
+        assert 'USE TEMP B-TREE FOR ORDER BY' not in plan
+
+def test_period_summary_reads_the_date_range(app):
+    with query_plans(app) as plans:
+        get_period_summary(app.config['TEST_USER_ID'])
+
+    summaries = plans_from(plans, 'transaction')
+    assert summaries
+    for plan in summaries:
+        assert plan[0].startswith('SEARCH transaction USING INDEX ix_transaction_user_id_date_type (user_id=? AND date>')
+
+def test_dashboard_is_one_query_searching_by_user(app):
+    with query_plans(app) as plans:
+        load_dashboard_data(app.config['TEST_USER_ID'])
+
+    [(statement, plan)] = plans
+    tables = ['account', 'transaction', 'budget_category', 'subscription', 'loan', 'debt', 'credit_card']
+    for table in tables:
+        assert any(line.startswith(f'SEARCH {table} USING INDEX ix_{table}_user_id') for line in plan), (table, plan)
+    # Only the five recent transactions are scanned, out of their subquery
+    assert [line for line in plan if line.startswith('SCAN ')] == ['SCAN recent']
+
+def test_scheduler_chunks_use_the_due_date_indexes(app):
+    with query_plans(app) as plans:
+        reset_budgets(app)
+        add_auto_transactions(app)
+
+    budgets = [plan[0] for plan in plans_from(plans, 'budget_category')]
+    subscriptions = [plan[0] for plan in plans_from(plans, 'subscription')]
+    assert 'SEARCH budget_category USING INDEX ix_budget_category_auto_reset_next_date (auto_reset=? AND next_date<?)' in budgets
+    assert (
+        'SEARCH subscription USING INDEX ix_subscription_auto_add_transaction_next_payment_date '
+        '(auto_add_transaction=? AND next_payment_date<?)'
+    ) in subscriptions
+
+def test_unread_notifications_use_the_composite_index(app):
+    user_id = app.config['TEST_USER_ID']
+    with query_plans(app) as plans:
+        count_unread(user_id)
+        get_notifications_page(user_id, unread_only=True)
+        get_notifications_page(user_id)
+        get_notifications_page(user_id, cursor='2026-10-01T10:00:00.5')
+
+    count, unread, everything, seek = plans_from(plans, 'notification')
+    assert count == ['SEARCH notification USING COVERING INDEX ix_notification_user_id_read_created_on (user_id=? AND read=?)']
+    assert unread == ['SEARCH notification USING INDEX ix_notification_user_id_read_created_on (user_id=? AND read=?)']
+    assert everything == ['SEARCH notification USING INDEX ix_notification_user_id_created_on (user_id=?)']
+    assert seek[0].startswith('SEARCH notification USING INDEX ix_notification_user_id_created_on (user_id=? AND created_on<')
+    assert 'USE TEMP B-TREE FOR ORDER BY' not in seek
@@ -0,0 +1,55 @@
+"""
+Schedules step by days or by calendar months, clamping to the end of shorter months.
+"""
+from datetime import date
+
+import pytest
+
+from website.recurrence import next_date, occurrence_counts, occurrences_until, to_dates
+
+@pytest.mark.parametrize('current, frequency, steps, expected', [
+    (date(2026, 1, 31), 'Monthly', 1, date(2026, 2, 28)),
+    (date(2028, 1, 31), 'Monthly', 1, date(2028, 2, 29)),
+    (date(2026, 3, 31), 'Monthly', -1, date(2026, 2, 28)),
+    (date(2026, 8, 31), 'Quarterly', 1, date(2026, 11, 30)),
+    (date(2026, 8, 31), 'Biannual', 1, date(2027, 2, 28)),
+    (date(2028, 2, 29), 'Annual', 1, date(2029, 2, 28)),
+    (date(2026, 12, 15), 'Monthly', 1, date(2027, 1, 15)),
+    (date(2026, 2, 27), 'Daily', 3, date(2026, 3, 2)),
+    (date(2026, 12, 28), 'Weekly', 1, date(2027, 1, 4)),
+    (date(2026, 10, 17), 'Biweekly', -1, date(2026, 10, 3)),
+])
+def test_next_date(current, frequency, steps, expected):
+    assert next_date(current, frequency, steps) == expected
+
+def test_unknown_frequency_is_rejected():
+    with pytest.raises(ValueError, match='Fortnightly'):
+        next_date(date(2026, 1, 1), 'Fortnightly')
+
+def test_occurrences_are_counted_from_the_anchor():
+    index, dates, following = occurrences_until([date(2026, 1, 31)], ['Monthly'], date(2026, 5, 15))
+
+    assert index.tolist() == [0, 0, 0, 0]
+    # Back on the 31st after February, not stuck on the 28th
+    assert to_dates(dates) == [date(2026, 1, 31), date(2026, 2, 28), date(2026, 3, 31), date(2026, 4, 30)]
+    assert to_dates(following) == [date(2026, 5, 31)]
+
+def test_occurrences_of_several_schedules():
+    anchors = [date(2026, 10, 1), date(2026, 10, 20), date(2026, 9, 30), date(2026, 10, 10)]
+    index, dates, following = occurrences_until(anchors, ['Weekly', 'Monthly', 'Monthly', 'Daily'], date(2026, 10, 17),
+                                                start=date(2026, 10, 9))
+
+    assert list(zip(index.tolist(), to_dates(dates))) == [
+        (0, date(2026, 10, 15)),
+        # Schedule 1 starts after the horizon, and schedule 2's Sep 30 is before the start
+        *[(3, date(2026, 10, day)) for day in range(10, 18)],
+    ]
+    assert to_dates(following) == [date(2026, 10, 22), date(2026, 10, 20), date(2026, 10, 30), date(2026, 10, 18)]
+
+def test_occurrence_counts_include_the_horizon():
+    counts, _, _ = occurrence_counts(
+        [date(2026, 1, 31), date(2026, 1, 31), date(2026, 10, 3)],
+        ['Monthly', 'Monthly', 'Biweekly'],
+        [date(2026, 2, 28), date(2026, 2, 27), date(2026, 10, 17)],
+    )
+    assert counts.tolist() == [2, 1, 2]
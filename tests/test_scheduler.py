@@ -0,0 +1,65 @@
+"""
+Only the lease holder runs jobs, and a failing job is retried without blocking the others.
+"""
+from datetime import datetime, timedelta, timezone
+
+from website.scheduler import Lease, DueJobScheduler, JOB_ID, RETRY_DELAY
+
+class RecordingScheduler:
+    """Stands in for APScheduler, keeping the last add_job call per id."""
+
+    def __init__(self):
+        self.jobs = {}
+
+    def add_job(self, id, **kwargs):
+        self.jobs[id] = kwargs
+
+def test_one_process_holds_the_lease(app, client):
+    first, second = Lease(app), Lease(app)
+
+    assert first.acquire()
+    assert not second.acquire()
+    assert first.check()
+    first.release()
+    assert second.acquire()
+    assert not first.acquire()
+
+def test_an_expired_lease_is_taken_over(app, client):
+    stalled = Lease(app, ttl=timedelta(seconds=-1))
+    assert stalled.acquire()
+
+    assert Lease(app).acquire()
+    assert not stalled.acquire()
+
+def test_a_failing_job_is_retried_and_the_others_still_run(app, client):
+    calls = []
+
+    def failing(app, time_zones, should_continue):
+        raise RuntimeError('database is locked')
+
+    def working(app, time_zones, should_continue):
+        calls.append(sorted(time_zones))
+
+    scheduler = DueJobScheduler(app, scheduler=RecordingScheduler())
+    scheduler.JOBS = {'budgets': failing, 'subscriptions': working}
+    now = datetime.now(timezone.utc)
+    scheduler.refreshed_at = now
+    scheduler.heap = [(now - timedelta(minutes=1), 'budgets', 'UTC'), (now - timedelta(minutes=1), 'subscriptions', 'UTC')]
+
+    scheduler.run_due()
+
+    assert calls == [['UTC']]
+    [(retry_at, kind, time_zone)] = scheduler.heap
+    assert (kind, time_zone) == ('budgets', 'UTC')
+    assert now + RETRY_DELAY - timedelta(seconds=5) < retry_at <= now + RETRY_DELAY + timedelta(seconds=5)
+    assert scheduler.scheduler.jobs[JOB_ID]['run_date'] == retry_at
+
+def test_followers_do_not_run_jobs(app, client):
+    Lease(app).acquire()
+    scheduler = DueJobScheduler(app, scheduler=RecordingScheduler(), lease=Lease(app))
+    scheduler.JOBS = {'budgets': lambda *args, **kwargs: 1 / 0}
+
+    scheduler.run_due()
+
+    assert JOB_ID not in scheduler.scheduler.jobs
+    assert scheduler.refreshed_at is None
@@ -0,0 +1,50 @@
+"""
+Closing a billing cycle charges interest only on what was left unpaid of the previous statement.
+"""
+from datetime import date
+from types import SimpleNamespace
+
+from website.statements import close_cycles, card_minimum_payments
+
+def card(id, balance, previous_closing_date=None, previous_balance=None, closing=date(2026, 10, 1)):
+    return SimpleNamespace(
+        id=id, current_balance=balance, interest_rate=36.5, billing_cycle_days=30,
+        statement_due_date=closing, minimum_payment_due_date=date(2026, 10, 21),
+        previous_closing_date=previous_closing_date, previous_balance=previous_balance,
+    )
+
+def payment(credit_card_id, day, amount):
+    return SimpleNamespace(credit_card_id=credit_card_id, date=day, amount=amount)
+
+def test_interest_is_charged_on_the_unpaid_statement_balance():
+    cards = [
+        card(1, 600, previous_closing_date=date(2026, 9, 1), previous_balance=1000),
+        card(2, 0, previous_closing_date=date(2026, 9, 1), previous_balance=300),
+        card(3, 200),
+    ]
+    payments = [
+        payment(1, date(2026, 8, 20), 999),  # Before the previous statement, doesn't count
+        payment(1, date(2026, 9, 15), 400),
+        payment(2, date(2026, 9, 30), 300),
+    ]
+
+    statements, next_dates = close_cycles(cards, payments, date(2026, 10, 17))
+
+    # 36.5% APR is 0.1% a day, over the 30 days of the cycle
+    assert [(row['credit_card_id'], row['interest'], row['statement_balance']) for row in statements] == [
+        (1, 18.0, 618.0), (2, 0.0, 0.0), (3, 0.0, 200.0),
+    ]
+    assert [row['minimum_payment'] for row in statements] == [25.0, 0.0, 25.0]
+    assert next_dates[1] == (date(2026, 10, 31), date(2026, 11, 20))
+
+def test_missed_cycles_get_one_statement_each():
+    statements, next_dates = close_cycles([card(1, 500, closing=date(2026, 9, 1))], [], date(2026, 10, 17))
+
+    assert [(row['closing_date'], row['interest'], row['statement_balance']) for row in statements] == [
+        (date(2026, 9, 1), 0.0, 500.0),
+        (date(2026, 10, 1), 15.0, 515.0),
+    ]
+    assert next_dates[1][0] == date(2026, 10, 31)
+
+def test_minimum_payment_is_a_share_with_a_floor():
+    assert card_minimum_payments([0, 10, 500, 5000]).tolist() == [0, 10, 25, 100]
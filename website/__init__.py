@@ -2,27 +2,51 @@ from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from flask_migrate import Migrate
-from apscheduler.schedulers.background import BackgroundScheduler
-from os import path
+from os import environ
+from sqlalchemy import inspect
+from .database import get_database_uri, get_engine_options, get_replica_binds, register_engine_events, RoutingSession
 
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 DB_NAME = "database.db"
 
 def create_app():
     app = Flask(__name__, static_folder='static', static_url_path='/static')
     app.config['SECRET_KEY'] = "you-will-never-guess"
-    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{DB_NAME}'
+    app.config['SQLALCHEMY_DATABASE_URI'] = get_database_uri(f'sqlite:///{DB_NAME}')
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = get_engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
+    app.config['SQLALCHEMY_BINDS'] = get_replica_binds()
     db.init_app(app)
 
+    with app.app_context():
+        for engine in db.engines.values():
+            register_engine_events(engine)
+
     from .views import views
     from .auth import auth
 
     app.register_blueprint(views, url_prefix='/')
     app.register_blueprint(auth, url_prefix='/')
 
-    from .models import User
-    from .utils import reset_budgets, add_auto_transactions
+    from .scheduler import init_scheduler, scheduler_cli
+    from .rollups import rebuild_rollups_command
+    from .imports import import_transactions_command
+    from .balances import balances_cli
+    from .replicas import init_replica_routing, replica_cli
+    from .cache import init_cache, load_user
+    from .timezones import timezone_options
+    from .forecast import forecast_cli
+
+    app.cli.add_command(rebuild_rollups_command)
+    app.cli.add_command(import_transactions_command)
+    app.cli.add_command(scheduler_cli)
+    app.cli.add_command(balances_cli)
+    app.cli.add_command(replica_cli)
+    app.cli.add_command(forecast_cli)
+
+    init_replica_routing(app)
+    init_cache(app)
+    timezone_options()  # Render the time zone <option> list once, up front
 
     with app.app_context():
         create_database()
@@ -31,20 +55,20 @@ def create_app():
     login_manager.login_view = 'auth.login'
     login_manager.init_app(app)
 
-    @login_manager.user_loader
-    def load_user(id):
-        return User.query.get(int(id))
+    login_manager.user_loader(load_user)
 
-    # Scheduler setup
-    scheduler = BackgroundScheduler(timezone='UTC')
-    scheduler.add_job(func=reset_budgets, trigger="interval", days=30, args=[app])
-    scheduler.add_job(func=add_auto_transactions, trigger="interval", days=30, args=[app])
-    scheduler.start()
+    # Scheduler setup. Each web worker starts one with its first request, the
+    # database lease makes sure only one of them runs jobs. Set SCHEDULER_ENABLED=0
+    # on web workers when running `flask scheduler run` as a dedicated process instead.
+    if environ.get('SCHEDULER_ENABLED', '1') != '0':
+        init_scheduler(app)
 
     return app
 
 def create_database():
-    if not path.exists('website/' + DB_NAME):
+    # Only a new, empty database gets its tables here. Existing ones are
+    # upgraded with `flask db upgrade`, which would fail on tables made ahead of it.
+    if not inspect(db.engine).has_table('user'):
         db.create_all()
         print('Created Database!')
 
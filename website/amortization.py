@@ -0,0 +1,184 @@
+from .models import Loan, Debt, LoanPayment, DebtPayment
+from .recurrence import add_months, to_datetime64
+from website import db
+from flask import current_app
+from sqlalchemy import select, func
+from types import SimpleNamespace
+import hashlib
+import numpy as np
+
+SCHEDULE_COLUMNS = ('dates', 'payment', 'interest', 'principal', 'balance')
+
+def level_payments(principals, annual_rates, periods):
+    """
+    Get the fixed monthly payment that repays each principal over its periods.
+
+    Args:
+        principals (array): Amounts borrowed.
+        annual_rates (array): Yearly interest rates in percent.
+        periods (array): Number of monthly payments.
+
+    Returns:
+        array: The payment per period.
+    """
+    principals = np.asarray(principals, dtype=float)
+    rates = np.asarray(annual_rates, dtype=float) / 1200
+    periods = np.maximum(np.asarray(periods, dtype=np.int64), 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        annuity = principals * rates / (1 - (1 + rates) ** -periods)
+    return np.where(rates > 0, annuity, principals / periods)
+
+def period_count(start_dates, end_dates):
+    """Count the monthly payments between start and end dates, at least one."""
+    start = to_datetime64(start_dates).astype('datetime64[M]')
+    end = to_datetime64(end_dates).astype('datetime64[M]')
+    return np.maximum((end - start).astype(np.int64), 1)
+
+def amortization_schedule(principal, annual_rate, start_date, end_date):
+    """
+    Compute the full schedule of a fixed-rate loan repaid in level monthly payments.
+
+    Payments fall one month after the start date and monthly after that, the
+    last one on or about the end date. Every period is computed at once from
+    the closed-form balance, and the last payment is adjusted to clear the
+    balance exactly.
+
+    Args:
+        principal (float): Amount borrowed.
+        annual_rate (float): Yearly interest rate in percent.
+        start_date (datetime.date): When the loan started.
+        end_date (datetime.date): When it should be repaid.
+
+    Returns:
+        dict: Arrays keyed by SCHEDULE_COLUMNS, one entry per payment, with
+            balance the principal left after each payment.
+    """
+    periods = int(period_count(start_date, end_date))
+    rate = (annual_rate or 0) / 1200
+    payment = float(level_payments(principal, annual_rate or 0, periods))
+    k = np.arange(periods + 1)
+    if rate > 0:
+        growth = (1 + rate) ** k
+        balance = principal * growth - payment * (growth - 1) / rate
+    else:
+        balance = principal - payment * k
+    interest = np.round(balance[:-1] * rate, 2)
+    principal_paid = np.round(balance[:-1] - balance[1:], 2)
+    # Absorb rounding in the last payment, so principal is repaid to the cent
+    principal_paid[-1] = round(principal - principal_paid[:-1].sum(), 2)
+
+    schedule = {
+        'dates': add_months(to_datetime64(start_date), k[1:]),
+        'payment': np.round(principal_paid + interest, 2),
+        'interest': interest,
+        'principal': principal_paid,
+        'balance': np.round(principal - np.cumsum(principal_paid), 2) + 0.0,  # No -0.0
+    }
+    for column in schedule.values():
+        column.flags.writeable = False  # Shared through the cache
+    return schedule
+
+def schedule_key(principal, annual_rate, start_date, end_date):
+    """Hash the parameters a schedule depends on into its cache key."""
+    parameters = f'{float(principal or 0):.2f}:{float(annual_rate or 0)}:{start_date}:{end_date}'
+    return 'schedule:' + hashlib.sha1(parameters.encode()).hexdigest()
+
+def get_schedule(principal, annual_rate, start_date, end_date):
+    """
+    Get a schedule from the schedule cache, computing it on a miss.
+
+    Args:
+        principal (float): Amount borrowed.
+        annual_rate (float): Yearly interest rate in percent.
+        start_date (datetime.date): When the loan started.
+        end_date (datetime.date): When it should be repaid.
+
+    Returns:
+        dict: The schedule, see amortization_schedule. Its arrays are read-only.
+    """
+    cache = current_app.extensions['schedule_cache']
+    key = schedule_key(principal, annual_rate, start_date, end_date)
+    schedule = cache.get(key)
+    if schedule is None:
+        schedule = amortization_schedule(principal, annual_rate, start_date, end_date)
+        cache.set(key, schedule)
+    return schedule
+
+def invalidate_schedule(row):
+    """Drop the cached schedule of a loan or debt, before its parameters change or it is deleted."""
+    current_app.extensions['schedule_cache'].delete(
+        schedule_key(row.amount, row.interest_rate, row.start_date, row.end_date)
+    )
+
+def reconcile_payments(schedule, principal, paid, today):
+    """
+    Compare what was paid against a schedule.
+
+    Args:
+        schedule (dict): The schedule, see amortization_schedule.
+        principal (float): Amount borrowed.
+        paid (float): Total of the recorded payments.
+        today (datetime.date): The user's current date.
+
+    Returns:
+        SimpleNamespace: payment (the level payment), total_interest, paid,
+            expected (scheduled up to today), arrears (expected not yet paid),
+            periods_paid, remaining_principal (interpolated within a partly paid
+            period), next_due_date and next_due_amount (None once fully paid).
+    """
+    cumulative = np.cumsum(schedule['payment'])
+    due = schedule['dates'] <= to_datetime64(today)
+    expected = float(cumulative[due][-1]) if due.any() else 0.0
+    periods_paid = int(np.searchsorted(cumulative, paid + 0.005, side='right'))
+    remaining = float(np.interp(paid, np.r_[0, cumulative], np.r_[principal, schedule['balance']]))
+    finished = periods_paid >= len(cumulative)
+    return SimpleNamespace(
+        payment=float(schedule['payment'][0]),
+        total_interest=round(float(schedule['interest'].sum()), 2),
+        paid=paid,
+        expected=round(expected, 2),
+        arrears=round(max(expected - paid, 0), 2),
+        periods_paid=periods_paid,
+        remaining_principal=round(remaining, 2),
+        next_due_date=None if finished else schedule['dates'][periods_paid].item(),
+        next_due_amount=None if finished else round(float(cumulative[periods_paid]) - paid, 2),
+    )
+
+def _summaries(model, payment_model, parent_id, user_id, today):
+    paid = (
+        select(parent_id.label('parent_id'), func.sum(payment_model.amount).label('paid'))
+        .where(payment_model.user_id == user_id)
+        .group_by(parent_id)
+        .subquery()
+    )
+    rows = db.session.execute(
+        select(model.id, model.amount, model.interest_rate, model.start_date, model.end_date, paid.c.paid)
+        .outerjoin(paid, paid.c.parent_id == model.id)
+        .where(model.user_id == user_id, model.start_date.isnot(None), model.end_date.isnot(None))
+    ).all()
+    return {
+        row.id: reconcile_payments(
+            get_schedule(row.amount, row.interest_rate, row.start_date, row.end_date),
+            row.amount, float(row.paid or 0), today,
+        )
+        for row in rows
+    }
+
+def get_amortization_summaries(user_id, today):
+    """
+    Reconcile every loan and debt of a user with dates against its schedule.
+
+    Recorded payments are summed in one grouped query per kind, and schedules
+    come from the schedule cache.
+
+    Args:
+        user_id (int): The id of the user.
+        today (datetime.date): The user's current date.
+
+    Returns:
+        dict: 'loans' and 'debts', each mapping ids to reconcile_payments results.
+    """
+    return {
+        'loans': _summaries(Loan, LoanPayment, LoanPayment.loan_id, user_id, today),
+        'debts': _summaries(Debt, DebtPayment, DebtPayment.debt_id, user_id, today),
+    }
@@ -1,9 +1,10 @@
 from flask import Blueprint, render_template, request, flash, redirect, url_for
 from .models import User
+from .cache import invalidate_user
+from .timezones import timezone_options
 from website import db
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import login_required, login_user, logout_user, current_user
-import pytz
 
 auth = Blueprint('auth', __name__)
 
@@ -46,8 +47,7 @@ def register():
             flash("Account Created.", category="success")
             return redirect(url_for("auth.login"))
 
-    timezones = pytz.all_timezones
-    return render_template("register.html", timezones=timezones)
+    return render_template("register.html", timezone_options=timezone_options())
 
 # Login Route
 @auth.route('/login', methods=['GET', 'POST'])
@@ -113,10 +113,11 @@ def changepass():
                 if check_password_hash(user.password_hash, oldpass):
                     user.password_hash = generate_password_hash(newpass)
                     db.session.commit()
+                    invalidate_user(user.id)
                     flash("Password changed successfully!", category='success')
-                    return redirect(url_for('views.usersettings'))
+                    return redirect(url_for('views.user_settings'))
                 else:
                     flash("Incorrect old password.", category='error')
             except Exception as e:
                 flash(f"An error occurred: {str(e)}", category='error')
-    return redirect(url_for('views.usersettings'))
+    return redirect(url_for('views.user_settings'))
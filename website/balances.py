@@ -0,0 +1,204 @@
+from .models import Account, Transaction, BalanceSnapshot
+from .ledger import _money_values
+from .utils import insert_ignoring_duplicates
+from .cache import bump_data_versions
+from .money import Money, to_minor
+from website import db
+from sqlalchemy import select, update, func, case, union_all, type_coerce, text
+from flask import current_app
+from flask.cli import with_appcontext
+import click
+
+SNAPSHOT_BATCH_SIZE = 1000
+MAX_REPORTED_DRIFT = 50
+
+def account_movements(user_id=None, up_to=None):
+    """
+    Get every account leg of every transaction as a signed amount.
+
+    Income and transfers credit account_to, expenses and transfers debit
+    account_from, the same rules the ledger posts with.
+
+    Args:
+        user_id (int, optional): Only this user's transactions.
+        up_to (int, optional): Only transactions with an id up to this one.
+
+    Returns:
+        Subquery: Columns transaction_id, account_id and amount.
+    """
+    credits = select(
+        Transaction.id.label('transaction_id'),
+        Transaction.account_to_id.label('account_id'),
+        Transaction.amount.label('amount'),
+    ).where(Transaction.type.in_(('Income', 'Transfer')), Transaction.account_to_id.isnot(None))
+    debits = select(
+        Transaction.id,
+        Transaction.account_from_id,
+        -Transaction.amount,
+    ).where(Transaction.type.in_(('Expense', 'Transfer')), Transaction.account_from_id.isnot(None))
+    if user_id is not None:
+        credits = credits.where(Transaction.user_id == user_id)
+        debits = debits.where(Transaction.user_id == user_id)
+    if up_to is not None:
+        credits = credits.where(Transaction.id <= up_to)
+        debits = debits.where(Transaction.id <= up_to)
+    return union_all(credits, debits).subquery('movements')
+
+def derived_balances_statement(user_id=None, up_to=None):
+    """
+    Build the query that derives account balances from the transaction history.
+
+    Each balance is the account's latest snapshot (or its starting balance if
+    it has none) plus the sum of the transactions after that snapshot, so the
+    work grows with the transactions since the last snapshot, not with the
+    whole history.
+
+    Args:
+        user_id (int, optional): Only this user's accounts.
+        up_to (int, optional): Ignore transactions with a higher id.
+
+    Returns:
+        Select: Rows of id, user_id, name, current_balance, derived_balance.
+    """
+    latest = (
+        select(BalanceSnapshot.account_id, func.max(BalanceSnapshot.last_transaction_id).label('last_transaction_id'))
+        .group_by(BalanceSnapshot.account_id)
+    )
+    if user_id is not None:
+        latest = latest.where(BalanceSnapshot.user_id == user_id)
+    latest = latest.subquery('latest')
+
+    movements = account_movements(user_id, up_to)
+    since = (
+        select(movements.c.account_id, func.sum(movements.c.amount).label('amount'))
+        .select_from(movements.outerjoin(latest, latest.c.account_id == movements.c.account_id))
+        .where(movements.c.transaction_id > func.coalesce(latest.c.last_transaction_id, 0))
+        .group_by(movements.c.account_id)
+        .subquery('since')
+    )
+
+    derived = type_coerce(
+        func.coalesce(BalanceSnapshot.balance, Account.starting_balance) + func.coalesce(since.c.amount, 0),
+        Money(),
+    )
+    statement = (
+        select(Account.id, Account.user_id, Account.name, Account.current_balance, derived.label('derived_balance'))
+        .select_from(Account)
+        .outerjoin(latest, latest.c.account_id == Account.id)
+        .outerjoin(BalanceSnapshot, (BalanceSnapshot.account_id == Account.id)
+                   & (BalanceSnapshot.last_transaction_id == latest.c.last_transaction_id))
+        .outerjoin(since, since.c.account_id == Account.id)
+        .order_by(Account.id)
+    )
+    if user_id is not None:
+        statement = statement.where(Account.user_id == user_id)
+    return statement
+
+def sealed_transaction_id():
+    """
+    Get the highest transaction id that no uncommitted transaction can sit below.
+
+    On PostgreSQL ids come from a sequence when the row is inserted, so a lower
+    id can still commit after a higher one has become visible. A SHARE lock
+    waits for every insert in flight to commit and is released right after
+    reading the maximum; inserts made later get higher ids. SQLite serializes
+    writers, so the visible maximum already qualifies.
+
+    Returns:
+        int: The transaction id, 0 if there are none.
+    """
+    if db.engine.dialect.name == 'postgresql':
+        db.session.execute(text('LOCK TABLE "transaction" IN SHARE MODE'))
+    up_to = db.session.execute(select(func.max(Transaction.id))).scalar() or 0
+    db.session.commit()
+    return up_to
+
+def take_balance_snapshots(app, time_zones=None, should_continue=None):
+    """
+    Checkpoint every account's derived balance.
+
+    All snapshots of one run share last_transaction_id, the sealed transaction
+    id when the run starts (see sealed_transaction_id), and accounts without transactions since their
+    previous snapshot are skipped by the unique key, so the table only grows
+    with actual activity. Runs as a daily scheduler job.
+
+    Args:
+        app: The Flask application instance.
+        time_zones (iterable, optional): Unused, snapshots are global.
+        should_continue (callable, optional): Unused, the run is a single transaction.
+
+    Returns:
+        int: The number of snapshots written.
+    """
+    with app.app_context():
+        up_to = sealed_transaction_id()
+        statement = insert_ignoring_duplicates(BalanceSnapshot, ['account_id', 'last_transaction_id'])
+        # Read everything before writing, the query itself reads the snapshot table
+        rows = db.session.execute(derived_balances_statement(up_to=up_to)).all()
+        written = 0
+        for start in range(0, len(rows), SNAPSHOT_BATCH_SIZE):
+            written += len(db.session.execute(statement.returning(BalanceSnapshot.id), [
+                {'user_id': row.user_id, 'account_id': row.id, 'last_transaction_id': up_to, 'balance': row.derived_balance}
+                for row in rows[start:start + SNAPSHOT_BATCH_SIZE]
+            ]).all())
+        db.session.commit()
+        return written
+
+def verify_balances(user_id=None, fix=False):
+    """
+    Recompute every account balance from the ledger and report drift.
+
+    Args:
+        user_id (int, optional): Only check this user's accounts.
+        fix (bool, optional): Overwrite drifted current balances with the derived ones.
+
+    Returns:
+        tuple: (accounts checked, list of drifted rows with id, user_id, name,
+            current_balance and derived_balance)
+    """
+    checked = 0
+    drifted = []
+    for row in db.session.execute(derived_balances_statement(user_id)):
+        checked += 1
+        if to_minor(row.current_balance or 0) != to_minor(row.derived_balance):
+            drifted.append(row)
+
+    if fix and drifted:
+        for start in range(0, len(drifted), SNAPSHOT_BATCH_SIZE):
+            chunk = {row.id: row.derived_balance for row in drifted[start:start + SNAPSHOT_BATCH_SIZE]}
+            db.session.execute(
+                update(Account)
+                .where(Account.id.in_(chunk))
+                .values(current_balance=case(_money_values(chunk), value=Account.id))
+                .execution_options(synchronize_session=False)
+            )
+        bump_data_versions(row.user_id for row in drifted)
+        db.session.commit()
+    return checked, drifted
+
+@click.group('balances')
+def balances_cli():
+    """Account balance snapshot and verification commands."""
+
+@balances_cli.command('snapshot')
+@with_appcontext
+def snapshot_balances_command():
+    """Checkpoint every account's balance now."""
+    count = take_balance_snapshots(current_app._get_current_object())
+    click.echo(f'Wrote {count} balance snapshots.')
+
+@balances_cli.command('verify')
+@click.option('--user-id', type=int, default=None, help='Only check this user.')
+@click.option('--fix', is_flag=True, help='Reset drifted balances to the derived ones.')
+@with_appcontext
+def verify_balances_command(user_id, fix):
+    """Recompute balances from the ledger and report accounts that drifted."""
+    checked, drifted = verify_balances(user_id, fix=fix)
+    for row in drifted[:MAX_REPORTED_DRIFT]:
+        click.echo(f'Account {row.id} ({row.name}, user {row.user_id}): stored {row.current_balance}, '
+                   f'derived {row.derived_balance}, drift {round((row.current_balance or 0) - row.derived_balance, 2)}')
+    if len(drifted) > MAX_REPORTED_DRIFT:
+        click.echo(f'... and {len(drifted) - MAX_REPORTED_DRIFT} more.')
+    click.echo(f'{checked} accounts checked, {len(drifted)} drifted' + (', fixed.' if fix and drifted else '.'))
+    if drifted and not fix:
+        raise SystemExit(1)
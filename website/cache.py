@@ -0,0 +1,231 @@
+from .models import User
+from website import db
+from flask import current_app, has_request_context, make_response, request, session
+from flask_login import UserMixin, current_user
+from sqlalchemy import event, select, update
+from collections import OrderedDict
+from os import environ
+import hashlib
+import pickle
+import threading
+import time
+
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_TTL = 300  # Seconds, a safety net on top of version-based invalidation
+USER_CACHE_MAX_ENTRIES = 4096
+USER_CACHE_TTL = 60  # Seconds, bounds how long other processes can serve a changed profile
+SCHEDULE_CACHE_MAX_ENTRIES = 2048
+SCHEDULE_CACHE_TTL = 24 * 60 * 60  # Seconds, a schedule's key already covers everything it depends on
+USER_FIELDS = ('id', 'name_prefix', 'first_name', 'last_name', 'email', 'time_zone', 'currency', 'date_created')
+
+class LRUCache:
+    """
+    A thread-safe in-process cache that evicts the least recently used entry
+    once max_entries is reached and treats entries older than their TTL as missing.
+    Hits and misses are counted.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                del self.entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl=None):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + (ttl or self.ttl), value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def stats(self):
+        """Get the hit and miss counters and the current size."""
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self.entries), 'max_entries': self.max_entries}
+
+class RedisCache:
+    """
+    The same interface on top of a Redis-compatible client, shared by every worker.
+
+    Any client with get(key), set(key, value, ex=seconds) and delete(key) works,
+    e.g. redis-py or an in-memory stand-in for local testing.
+    """
+
+    def __init__(self, client, ttl=DEFAULT_TTL, prefix='ascend:'):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return None if value is None else pickle.loads(value)
+
+    def set(self, key, value, ttl=None):
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=ttl or self.ttl)
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+class CachedUser(UserMixin):
+    """
+    The logged-in user as a plain record of profile fields.
+
+    It is not attached to any session, so it can be shared between requests,
+    and code that needs to change the user has to load the real User row.
+    """
+
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+    def __repr__(self):
+        return f'<CachedUser {self.email}>'
+
+def load_user(user_id):
+    """
+    Flask-Login user_loader backed by the in-process user cache.
+
+    Args:
+        user_id (str | int): The id stored in the session.
+
+    Returns:
+        CachedUser: The user, or None if it doesn't exist.
+    """
+    user_id = int(user_id)
+    cache = current_app.extensions['user_cache']
+    user = cache.get(user_id)
+    if user is None:
+        row = db.session.execute(
+            select(*(getattr(User, field) for field in USER_FIELDS)).where(User.id == user_id)
+        ).first()
+        if row is None:
+            return None
+        user = CachedUser(**row._asdict())
+        cache.set(user_id, user)
+    return user
+
+def invalidate_user(user_id):
+    """Drop a user from this process's user cache, after their profile or password changed."""
+    current_app.extensions['user_cache'].delete(int(user_id))
+
+def get_data_version(user_id):
+    """
+    Get a user's data version, which changes whenever any of their data does.
+
+    Args:
+        user_id (int): The id of the user.
+
+    Returns:
+        int: The current version.
+    """
+    return db.session.execute(select(User.data_version).where(User.id == user_id)).scalar() or 0
+
+def bump_data_versions(user_ids):
+    """
+    Invalidate everything cached for some users by moving their data version on.
+
+    Runs on the current session, so the bump commits together with the writes.
+
+    Args:
+        user_ids (iterable): Ids of the users whose data changed.
+    """
+    user_ids = set(user_ids)
+    if user_ids:
+        db.session.execute(
+            update(User)
+            .where(User.id.in_(user_ids))
+            .values(data_version=User.data_version + 1)
+            .execution_options(synchronize_session=False)
+        )
+
+def _bump_on_commit(db_session):
+    # Any request that writes changes the logged-in user's data
+    if not has_request_context() or not current_user.is_authenticated:
+        return
+    if db_session.info.get('wrote') or db_session.new or db_session.dirty or db_session.deleted:
+        db_session.execute(
+            update(User)
+            .where(User.id == current_user.id)
+            .values(data_version=User.data_version + 1)
+            .execution_options(synchronize_session=False)
+        )
+
+def init_cache(app):
+    """
+    Set up the response and user caches and version bumping for an app.
+
+    The response cache is in-process unless CACHE_REDIS_URL points at a Redis
+    server. The user and amortization schedule caches are always in-process.
+    /api/cache-stats is only served with CACHE_STATS_ENABLED=1.
+
+    Args:
+        app: The Flask application instance.
+    """
+    ttl = int(environ.get('CACHE_TTL', DEFAULT_TTL))
+    redis_url = environ.get('CACHE_REDIS_URL')
+    if redis_url:
+        import redis  # Only needed when a shared cache is configured
+        cache = RedisCache(redis.Redis.from_url(redis_url), ttl=ttl)
+    else:
+        cache = LRUCache(max_entries=int(environ.get('CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES)), ttl=ttl)
+    app.extensions['response_cache'] = cache
+    app.extensions['user_cache'] = LRUCache(
+        max_entries=int(environ.get('USER_CACHE_MAX_ENTRIES', USER_CACHE_MAX_ENTRIES)),
+        ttl=int(environ.get('USER_CACHE_TTL', USER_CACHE_TTL)),
+    )
+    app.extensions['schedule_cache'] = LRUCache(max_entries=SCHEDULE_CACHE_MAX_ENTRIES, ttl=SCHEDULE_CACHE_TTL)
+    app.config.setdefault('CACHE_STATS_ENABLED', environ.get('CACHE_STATS_ENABLED') == '1')
+
+    if not event.contains(db.session, 'before_commit', _bump_on_commit):
+        event.listen(db.session, 'before_commit', _bump_on_commit)
+
+def cached_page(key, render):
+    """
+    Serve a per-user page from the response cache, with an ETag.
+
+    The key has to include the user's data version and anything else the
+    page depends on. A request whose If-None-Match matches gets an empty 304
+    without rendering or loading anything. Pages with pending flash messages
+    are always rendered fresh and never cached, since those messages show once.
+
+    Args:
+        key (str): The cache key.
+        render (callable): Returns the page body on a miss.
+
+    Returns:
+        Response: The page, or a 304.
+    """
+    if session.get('_flashes'):
+        return make_response(render())
+
+    etag = hashlib.sha1(key.encode()).hexdigest()
+    if etag in request.if_none_match:
+        response = make_response('', 304)
+    else:
+        cache = current_app.extensions['response_cache']
+        body = cache.get(key)
+        if body is None:
+            body = render()
+            cache.set(key, body)
+        response = make_response(body)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
@@ -0,0 +1,117 @@
+from .models import Account, Transaction, BudgetCategory, Subscription, Loan, Debt, CreditCard
+from .money import Money
+from website import db
+from sqlalchemy import select, union_all, literal, cast, null, Integer, String, Float, Date
+from collections import namedtuple
+from functools import lru_cache
+
+RECENT_TRANSACTIONS_LIMIT = 5
+
+# Column slots of the combined dashboard query by kind, and how many of each
+# the widest section needs. Sections fill their own columns into the slots of
+# the matching kind and leave the rest NULL.
+SLOT_TYPES = {'int': Integer, 'str': String, 'money': Money, 'float': Float, 'date': Date}
+SLOT_COUNTS = {'int': 2, 'str': 3, 'money': 2, 'float': 1, 'date': 1}
+
+def _slot_kind(column):
+    column_type = column.type
+    if isinstance(column_type, Money):
+        return 'money'
+    for kind in ('int', 'float', 'date'):
+        if isinstance(column_type, SLOT_TYPES[kind]):
+            return kind
+    return 'str'
+
+@lru_cache(maxsize=None)
+def _row_type(section, fields):
+    return namedtuple(section, fields)
+
+def _section_select(section, columns, source=None):
+    """
+    Spread one section's columns over the shared slots.
+
+    Returns:
+        tuple: (select, {field name: slot label}).
+    """
+    used = {kind: 0 for kind in SLOT_COUNTS}
+    slots, fields = {}, {}
+    for name, column in columns.items():
+        kind = _slot_kind(column)
+        label = f'{kind}_{used[kind]}'
+        used[kind] += 1
+        slots[label] = column
+        fields[name] = label
+    values = [literal(section).label('section')]
+    for kind, count in SLOT_COUNTS.items():
+        for index in range(count):
+            label = f'{kind}_{index}'
+            values.append(slots.get(label, cast(null(), SLOT_TYPES[kind])).label(label))
+    statement = select(*values)
+    if source is not None:
+        statement = statement.select_from(source)
+    return statement, fields
+
+def load_dashboard_data(user_id):
+    """
+    Load everything the dashboard renders for a user in a single query.
+
+    The sections are combined with UNION ALL, each one a user_id range scan
+    over its own index, and the budget category name is joined onto the
+    recent transactions so the template never triggers a per-row lookup. The
+    rows are then split back into read-only named tuples per section.
+
+    Args:
+        user_id (int): The id of the user whose data should be loaded.
+
+    Returns:
+        dict: Lists of read-only rows keyed by dashboard section.
+    """
+    recent = (
+        select(
+            Transaction.id,
+            Transaction.date,
+            Transaction.description,
+            Transaction.amount,
+            Transaction.type,
+            Transaction.budget_category_id,
+            BudgetCategory.name.label('budget_category_name'),
+        )
+        .outerjoin(BudgetCategory, Transaction.budget_category_id == BudgetCategory.id)
+        .where(Transaction.user_id == user_id)
+        .order_by(Transaction.date.desc(), Transaction.id.desc())
+        .limit(RECENT_TRANSACTIONS_LIMIT)
+        .subquery('recent')
+    )
+    sections = {
+        'accounts': (Account, [Account.id, Account.name, Account.type, Account.current_balance, Account.goal_amount,
+                               Account.currency]),
+        'transactions': (None, list(recent.c)),
+        'budget_categories': (BudgetCategory, [BudgetCategory.id, BudgetCategory.name, BudgetCategory.time_period,
+                                               BudgetCategory.budget_amount, BudgetCategory.remaining_amount]),
+        'subscriptions': (Subscription, [Subscription.id, Subscription.name, Subscription.amount,
+                                         Subscription.frequency, Subscription.next_payment_date]),
+        'loans': (Loan, [Loan.id, Loan.counterparty_name, Loan.amount, Loan.interest_rate, Loan.type]),
+        'debts': (Debt, [Debt.id, Debt.type, Debt.amount, Debt.interest_rate, Debt.end_date]),
+        'credit_cards': (CreditCard, [CreditCard.id, CreditCard.name, CreditCard.limit, CreditCard.current_balance]),
+    }
+
+    branches, layouts = [], {}
+    for section, (model, columns) in sections.items():
+        statement, fields = _section_select(
+            section, {column.key: column for column in columns}, source=recent if model is None else None
+        )
+        if model is not None:
+            statement = statement.where(model.user_id == user_id)
+        branches.append(statement)
+        layouts[section] = (_row_type(section, tuple(fields)), list(fields.values()))
+
+    data = {section: [] for section in sections}
+    for row in db.session.execute(union_all(*branches)).mappings():
+        row_type, labels = layouts[row['section']]
+        data[row['section']].append(row_type(*(row[label] for label in labels)))
+
+    # UNION ALL keeps no order across branches, so restore each section's own
+    for section, rows in data.items():
+        rows.sort(key=lambda row: row.id)
+    data['transactions'].sort(key=lambda row: (row.date, row.id), reverse=True)
+    return data
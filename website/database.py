@@ -0,0 +1,124 @@
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.pool import QueuePool, StaticPool
+from os import environ
+import sqlite3
+
+REPLICA_BIND = 'replica'  # Bind key of the read replica, configured through REPLICA_DATABASE_URL
+
+# Set on every new SQLite connection
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',  # Readers no longer block the writer, nor the writer readers
+    'synchronous': 'NORMAL',  # Durable with WAL, fsyncs at checkpoints instead of every commit
+    'busy_timeout': 5000,  # Milliseconds to wait for a lock before "database is locked"
+    'cache_size': -20000,  # Negative means KiB, so about 20 MB of page cache per connection
+    'mmap_size': 268435456,  # Read up to 256 MB of the file through memory mapping
+    'temp_store': 'MEMORY',
+    'foreign_keys': 'ON',
+}
+
+def _env_int(name, default):
+    return int(environ.get(name, default))
+
+def get_database_uri(default):
+    """
+    Get the database URI, from the DATABASE_URL environment variable if it is set.
+
+    Args:
+        default (str): The URI to use otherwise.
+
+    Returns:
+        str: The SQLAlchemy database URI.
+    """
+    uri = environ.get('DATABASE_URL') or default
+    if uri.startswith('postgres://'):
+        # Hosting providers still hand out the scheme SQLAlchemy dropped
+        uri = 'postgresql://' + uri[len('postgres://'):]
+    return uri
+
+def get_engine_options(uri):
+    """
+    Get the engine and pool settings for a database URI.
+
+    SQLite files get a small pool of connections shared across threads (the
+    scheduler runs in its own), and in-memory databases a single static
+    connection. Server databases get a QueuePool that checks connections
+    before use and recycles them before the server times them out. Pool sizes
+    can be tuned with DB_POOL_SIZE, DB_MAX_OVERFLOW and DB_POOL_RECYCLE.
+
+    Args:
+        uri (str): The SQLAlchemy database URI.
+
+    Returns:
+        dict: Options for SQLALCHEMY_ENGINE_OPTIONS.
+    """
+    url = make_url(uri)
+    if url.get_backend_name() == 'sqlite':
+        if url.database in (None, '', ':memory:'):
+            return {'poolclass': StaticPool, 'connect_args': {'check_same_thread': False}}
+        return {
+            'poolclass': QueuePool,
+            'pool_size': _env_int('DB_POOL_SIZE', 5),
+            'max_overflow': _env_int('DB_MAX_OVERFLOW', 10),
+            'connect_args': {'check_same_thread': False, 'timeout': SQLITE_PRAGMAS['busy_timeout'] / 1000},
+        }
+    return {
+        'poolclass': QueuePool,
+        'pool_size': _env_int('DB_POOL_SIZE', 10),
+        'max_overflow': _env_int('DB_MAX_OVERFLOW', 20),
+        'pool_recycle': _env_int('DB_POOL_RECYCLE', 1800),
+        'pool_pre_ping': True,
+    }
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Connect event hook that applies SQLITE_PRAGMAS to a new SQLite connection."""
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f'PRAGMA {name}={value}')
+    cursor.close()
+
+def get_replica_binds():
+    """
+    Get the SQLALCHEMY_BINDS entry for the read replica, if REPLICA_DATABASE_URL is set.
+
+    Returns:
+        dict: Bind key -> engine config, empty without a replica.
+    """
+    uri = environ.get('REPLICA_DATABASE_URL')
+    if not uri:
+        return {}
+    uri = get_database_uri(uri)
+    return {REPLICA_BIND: dict(get_engine_options(uri), url=uri)}
+
+def register_engine_events(engine):
+    """
+    Hook the per-connection settings onto an engine.
+
+    Args:
+        engine: The SQLAlchemy engine.
+    """
+    if engine.dialect.name == 'sqlite' and not event.contains(engine, 'connect', set_sqlite_pragmas):
+        event.listen(engine, 'connect', set_sqlite_pragmas)
+
+class RoutingSession(Session):
+    """
+    A session that sends reads to the replica bind while it is marked read-only.
+
+    Anything that writes, DML statements and flushes, always goes to the
+    primary, and so do reads after a write in the same session, so a handler
+    sees its own changes. Requests mark the session through
+    session.info['read_only'], see replicas.py, and writes are recorded in
+    session.info['wrote'].
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            if self._flushing or isinstance(clause, UpdateBase):
+                self.info['wrote'] = True
+            elif self.info.get('read_only') and not self.info.get('wrote') and REPLICA_BIND in self._db.engines:
+                return self._db.engines[REPLICA_BIND]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
@@ -0,0 +1,120 @@
+from .models import Account, Transaction, BudgetCategory, Subscription, Loan, Debt, CreditCard
+from website import db
+from sqlalchemy import select, or_
+from datetime import date, datetime
+import csv
+import io
+import json
+import zlib
+
+EXPORT_FETCH_SIZE = 1000  # Rows fetched from the cursor, and written to the response, at a time
+EXPORT_FORMATS = ('csv', 'json')
+
+# Export name -> (model, columns)
+EXPORTS = {
+    'transactions': (Transaction, ['id', 'date', 'type', 'amount', 'currency', 'description', 'account_from_id',
+                                   'account_to_id', 'budget_category_id', 'subscription_id', 'created_on']),
+    'accounts': (Account, ['id', 'name', 'type', 'starting_balance', 'current_balance', 'goal_amount', 'currency']),
+    'budget-categories': (BudgetCategory, ['id', 'name', 'description', 'budget_amount', 'remaining_amount', 'auto_reset',
+                                           'time_period', 'next_date', 'last_reset', 'currency']),
+    'subscriptions': (Subscription, ['id', 'name', 'amount', 'frequency', 'auto_add_transaction', 'account_id',
+                                     'last_payment_date', 'next_payment_date', 'currency']),
+    'loans': (Loan, ['id', 'counterparty_name', 'amount', 'interest_rate', 'start_date', 'end_date', 'type', 'currency']),
+    'debts': (Debt, ['id', 'type', 'amount', 'interest_rate', 'start_date', 'end_date', 'currency']),
+    'credit-cards': (CreditCard, ['id', 'name', 'limit', 'current_balance', 'interest_rate', 'statement_due_date',
+                                  'minimum_payment_due_date', 'billing_cycle_days', 'currency']),
+}
+
+def _json_value(value):
+    return value.isoformat() if isinstance(value, (date, datetime)) else value
+
+def iter_export_rows(name, user_id, filters=None):
+    """
+    Stream a user's rows for one export from a server-side cursor.
+
+    Args:
+        name (str): A key of EXPORTS.
+        user_id (int): The id of the user.
+        filters (dict, optional): As returned by parse_transaction_filters, applied to transactions only.
+
+    Yields:
+        Row: Read-only rows with the export's columns, in id order.
+    """
+    model, columns = EXPORTS[name]
+    statement = select(*(getattr(model, column) for column in columns)).where(model.user_id == user_id)
+    if model is Transaction and filters:
+        if filters.get('account_id'):
+            statement = statement.where(or_(
+                Transaction.account_from_id == filters['account_id'],
+                Transaction.account_to_id == filters['account_id'],
+            ))
+        if filters.get('budget_category_id'):
+            statement = statement.where(Transaction.budget_category_id == filters['budget_category_id'])
+        if filters.get('type'):
+            statement = statement.where(Transaction.type == filters['type'])
+        if filters.get('start_date'):
+            statement = statement.where(Transaction.date >= filters['start_date'])
+        if filters.get('end_date'):
+            statement = statement.where(Transaction.date <= filters['end_date'])
+
+    result = db.session.execute(
+        statement.order_by(model.id).execution_options(yield_per=EXPORT_FETCH_SIZE)
+    )
+    for partition in result.partitions():
+        yield from partition
+
+def iter_csv(name, rows):
+    """Encode rows as CSV, yielding one chunk per EXPORT_FETCH_SIZE rows."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORTS[name][1])
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+        if count % EXPORT_FETCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def iter_json(name, rows):
+    """Encode rows as a JSON array of objects, yielding one chunk per EXPORT_FETCH_SIZE rows."""
+    columns = EXPORTS[name][1]
+    chunk = ['[']
+    for index, row in enumerate(rows):
+        chunk.append(('' if index == 0 else ',') + '\n' + json.dumps(
+            {column: _json_value(value) for column, value in zip(columns, row)}
+        ))
+        if len(chunk) >= EXPORT_FETCH_SIZE:
+            yield ''.join(chunk)
+            chunk = []
+    chunk.append('\n]\n')
+    yield ''.join(chunk)
+
+def gzip_stream(chunks):
+    """Gzip a stream of text chunks without buffering the whole body."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 writes a gzip header
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+def generate_export(name, user_id, file_format, filters=None, compress=False):
+    """
+    Build the body generator for an export.
+
+    Args:
+        name (str): A key of EXPORTS.
+        user_id (int): The id of the user.
+        file_format (str): 'csv' or 'json'.
+        filters (dict, optional): Transaction filters, see iter_export_rows.
+        compress (bool, optional): Gzip the stream.
+
+    Returns:
+        generator: Chunks of str, or bytes when compressed.
+    """
+    rows = iter_export_rows(name, user_id, filters)
+    chunks = iter_json(name, rows) if file_format == 'json' else iter_csv(name, rows)
+    return gzip_stream(chunks) if compress else chunks
@@ -0,0 +1,220 @@
+from .models import User, Account, Subscription, Loan, Debt, CreditCard
+from .amortization import level_payments, period_count
+from .recurrence import FREQUENCY_STEPS, add_months, occurrences_until, to_datetime64, to_dates
+from .summary import get_user_today
+from .utils import get_local_dates
+from website import db
+from sqlalchemy import select, func
+from datetime import datetime, timezone
+from flask.cli import with_appcontext
+import click
+import numpy as np
+
+DEFAULT_HORIZON_MONTHS = 12
+MAX_HORIZON_MONTHS = 24
+FLOW_SOURCES = ('subscriptions', 'loans', 'debts', 'credit_cards')
+FORECAST_BATCH_SIZE = 500  # Users forecast together, each a row of the balance matrix
+
+def _installments(rows, today, horizon):
+    """Monthly level payments of loans or debts, as (row index, dates, amounts) arrays."""
+    keep = np.array([bool(row.start_date and row.end_date and row.amount) for row in rows], dtype=bool)
+    rows_index = np.flatnonzero(keep)
+    rows = [rows[i] for i in rows_index.tolist()]
+    if not rows:
+        return rows_index, to_datetime64([]), np.zeros(0)
+    periods = period_count([row.start_date for row in rows], [row.end_date for row in rows])
+    payments = level_payments([row.amount for row in rows], [row.interest_rate or 0 for row in rows], periods)
+    first = add_months(to_datetime64([row.start_date for row in rows]), 1)
+    last = np.minimum(add_months(first, periods - 1), horizon)
+    index, dates, _ = occurrences_until(first, ['Monthly'] * len(rows), last, start=today)
+    return rows_index[index], dates, payments[index]
+
+def forecast_cash_flows(user_ids, today, months=DEFAULT_HORIZON_MONTHS):
+    """
+    Project the total account balance of many users day by day, set-based.
+
+    Each source is read with one query for all users, and every user's daily
+    flows are accumulated into a (users, days) matrix, so forecasting a batch
+    of users costs about as many queries as forecasting one. Starts from the
+    sum of current account balances and applies:
+    - every subscription charge (from its next payment date and frequency),
+    - monthly level payments of loans taken and debts, and repayments of loans
+      given, between their start and end dates,
+    - each credit card's current balance, paid on its next statement due date.
+
+    Args:
+        user_ids (list): Ids of the users, all on the same local date.
+        today (datetime.date): First day of the forecast.
+        months (int, optional): Horizon in months, capped at MAX_HORIZON_MONTHS.
+
+    Returns:
+        dict: dates (datetime64[D] array), balance (projected end-of-day total,
+            one row per user in user_ids order), flows (the same shape, per source
+            in FLOW_SOURCES) and starting_balance per user.
+    """
+    user_ids = list(user_ids)
+    position = {user_id: i for i, user_id in enumerate(user_ids)}
+    months = max(1, min(int(months), MAX_HORIZON_MONTHS))
+    start = to_datetime64(today)
+    horizon = add_months(start, months)
+    dates = np.arange(start, horizon + 1)
+
+    def owners(rows):
+        return np.array([position[row.user_id] for row in rows], dtype=np.int64)
+
+    def daily(users, event_dates, amounts):
+        out = np.zeros((len(user_ids), len(dates)))
+        np.add.at(out, (users, (event_dates - start).astype(np.int64)), amounts)
+        return out
+
+    starting_balance = np.zeros(len(user_ids))
+    for user_id, total in db.session.execute(
+        select(Account.user_id, func.sum(Account.current_balance))
+        .where(Account.user_id.in_(user_ids))
+        .group_by(Account.user_id)
+    ).all():
+        starting_balance[position[user_id]] = float(total or 0)
+
+    subscriptions = db.session.execute(
+        select(Subscription.user_id, Subscription.amount, Subscription.frequency, Subscription.next_payment_date)
+        .where(Subscription.user_id.in_(user_ids), Subscription.frequency.in_(FREQUENCY_STEPS))
+    ).all()
+    index, charge_dates, _ = occurrences_until(
+        [row.next_payment_date for row in subscriptions], [row.frequency for row in subscriptions], horizon, start=start
+    )
+    charges = np.array([row.amount for row in subscriptions], dtype=float)
+
+    loans = db.session.execute(
+        select(Loan.user_id, Loan.amount, Loan.interest_rate, Loan.start_date, Loan.end_date, Loan.type)
+        .where(Loan.user_id.in_(user_ids))
+    ).all()
+    given = [row for row in loans if row.type == 'Given']
+    taken = [row for row in loans if row.type != 'Given']
+    given_index, given_dates, given_amounts = _installments(given, start, horizon)
+    taken_index, taken_dates, taken_amounts = _installments(taken, start, horizon)
+
+    debts = db.session.execute(
+        select(Debt.user_id, Debt.amount, Debt.interest_rate, Debt.start_date, Debt.end_date)
+        .where(Debt.user_id.in_(user_ids))
+    ).all()
+    debt_index, debt_dates, debt_amounts = _installments(debts, start, horizon)
+
+    cards = db.session.execute(
+        select(CreditCard.user_id, CreditCard.current_balance, CreditCard.statement_due_date, CreditCard.billing_cycle_days)
+        .where(CreditCard.user_id.in_(user_ids), CreditCard.current_balance > 0, CreditCard.statement_due_date.isnot(None))
+    ).all()
+    due = to_datetime64([row.statement_due_date for row in cards])
+    cycle = np.maximum(np.array([row.billing_cycle_days or 30 for row in cards], dtype=np.int64), 1)
+    # Roll past due dates forward by whole billing cycles
+    behind = np.maximum((start - due).astype(np.int64), 0)
+    due = due + ((-(-behind // cycle)) * cycle).astype('timedelta64[D]')
+    in_range = due <= horizon
+    card_balances = np.array([row.current_balance for row in cards], dtype=float)
+
+    flows = {
+        'subscriptions': -daily(owners(subscriptions)[index], charge_dates, charges[index]),
+        'loans': (
+            daily(owners(given)[given_index], given_dates, given_amounts)
+            - daily(owners(taken)[taken_index], taken_dates, taken_amounts)
+        ),
+        'debts': -daily(owners(debts)[debt_index], debt_dates, debt_amounts),
+        'credit_cards': -daily(owners(cards)[in_range], due[in_range], card_balances[in_range]),
+    }
+    return {
+        'dates': dates,
+        'balance': starting_balance[:, None] + np.cumsum(sum(flows.values()), axis=1),
+        'flows': flows,
+        'starting_balance': starting_balance,
+    }
+
+def forecast_cash_flow(user_id, today=None, months=DEFAULT_HORIZON_MONTHS, time_zone='UTC'):
+    """
+    Project one user's total account balance day by day, see forecast_cash_flows.
+
+    Args:
+        user_id (int): The id of the user.
+        today (datetime.date, optional): First day of the forecast. The user's local date if omitted.
+        months (int, optional): Horizon in months, capped at MAX_HORIZON_MONTHS.
+        time_zone (str, optional): The user's time zone, used when today is omitted.
+
+    Returns:
+        dict: dates (datetime64[D] array), balance (projected end-of-day total),
+            flows (daily net amount per source in FLOW_SOURCES), starting_balance
+            and the lowest point as lowest_date and lowest_balance.
+    """
+    if today is None:
+        today = get_user_today(time_zone)
+    forecast = forecast_cash_flows([user_id], today, months)
+    dates, balance = forecast['dates'], forecast['balance'][0]
+    lowest = int(np.argmin(balance))
+    return {
+        'dates': dates,
+        'balance': balance,
+        'flows': {source: flow[0] for source, flow in forecast['flows'].items()},
+        'starting_balance': float(forecast['starting_balance'][0]),
+        'lowest_date': to_dates(dates[lowest:lowest + 1])[0],
+        'lowest_balance': float(balance[lowest]),
+    }
+
+def first_below(forecast, threshold):
+    """
+    Find where each user of a batch forecast first drops below a threshold.
+
+    Args:
+        forecast (dict): As returned by forecast_cash_flows.
+        threshold (float): Balance to warn below.
+
+    Returns:
+        tuple: (rows, first dates, lowest balances) arrays, for the rows that drop below.
+    """
+    below = forecast['balance'] < threshold
+    rows = np.flatnonzero(below.any(axis=1))
+    first = below[rows].argmax(axis=1)
+    return rows, forecast['dates'][first], forecast['balance'][rows].min(axis=1)
+
+def find_low_balances(threshold=0, months=DEFAULT_HORIZON_MONTHS, batch_size=FORECAST_BATCH_SIZE):
+    """
+    Find every user whose projected balance drops below a threshold.
+
+    Users are grouped by their local date and forecast batch_size at a time.
+
+    Args:
+        threshold (float, optional): Balance to warn below.
+        months (int, optional): Horizon in months.
+        batch_size (int, optional): Users forecast together.
+
+    Yields:
+        tuple: (user_id, first date below threshold, lowest balance)
+    """
+    time_zones = db.session.execute(select(User.time_zone).distinct()).scalars().all()
+    for today, zones in get_local_dates(time_zones, datetime.now(timezone.utc)).items():
+        last_id = 0
+        while True:
+            user_ids = db.session.execute(
+                select(User.id)
+                .where(User.id > last_id, User.time_zone.in_(zones))
+                .order_by(User.id)
+                .limit(batch_size)
+            ).scalars().all()
+            if not user_ids:
+                break
+            last_id = user_ids[-1]
+            rows, first_dates, lowest = first_below(forecast_cash_flows(user_ids, today, months), threshold)
+            for row, first_date, lowest_balance in zip(rows.tolist(), to_dates(first_dates), lowest.tolist()):
+                yield user_ids[row], first_date, lowest_balance
+
+@click.group('forecast')
+def forecast_cli():
+    """Cash flow forecasting commands."""
+
+@forecast_cli.command('low-balances')
+@click.option('--threshold', type=float, default=0, help='Warn when the projected balance drops below this.')
+@click.option('--months', type=int, default=DEFAULT_HORIZON_MONTHS, help='Forecast horizon in months.')
+@with_appcontext
+def low_balances_command(threshold, months):
+    """List users whose projected balance drops below a threshold."""
+    count = 0
+    for user_id, first_date, lowest_balance in find_low_balances(threshold, months):
+        count += 1
+        click.echo(f'User {user_id}: below {threshold} from {first_date}, lowest {lowest_balance:.2f}')
+    click.echo(f'{count} users projected below {threshold}.')
@@ -0,0 +1,280 @@
+from .models import Account, BudgetCategory, Transaction
+from .utils import insert_ignoring_duplicates
+from .ledger import apply_balance_deltas, transaction_deltas
+from .cache import bump_data_versions
+from .rollups import apply_rollup_delta, month_start, rollup_account_id
+from website import db
+from datetime import datetime
+from flask.cli import with_appcontext
+from sqlalchemy import select
+import click
+import csv
+import hashlib
+import io
+import math
+import re
+
+IMPORT_BATCH_SIZE = 2000
+MAX_REPORTED_ERRORS = 20
+CSV_DATE_FORMATS = ('%Y-%m-%d', '%m/%d/%Y', '%d/%m/%Y', '%d.%m.%Y')
+OFX_TAG = re.compile(r'<(/?)(\w+)>([^<\r\n]*)')
+
+class ImportRowError(ValueError):
+    """A row that could not be turned into a transaction."""
+
+def _parse_amount(value):
+    try:
+        amount = float(str(value).replace(',', '').replace('$', '').strip())
+    except (TypeError, ValueError):
+        raise ImportRowError(f"Invalid amount '{value}'.")
+    if not math.isfinite(amount):  # float() takes 'nan' and 'inf'
+        raise ImportRowError(f"Invalid amount '{value}'.")
+    return amount
+
+def _parse_csv_date(value):
+    for date_format in CSV_DATE_FORMATS:
+        try:
+            return datetime.strptime((value or '').strip(), date_format).date()
+        except ValueError:
+            continue
+    raise ImportRowError(f"Invalid date '{value}'.")
+
+def parse_csv(stream):
+    """
+    Stream rows out of a CSV file.
+
+    The header is matched case-insensitively. 'date' and 'amount' are required;
+    'description', 'type', 'account' and 'category' are optional. Without a
+    type column, negative amounts are expenses and positive amounts income.
+
+    Args:
+        stream: A binary file object.
+
+    Yields:
+        tuple: (line number, raw row dict with lower-cased keys)
+    """
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+    for row in reader:
+        yield reader.line_num, {(key or '').strip().lower(): (value or '').strip() for key, value in row.items()}
+
+def parse_ofx(stream):
+    """
+    Stream STMTTRN blocks out of an OFX (SGML or XML) statement.
+
+    Tags are read one by one, so files with several blocks, or the whole
+    statement, on one line work too.
+
+    Args:
+        stream: A binary file object.
+
+    Yields:
+        tuple: (line number, raw row dict with the same keys as parse_csv, plus 'fitid')
+    """
+    current = None
+    for line_number, line in enumerate(io.TextIOWrapper(stream, encoding='utf-8', errors='replace'), start=1):
+        for closing, tag, value in OFX_TAG.findall(line):
+            tag = tag.upper()
+            if tag == 'STMTTRN':
+                if not closing:
+                    current = {}
+                elif current is not None:
+                    posted = current.get('DTPOSTED', '')[:8]
+                    yield line_number, {
+                        'date': f"{posted[:4]}-{posted[4:6]}-{posted[6:8]}",
+                        'amount': current.get('TRNAMT', ''),
+                        'description': current.get('NAME') or current.get('MEMO') or '',
+                        'fitid': current.get('FITID', ''),
+                    }
+                    current = None
+            elif current is not None and not closing:
+                current[tag] = value.strip()
+
+def normalize_row(raw, accounts, categories, default_account_id):
+    """
+    Validate a raw parsed row and map it onto the user's accounts and categories.
+
+    Args:
+        raw (dict): A row from parse_csv or parse_ofx.
+        accounts (dict): Lower-cased account name -> account id.
+        categories (dict): Lower-cased category name -> category id.
+        default_account_id (int): Account used when the row names none.
+
+    Returns:
+        dict: Transaction column values, plus the dedup 'key'.
+
+    Raises:
+        ImportRowError: If the row is invalid.
+    """
+    amount = _parse_amount(raw.get('amount'))
+    txn_date = _parse_csv_date(raw.get('date'))
+    type = (raw.get('type') or '').capitalize() or ('Expense' if amount < 0 else 'Income')
+    if type not in ('Income', 'Expense'):
+        raise ImportRowError(f"Unsupported type '{raw.get('type')}'.")
+    amount = abs(amount)
+    if amount > 1000000000000.00:
+        raise ImportRowError("Amount cannot be more than 1 Trillion.")
+
+    account_id = default_account_id
+    if raw.get('account'):
+        account_id = accounts.get(raw['account'].lower())
+        if account_id is None:
+            raise ImportRowError(f"Unknown account '{raw['account']}'.")
+    if account_id is None:
+        raise ImportRowError("No account given and no default account selected.")
+
+    budget_category_id = None
+    if raw.get('category'):
+        budget_category_id = categories.get(raw['category'].lower())
+        if budget_category_id is None:
+            raise ImportRowError(f"Unknown category '{raw['category']}'.")
+
+    description = raw.get('description') or None
+    return {
+        'type': type,
+        'amount': amount,
+        'date': txn_date,
+        'description': description[:256] if description else None,
+        'account_from_id': account_id if type == 'Expense' else None,
+        'account_to_id': account_id if type == 'Income' else None,
+        'budget_category_id': budget_category_id if type == 'Expense' else None,
+        'key': raw.get('fitid') or f"{account_id}|{txn_date}|{type}|{amount:.2f}|{description or ''}",
+    }
+
+def import_hash(user_id, key, occurrence):
+    """
+    Hash that identifies an imported row across imports of the same data.
+
+    The occurrence number tells apart identical rows within one file (two
+    equal coffees on the same day), while re-importing the file maps each row
+    to the same hash as before.
+    """
+    return hashlib.sha256(f"{user_id}|{key}|{occurrence}".encode()).hexdigest()
+
+def _flush(user_id, currency, rows):
+    """Insert one batch, skipping duplicates, and apply its deltas. Returns the inserted count."""
+    inserted = db.session.execute(
+        insert_ignoring_duplicates(Transaction, ['user_id', 'import_hash'])
+        .returning(
+            Transaction.type, Transaction.amount, Transaction.date, Transaction.account_from_id,
+            Transaction.account_to_id, Transaction.budget_category_id,
+        ),
+        [dict(row, user_id=user_id, currency=currency) for row in rows]
+    ).all()
+
+    account_deltas, category_deltas, rollup_deltas = {}, {}, {}
+    for row in inserted:
+        row_accounts, row_categories = transaction_deltas(
+            row.type, row.amount, row.account_from_id, row.account_to_id, row.budget_category_id
+        )
+        for id, amount in row_accounts.items():
+            account_deltas[id] = account_deltas.get(id, 0) + amount
+        for id, amount in row_categories.items():
+            category_deltas[id] = category_deltas.get(id, 0) + amount
+        key = (month_start(row.date), row.type, row.budget_category_id,
+               rollup_account_id(row.type, row.account_from_id, row.account_to_id))
+        amount, count = rollup_deltas.get(key, (0, 0))
+        rollup_deltas[key] = (amount + row.amount, count + 1)
+
+    apply_balance_deltas(account_deltas, category_deltas, user_id=user_id)
+    for (month, type, budget_category_id, account_id), (amount, count) in rollup_deltas.items():
+        apply_rollup_delta(user_id, month, type, amount, budget_category_id=budget_category_id,
+                           account_id=account_id, count=count)
+    if inserted:
+        bump_data_versions([user_id])
+    db.session.commit()
+    return len(inserted)
+
+def import_transactions(user, stream, file_format, default_account_id=None, batch_size=IMPORT_BATCH_SIZE, progress=None):
+    """
+    Import a CSV or OFX statement into a user's transactions.
+
+    Rows are parsed lazily, validated, and inserted batch_size at a time, so
+    memory stays bounded whatever the file size. Each batch is one commit: a
+    batched multi-row INSERT that skips rows whose import hash already exists, then
+    one UPDATE ... CASE each for account balances and budget remaining amounts.
+
+    Args:
+        user: The user importing.
+        stream: A binary file object.
+        file_format (str): 'csv' or 'ofx'.
+        default_account_id (int, optional): Account for rows that don't name one.
+        batch_size (int, optional): Rows per batch.
+        progress (callable, optional): Called with the running result after each batch.
+
+    Returns:
+        dict: processed, inserted, duplicates and errors (first MAX_REPORTED_ERRORS as (line, message)).
+    """
+    parser = parse_ofx if file_format == 'ofx' else parse_csv
+    accounts = {
+        name.lower(): id for id, name in
+        db.session.execute(select(Account.id, Account.name).where(Account.user_id == user.id)).all()
+    }
+    categories = {
+        name.lower(): id for id, name in
+        db.session.execute(select(BudgetCategory.id, BudgetCategory.name).where(BudgetCategory.user_id == user.id)).all()
+    }
+    try:
+        default_account_id = int(default_account_id) if default_account_id else None
+    except (TypeError, ValueError):
+        default_account_id = None
+    if default_account_id not in accounts.values():
+        default_account_id = None
+
+    result = {'processed': 0, 'inserted': 0, 'duplicates': 0, 'errors': [], 'error_count': 0}
+    occurrences = {}
+    batch = []
+    for line_number, raw in parser(stream):
+        result['processed'] += 1
+        try:
+            row = normalize_row(raw, accounts, categories, default_account_id)
+        except ImportRowError as e:
+            result['error_count'] += 1
+            if len(result['errors']) < MAX_REPORTED_ERRORS:
+                result['errors'].append((line_number, str(e)))
+            continue
+
+        key = row.pop('key')
+        occurrences[key] = occurrences.get(key, 0) + 1
+        row['import_hash'] = import_hash(user.id, key, occurrences[key])
+        batch.append(row)
+
+        if len(batch) >= batch_size:
+            inserted = _flush(user.id, user.currency, batch)
+            result['inserted'] += inserted
+            result['duplicates'] += len(batch) - inserted
+            batch = []
+            if progress:
+                progress(result)
+
+    if batch:
+        inserted = _flush(user.id, user.currency, batch)
+        result['inserted'] += inserted
+        result['duplicates'] += len(batch) - inserted
+        if progress:
+            progress(result)
+
+    return result
+
+@click.command('import-transactions')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--user-id', type=int, required=True, help='User to import for.')
+@click.option('--account-id', type=int, default=None, help='Default account for rows that name none.')
+@click.option('--format', 'file_format', type=click.Choice(['csv', 'ofx']), default=None, help='Defaults to the file extension.')
+@with_appcontext
+def import_transactions_command(path, user_id, account_id, file_format):
+    """Import a CSV or OFX statement for a user."""
+    from .models import User
+
+    user = db.session.get(User, user_id)
+    if user is None:
+        raise click.ClickException(f'User {user_id} not found.')
+    file_format = file_format or ('ofx' if path.lower().endswith(('.ofx', '.qfx')) else 'csv')
+
+    def report(result):
+        click.echo(f"{result['processed']} rows read, {result['inserted']} imported, "
+                   f"{result['duplicates']} duplicates, {result['error_count']} errors")
+
+    with open(path, 'rb') as stream:
+        result = import_transactions(user, stream, file_format, default_account_id=account_id, progress=report)
+    for line_number, message in result['errors']:
+        click.echo(f'Line {line_number}: {message}', err=True)
@@ -0,0 +1,116 @@
+from .models import Account, BudgetCategory, BalanceSnapshot
+from .rollups import apply_transaction_rollup
+from .money import Money
+from website import db
+from sqlalchemy import update, case, literal
+
+def _money_values(deltas):
+    # CASE branches don't take the column's type, so bind each amount as Money explicitly
+    return {id: literal(amount, Money()) for id, amount in deltas.items()}
+
+def apply_balance_deltas(account_deltas, category_deltas=None, user_id=None):
+    """
+    Add summed amounts to account balances and budget remaining amounts.
+
+    The arithmetic happens inside the UPDATE (balance = balance + delta), so
+    concurrent writers cannot lose each other's changes the way a Python
+    read-modify-write can. Each table gets a single UPDATE ... CASE for all
+    affected rows, and nothing is read first.
+
+    Args:
+        account_deltas (dict): Account id -> amount to add to current_balance.
+        category_deltas (dict, optional): Budget category id -> amount to add to remaining_amount.
+        user_id (int, optional): Only touch rows owned by this user.
+    """
+    account_deltas = {int(id): amount for id, amount in account_deltas.items() if id and amount}
+    category_deltas = {int(id): amount for id, amount in (category_deltas or {}).items() if id and amount}
+
+    if account_deltas:
+        statement = (
+            update(Account)
+            .where(Account.id.in_(account_deltas))
+            .values(current_balance=Account.current_balance + case(_money_values(account_deltas), value=Account.id))
+            .execution_options(synchronize_session=False)
+        )
+        if user_id is not None:
+            statement = statement.where(Account.user_id == user_id)
+        db.session.execute(statement)
+    if category_deltas:
+        statement = (
+            update(BudgetCategory)
+            .where(BudgetCategory.id.in_(category_deltas))
+            .values(remaining_amount=BudgetCategory.remaining_amount + case(_money_values(category_deltas), value=BudgetCategory.id))
+            .execution_options(synchronize_session=False)
+        )
+        if user_id is not None:
+            statement = statement.where(BudgetCategory.user_id == user_id)
+        db.session.execute(statement)
+
+def adjust_snapshots(account_deltas, transaction_id):
+    """
+    Carry a change to an existing transaction into the balance snapshots that include it.
+
+    Snapshots cover every transaction up to their last_transaction_id, so
+    editing or deleting an older transaction has to move those snapshots by
+    the same amount, or balances derived from them would drift.
+
+    Args:
+        account_deltas (dict): Account id -> amount added to the balance.
+        transaction_id (int): The id of the changed transaction.
+    """
+    account_deltas = {int(id): amount for id, amount in account_deltas.items() if id and amount}
+    if account_deltas:
+        db.session.execute(
+            update(BalanceSnapshot)
+            .where(BalanceSnapshot.account_id.in_(account_deltas), BalanceSnapshot.last_transaction_id >= transaction_id)
+            .values(balance=BalanceSnapshot.balance + case(_money_values(account_deltas), value=BalanceSnapshot.account_id))
+            .execution_options(synchronize_session=False)
+        )
+
+def transaction_deltas(type, amount, account_from_id=None, account_to_id=None, budget_category_id=None):
+    """
+    Get the balance changes a transaction causes.
+
+    Income credits account_to, expenses debit account_from and the budget
+    category, and transfers move money from account_from to account_to.
+
+    Returns:
+        tuple: (account deltas, budget category deltas) as id -> amount dicts.
+    """
+    account_deltas = {}
+    category_deltas = {}
+    if type == 'Income':
+        account_deltas[account_to_id] = amount
+    elif type == 'Expense':
+        account_deltas[account_from_id] = -amount
+        if budget_category_id:
+            category_deltas[budget_category_id] = -amount
+    elif type == 'Transfer':
+        account_deltas[account_from_id] = -amount
+        account_deltas[account_to_id] = account_deltas.get(account_to_id, 0) + amount
+    return account_deltas, category_deltas
+
+def post_transaction(transaction, sign=1):
+    """
+    Apply (or with sign=-1, revert) a transaction's effect on balances and rollups.
+
+    Everything happens on the current session, so it commits or rolls back
+    together with the write to the transaction row itself.
+
+    Args:
+        transaction: Any object with user_id, date, type, amount, account_from_id,
+            account_to_id and budget_category_id attributes, and id once it exists.
+        sign (int, optional): 1 to post the transaction, -1 to revert it.
+    """
+    account_deltas, category_deltas = transaction_deltas(
+        transaction.type,
+        sign * transaction.amount,
+        account_from_id=transaction.account_from_id,
+        account_to_id=transaction.account_to_id,
+        budget_category_id=transaction.budget_category_id,
+    )
+    apply_balance_deltas(account_deltas, category_deltas, user_id=transaction.user_id)
+    if getattr(transaction, 'id', None):
+        # New rows get ids above every snapshot, only existing ones can be inside one
+        adjust_snapshots(account_deltas, transaction.id)
+    apply_transaction_rollup(transaction, sign=sign)
@@ -2,7 +2,9 @@ from website import db
 from flask_login import UserMixin
 from datetime import datetime
 import pytz
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, literal_column
+from sqlalchemy.dialects import sqlite
+from .money import Money
 
 class User(db.Model, UserMixin):
     id = db.Column(db.Integer, primary_key=True)
@@ -14,6 +16,7 @@ class User(db.Model, UserMixin):
     time_zone = db.Column(db.String(64), nullable=False, default='UTC')  # Default to UTC
     date_created = db.Column(db.DateTime(timezone=True), server_default=func.now())  # Date on which user registered
     currency = db.Column(db.String(8), nullable=False, default='USD')  # User's preferred currency
+    data_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Bumped on every change to the user's data
 
     # Relationships
     subscriptions = db.relationship('Subscription', backref='user', lazy='dynamic')
@@ -33,16 +36,20 @@ class User(db.Model, UserMixin):
 
 class Subscription(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), index=True)
     name = db.Column(db.String(128), nullable=False)  # Name of the subscription
-    amount = db.Column(db.Float, nullable=False)  # Amount of the subscription
+    amount = db.Column(Money, nullable=False)  # Amount of the subscription
     frequency = db.Column(db.String(32), nullable=False)  # Frequency: daily, weekly, biweekly, monthly, yearly, etc.
     auto_add_transaction = db.Column(db.Boolean, nullable=False, default=False)  # Boolean to add subscription transaction automatically. 
-    account_id = db.Column(db.Integer, db.ForeignKey('account.id'))  # Account from which to charge
+    account_id = db.Column(db.Integer, db.ForeignKey('account.id'), index=True)  # Account from which to charge
     last_payment_date = db.Column(db.Date, nullable=True)  # Date of the last payment
     next_payment_date = db.Column(db.Date, nullable=False)  # Date of the next payment
     currency = db.Column(db.String(8), nullable=False, default='USD')
 
+    __table_args__ = (
+        db.Index('ix_subscription_auto_add_transaction_next_payment_date', 'auto_add_transaction', 'next_payment_date'),  # Scheduler scan
+    )
+
     # Relationships
     transactions = db.relationship('Transaction', backref='subscription', lazy='dynamic')
 
@@ -51,12 +58,12 @@ class Subscription(db.Model):
 
 class Account(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), index=True)
     name = db.Column(db.String(128), nullable=False)  # Name of the account
     type = db.Column(db.String(64))  # Type of account: checking, savings, goal
-    starting_balance = db.Column(db.Float, nullable=False)  # Initial balance of the account
-    current_balance = db.Column(db.Float)  # Current balance of the account
-    goal_amount = db.Column(db.Float)  # Goal amount for a savings account
+    starting_balance = db.Column(Money, nullable=False)  # Initial balance of the account
+    current_balance = db.Column(Money)  # Current balance of the account
+    goal_amount = db.Column(Money)  # Goal amount for a savings account
     currency = db.Column(db.String(8), nullable=False, default='USD')
 
     # Relationships
@@ -70,17 +77,21 @@ class Account(db.Model):
 
 class BudgetCategory(db.Model):
     id = db.Column(db.Integer, primary_key=True)  # Unique id for all categories
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'))  # Connection to a user
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), index=True)  # Connection to a user
     name = db.Column(db.String(128), nullable=False)  # Name of the budget category
     description = db.Column(db.String(256))  # Description of the budget category
-    budget_amount = db.Column(db.Float, nullable=False)  # Budget amount for the category
-    remaining_amount = db.Column(db.Float, nullable=False)  # Remaining Budget Amount for the catrgory
+    budget_amount = db.Column(Money, nullable=False)  # Budget amount for the category
+    remaining_amount = db.Column(Money, nullable=False)  # Remaining Budget Amount for the catrgory
     auto_reset = db.Column(db.Boolean, default=False)  # Boolean to reset budgets automatically.
     time_period = db.Column(db.String(32), nullable=False)  # Time period for the budget (e.g., monthly, yearly)
     next_date = db.Column(db.Date, nullable=False)  # Store the date on which budget should be reseted.
     last_reset = db.Column(db.Date, nullable=False)  # Store when the budgeted amount was last reseted
     currency = db.Column(db.String(8), nullable=False, default='USD')
 
+    __table_args__ = (
+        db.Index('ix_budget_category_auto_reset_next_date', 'auto_reset', 'next_date'),  # Scheduler scan
+    )
+
     # Relationships
     transactions = db.relationship('Transaction', backref='budget_category', lazy='dynamic')
 
@@ -90,16 +101,27 @@ class BudgetCategory(db.Model):
 class Transaction(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
-    account_from_id = db.Column(db.Integer, db.ForeignKey('account.id'), nullable=True)
-    account_to_id = db.Column(db.Integer, db.ForeignKey('account.id'), nullable=True)
+    account_from_id = db.Column(db.Integer, db.ForeignKey('account.id'), index=True, nullable=True)
+    account_to_id = db.Column(db.Integer, db.ForeignKey('account.id'), index=True, nullable=True)
     type = db.Column(db.String(64), nullable=False)  # Type of transaction: income, expense, transfer
-    amount = db.Column(db.Float, nullable=False)  # Amount of the transaction
+    amount = db.Column(Money, nullable=False)  # Amount of the transaction
     description = db.Column(db.String(256), nullable=True)  # Description of the transaction
     date = db.Column(db.Date, nullable=False)  # Date of the transaction
     created_on = db.Column(db.DateTime(timezone=True), default=func.now())  # Creation date of the transaction
-    budget_category_id = db.Column(db.Integer, db.ForeignKey('budget_category.id'), nullable=True)
-    subscription_id = db.Column(db.Integer, db.ForeignKey('subscription.id'), nullable=True)
+    budget_category_id = db.Column(db.Integer, db.ForeignKey('budget_category.id'), index=True, nullable=True)
+    subscription_id = db.Column(db.Integer, db.ForeignKey('subscription.id'), index=True, nullable=True)
+    auto_posted = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())  # Posted by the scheduler for subscription_id
     currency = db.Column(db.String(8), nullable=False, default='USD')
+    import_hash = db.Column(db.String(64), nullable=True)  # Identifies rows imported from a statement, for dedup
+
+    __table_args__ = (
+        db.Index('ix_transaction_user_id_date_type', 'user_id', 'date', 'type'),  # Recent transactions newest first, and period summaries
+        db.Index(
+            'uq_transaction_subscription_id_date_auto_posted', 'subscription_id', 'date', unique=True,
+            sqlite_where=auto_posted, postgresql_where=auto_posted,
+        ),  # One automatic payment per period, manual entries aren't limited
+        db.UniqueConstraint('user_id', 'import_hash', name='uq_transaction_user_id_import_hash'),  # Re-imports skip existing rows
+    )
 
     # Relationships
     loan_payments = db.relationship('LoanPayment', backref='transaction', lazy='dynamic')
@@ -108,11 +130,56 @@ class Transaction(db.Model):
     def __repr__(self):
         return f'<Transaction {self.type} {self.amount} {self.currency}>'
 
+class MonthlyRollup(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    month = db.Column(db.Date, nullable=False)  # First day of the month the totals belong to
+    type = db.Column(db.String(64), nullable=False)  # Type of transaction: income, expense, transfer
+    budget_category_id = db.Column(db.Integer, db.ForeignKey('budget_category.id'), nullable=True)
+    account_id = db.Column(db.Integer, db.ForeignKey('account.id'), nullable=True)  # Account to for income, account from otherwise
+    total_amount = db.Column(Money, nullable=False, default=0)  # Sum of transaction amounts
+    transaction_count = db.Column(db.Integer, nullable=False, default=0)  # Number of transactions summed
+
+    __table_args__ = (
+        # NULLs never collide in a unique key, so the optional ids are compared as 0
+        db.Index(
+            'uq_monthly_rollup_key', 'user_id', 'month', 'type',
+            func.coalesce(budget_category_id, literal_column('0')), func.coalesce(account_id, literal_column('0')),
+            unique=True,
+        ),
+    )
+
+    def __repr__(self):
+        return f'<MonthlyRollup {self.month} {self.type} {self.total_amount}>'
+
+class SchedulerLock(db.Model):
+    name = db.Column(db.String(64), primary_key=True)  # Name of the lease, one row per singleton job runner
+    holder = db.Column(db.String(128), nullable=False)  # host:pid:token of the process holding the lease
+    expires_at = db.Column(db.DateTime, nullable=False)  # UTC time after which another process may take over
+
+    def __repr__(self):
+        return f'<SchedulerLock {self.name} held by {self.holder}>'
+
+class BalanceSnapshot(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    account_id = db.Column(db.Integer, db.ForeignKey('account.id'), nullable=False)
+    last_transaction_id = db.Column(db.Integer, nullable=False)  # Highest transaction id folded into the balance, 0 for none
+    balance = db.Column(Money, nullable=False)  # Balance of the account after all transactions up to last_transaction_id
+    created_on = db.Column(db.DateTime(timezone=True), default=func.now())
+
+    __table_args__ = (
+        db.UniqueConstraint('account_id', 'last_transaction_id', name='uq_balance_snapshot_account_id_last_transaction_id'),
+    )
+
+    def __repr__(self):
+        return f'<BalanceSnapshot {self.account_id} @{self.last_transaction_id} {self.balance}>'
+
 class Loan(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), index=True)
     counterparty_name = db.Column(db.String(128))  # Name of the loan counterparty
-    amount = db.Column(db.Float, nullable=False)  # Amount of the loan
+    amount = db.Column(Money, nullable=False)  # Amount of the loan
     interest_rate = db.Column(db.Float)  # Interest rate of the loan
     start_date = db.Column(db.Date)  # Start date of the loan
     end_date = db.Column(db.Date)  # End date of the loan
@@ -127,9 +194,9 @@ class Loan(db.Model):
 
 class Debt(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), index=True)
     type = db.Column(db.String(128))  # Type of debt: student loan, home loan, etc.
-    amount = db.Column(db.Float, nullable=False)  # Amount of the debt
+    amount = db.Column(Money, nullable=False)  # Amount of the debt
     interest_rate = db.Column(db.Float, nullable=False)  # Interest rate of the debt
     start_date = db.Column(db.Date)  # Start date of the debt
     end_date = db.Column(db.Date)  # End date of the debt
@@ -143,10 +210,10 @@ class Debt(db.Model):
 
 class CreditCard(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), index=True)
     name = db.Column(db.String(128))  # Name of the credit card
-    limit = db.Column(db.Float)  # Monthly limit of the credit card
-    current_balance = db.Column(db.Float)  # Current balance of the credit card
+    limit = db.Column(Money)  # Monthly limit of the credit card
+    current_balance = db.Column(Money)  # Current balance of the credit card
     interest_rate = db.Column(db.Float)  # APR of the card 
     statement_due_date = db.Column(db.Date)  # Due date of the credit card statement
     minimum_payment_due_date = db.Column(db.Date)  # Due date for the minimum payment
@@ -161,22 +228,40 @@ class CreditCard(db.Model):
 
 class CreditCardPayment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), index=True)
     account_id = db.Column(db.Integer, db.ForeignKey('account.id'), nullable=False)  # Account used for payment
     credit_card_id = db.Column(db.Integer, db.ForeignKey('credit_card.id'), nullable=False)  # Credit card being paid
     transaction_id = db.Column(db.Integer, db.ForeignKey('transaction.id'), nullable=False)  # Related transaction
-    amount = db.Column(db.Float, nullable=False)  # Amount paid
+    amount = db.Column(Money, nullable=False)  # Amount paid
     date = db.Column(db.Date)  # Date of the payment
 
     def __repr__(self):
         return f'<CreditCardPayment {self.amount}>'
 
+class CreditCardStatement(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    credit_card_id = db.Column(db.Integer, db.ForeignKey('credit_card.id'), nullable=False)  # Credit card the statement is for
+    closing_date = db.Column(db.Date, nullable=False)  # Last day of the billing cycle
+    interest = db.Column(Money, nullable=False)  # Interest accrued on the unpaid part of the previous statement
+    statement_balance = db.Column(Money, nullable=False)  # Balance at closing, including interest
+    minimum_payment = db.Column(Money, nullable=False)  # Minimum due for this statement
+    payment_due_date = db.Column(db.Date)  # Due date for the minimum payment
+    created_on = db.Column(db.DateTime(timezone=True), default=func.now())
+
+    __table_args__ = (
+        db.UniqueConstraint('credit_card_id', 'closing_date', name='uq_credit_card_statement_credit_card_id_closing_date'),  # One statement per cycle
+    )
+
+    def __repr__(self):
+        return f'<CreditCardStatement {self.credit_card_id} {self.closing_date} {self.statement_balance}>'
+
 class LoanPayment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), index=True)
     loan_id = db.Column(db.Integer, db.ForeignKey('loan.id'), nullable=False)  # Loan being paid
     transaction_id = db.Column(db.Integer, db.ForeignKey('transaction.id'), nullable=False)  # Related transaction
-    amount = db.Column(db.Float, nullable=False)  # Amount paid
+    amount = db.Column(Money, nullable=False)  # Amount paid
     date = db.Column(db.Date)  # Date of the payment
 
     def __repr__(self):
@@ -184,21 +269,33 @@ class LoanPayment(db.Model):
 
 class DebtPayment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), index=True)
     debt_id = db.Column(db.Integer, db.ForeignKey('debt.id'), nullable=False)  # Debt being paid
     transaction_id = db.Column(db.Integer, db.ForeignKey('transaction.id'), nullable=False)  # Related transaction
-    amount = db.Column(db.Float, nullable=False)  # Amount paid
+    amount = db.Column(Money, nullable=False)  # Amount paid
     date = db.Column(db.Date)  # Date of the payment
 
     def __repr__(self):
         return f'<DebtPayment {self.amount}>'
 
+# SQLite's CURRENT_TIMESTAMP stores whole seconds as text. Binding datetimes in the
+# same format keeps a value read back from such a column equal to the stored one.
+SQLITE_SECONDS = sqlite.DATETIME(storage_format='%(year)04d-%(month)02d-%(day)02d %(hour)02d:%(minute)02d:%(second)02d')
+
 class Notification(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
     message = db.Column(db.String(256))
-    created_on = db.Column(db.DateTime(timezone=True), default=func.now())
+    created_on = db.Column(db.DateTime(timezone=True).with_variant(SQLITE_SECONDS, 'sqlite'), default=func.now())  # Compared in page cursors
     read = db.Column(db.Boolean, default=False)
+    kind = db.Column(db.String(32), nullable=True)  # Rule that raised it: budget_exceeded, subscription_due, ...
+    dedup_key = db.Column(db.String(128), nullable=True)  # Identifies what it is about, so each event notifies once
+
+    __table_args__ = (
+        db.Index('ix_notification_user_id_read_created_on', 'user_id', 'read', 'created_on'),  # Unread counts and unread lists, newest first
+        db.Index('ix_notification_user_id_created_on', 'user_id', 'created_on'),  # Full lists, newest first
+        db.UniqueConstraint('user_id', 'dedup_key', name='uq_notification_user_id_dedup_key'),  # Re-runs skip notifications already sent
+    )
 
     def __repr__(self):
         return f'<Notification {self.message[:20]}>'
@@ -0,0 +1,86 @@
+from sqlalchemy.types import TypeDecorator, BigInteger
+from decimal import Decimal, ROUND_HALF_UP
+
+# Minor-unit exponent per supported currency (cents for USD, none for JPY)
+CURRENCY_EXPONENTS = {
+    'USD': 2, 'EUR': 2, 'GBP': 2, 'INR': 2, 'JPY': 0, 'AUD': 2,
+    'CAD': 2, 'CHF': 2, 'CNY': 2, 'SEK': 2, 'NZD': 2,
+}
+DEFAULT_EXPONENT = 2
+
+# Money columns share one scale, the largest exponent above, so every amount in
+# a column is comparable and SUM() needs no per-row conversion.
+MONEY_SCALE = max(CURRENCY_EXPONENTS.values())
+
+def currency_exponent(currency):
+    """
+    Get the number of minor-unit digits for a currency.
+
+    Args:
+        currency (str): ISO currency code.
+
+    Returns:
+        int: The exponent, DEFAULT_EXPONENT for unknown currencies.
+    """
+    return CURRENCY_EXPONENTS.get(currency, DEFAULT_EXPONENT)
+
+def to_minor(amount, exponent=MONEY_SCALE):
+    """
+    Convert an amount to an integer number of minor units, rounding half up.
+
+    Args:
+        amount (float | Decimal | int | str): The amount in major units.
+        exponent (int, optional): Minor-unit digits.
+
+    Returns:
+        int: The amount in minor units.
+
+    Raises:
+        ValueError: If the amount is NaN or infinite.
+    """
+    value = Decimal(str(amount))
+    if not value.is_finite():
+        raise ValueError(f"Cannot store non-finite money amount {amount!r}.")
+    return int((value * (10 ** exponent)).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+def from_minor(minor, exponent=MONEY_SCALE):
+    """
+    Convert integer minor units back to major units.
+
+    Returns:
+        float: The amount in major units, exact to the column scale.
+    """
+    return minor / (10 ** exponent)
+
+def round_money(amount, currency):
+    """
+    Round an amount to what the currency can represent (whole yen, cents, ...).
+
+    Args:
+        amount (float): The amount in major units.
+        currency (str): ISO currency code.
+
+    Returns:
+        float: The rounded amount.
+    """
+    exponent = currency_exponent(currency)
+    return from_minor(to_minor(amount, exponent), exponent)
+
+class Money(TypeDecorator):
+    """
+    A money amount stored as a BIGINT count of minor units at MONEY_SCALE.
+
+    Python code keeps working in major units (floats), but every value is
+    rounded to the minor unit on the way in, so repeated += / -= updates cannot
+    drift, and SUM() and arithmetic in SQL run on exact integers.
+    Values compared against or added to a Money column are converted too.
+    """
+
+    impl = BigInteger  # A 32-bit INTEGER would cap amounts at about 21 million
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else to_minor(value)
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else from_minor(value)
@@ -0,0 +1,223 @@
+from .models import User, Account, BudgetCategory, Subscription, CreditCard, Notification
+from .statements import latest_statements
+from .forecast import forecast_cash_flows, first_below, FORECAST_BATCH_SIZE
+from .cache import bump_data_versions
+from .recurrence import to_dates
+from .utils import get_local_dates, insert_ignoring_duplicates
+from website import db
+from sqlalchemy import select, update, func, type_coerce, tuple_, literal, Float, BigInteger
+from datetime import datetime, timedelta, timezone
+
+LOW_BUDGET_SHARE = 0.1  # Warn once less than this share of a budget is left
+CARD_DUE_NOTICE_DAYS = 3  # Remind about a card's minimum payment this many days ahead
+OVERDRAFT_HORIZON_MONTHS = 1
+MESSAGE_LENGTH = 256
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+def _notification(user_id, kind, key, message):
+    return {
+        'user_id': user_id,
+        'kind': kind,
+        'dedup_key': f'{kind}:{key}',
+        'message': message[:MESSAGE_LENGTH],
+        'read': False,
+    }
+
+def budget_notifications(local_date, user_ids):
+    """Budgets overspent or nearly used up, once per budget period."""
+    remaining = type_coerce(BudgetCategory.remaining_amount, BigInteger)  # Minor units, so the share isn't read as money
+    budget = type_coerce(BudgetCategory.budget_amount, BigInteger)
+    rows = db.session.execute(
+        select(BudgetCategory.id, BudgetCategory.user_id, BudgetCategory.name, BudgetCategory.remaining_amount, BudgetCategory.next_date)
+        .where(
+            BudgetCategory.user_id.in_(user_ids),
+            BudgetCategory.budget_amount > 0,
+            remaining < budget * literal(LOW_BUDGET_SHARE, Float),
+        )
+    ).all()
+    notifications = []
+    for row in rows:
+        if row.remaining_amount < 0:
+            notifications.append(_notification(
+                row.user_id, 'budget_exceeded', f'{row.id}:{row.next_date}',
+                f"You are {-row.remaining_amount:.2f} over your {row.name} budget.",
+            ))
+        else:
+            notifications.append(_notification(
+                row.user_id, 'budget_low', f'{row.id}:{row.next_date}',
+                f"Only {row.remaining_amount:.2f} left in your {row.name} budget.",
+            ))
+    return notifications
+
+def subscription_notifications(local_date, user_ids):
+    """Subscriptions charged tomorrow."""
+    tomorrow = local_date + timedelta(days=1)
+    rows = db.session.execute(
+        select(Subscription.id, Subscription.user_id, Subscription.name, Subscription.amount)
+        .where(Subscription.user_id.in_(user_ids), Subscription.next_payment_date == tomorrow)
+    ).all()
+    return [
+        _notification(row.user_id, 'subscription_due', f'{row.id}:{tomorrow}', f"{row.name} renews tomorrow for {row.amount:.2f}.")
+        for row in rows
+    ]
+
+def card_notifications(local_date, user_ids):
+    """Credit card minimum payments due within CARD_DUE_NOTICE_DAYS."""
+    latest = latest_statements()
+    rows = db.session.execute(
+        select(CreditCard.id, CreditCard.user_id, CreditCard.name, CreditCard.minimum_payment_due_date, latest.c.minimum_payment)
+        .outerjoin(latest, latest.c.credit_card_id == CreditCard.id)
+        .where(
+            CreditCard.user_id.in_(user_ids),
+            CreditCard.current_balance > 0,
+            CreditCard.minimum_payment_due_date.between(local_date, local_date + timedelta(days=CARD_DUE_NOTICE_DAYS)),
+        )
+    ).all()
+    notifications = []
+    for row in rows:
+        amount = f" of {row.minimum_payment:.2f}" if row.minimum_payment else ''
+        notifications.append(_notification(
+            row.user_id, 'card_due', f'{row.id}:{row.minimum_payment_due_date}',
+            f"The minimum payment{amount} on {row.name} is due {row.minimum_payment_due_date:%b %d}.",
+        ))
+    return notifications
+
+def overdraft_notifications(local_date, user_ids):
+    """Users whose projected total balance goes negative within OVERDRAFT_HORIZON_MONTHS."""
+    notifications = []
+    account_holders = db.session.execute(
+        select(Account.user_id).distinct().where(Account.user_id.in_(user_ids)).order_by(Account.user_id)
+    ).scalars().all()
+    for i in range(0, len(account_holders), FORECAST_BATCH_SIZE):
+        batch = account_holders[i:i + FORECAST_BATCH_SIZE]
+        rows, first_dates, lowest = first_below(forecast_cash_flows(batch, local_date, OVERDRAFT_HORIZON_MONTHS), 0)
+        for row, first_date, lowest_balance in zip(rows.tolist(), to_dates(first_dates), lowest.tolist()):
+            notifications.append(_notification(
+                batch[row], 'overdraft', first_date,
+                f"Your balance is projected to go below zero on {first_date:%b %d}, "
+                f"reaching {lowest_balance:.2f}.",
+            ))
+    return notifications
+
+RULES = (budget_notifications, subscription_notifications, card_notifications, overdraft_notifications)
+
+def generate_notifications(app, time_zones=None, should_continue=None):
+    """
+    Evaluate every notification rule for all users and store what they raise.
+
+    Users are grouped by their local date, and each rule runs one query over
+    all users on that date. The projected overdraft rule forecasts users with
+    accounts FORECAST_BATCH_SIZE at a time. Notifications are inserted in one
+    executemany, and the unique (user_id, dedup_key) constraint skips any
+    already sent for the same event, so the job can run as often as needed.
+
+    Args:
+        app: The Flask application instance.
+        time_zones (iterable, optional): Only notify users in these time zones.
+        should_continue (callable, optional): Checked before each local date, the job stops once it returns False.
+    """
+    with app.app_context():
+        now_utc = datetime.now(timezone.utc)
+        if time_zones is None:
+            time_zones = db.session.execute(select(User.time_zone).distinct()).scalars().all()
+
+        for local_date, zones in get_local_dates(time_zones, now_utc).items():
+            if should_continue is not None and not should_continue():
+                return
+            user_ids = select(User.id).where(User.time_zone.in_(zones))
+            notifications = [notification for rule in RULES for notification in rule(local_date, user_ids)]
+            if not notifications:
+                continue
+            inserted = db.session.execute(
+                insert_ignoring_duplicates(Notification, ['user_id', 'dedup_key']).returning(Notification.user_id),
+                notifications
+            ).scalars().all()
+            bump_data_versions(inserted)
+            db.session.commit()
+
+def count_unread(user_id):
+    """
+    Count a user's unread notifications, one range scan of the (user_id, read, created_on) index.
+
+    Args:
+        user_id (int): The id of the user.
+
+    Returns:
+        int: The number of unread notifications.
+    """
+    return db.session.execute(
+        select(func.count()).select_from(Notification)
+        .where(Notification.user_id == user_id, Notification.read == False)
+    ).scalar()
+
+def encode_cursor(row):
+    """Encode the position of a notification row in the (created_on, id) ordering."""
+    return f"{row.created_on.isoformat()}.{row.id}"
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor produced by encode_cursor.
+
+    Returns:
+        tuple: (created_on, id), or None if the cursor is missing or malformed.
+    """
+    created_on, _, id_part = (cursor or '').rpartition('.')
+    if not id_part.isdigit():
+        return None
+    try:
+        return datetime.fromisoformat(created_on), int(id_part)
+    except ValueError:
+        return None
+
+def get_notifications_page(user_id, unread_only=False, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    Get one page of a user's notifications, newest first, using keyset pagination.
+
+    Pages seek past the last (created_on, id) of the previous page, so they
+    are read in order from the (user_id, read, created_on) index for unread
+    lists and the (user_id, created_on) index otherwise, with no sort.
+
+    Args:
+        user_id (int): The id of the user.
+        unread_only (bool, optional): Leave out notifications already read.
+        cursor (str, optional): The next_cursor of the previous page.
+        limit (int, optional): Page size, capped at MAX_PAGE_SIZE.
+
+    Returns:
+        dict: 'notifications' (list of read-only rows) and 'next_cursor' (None on the last page).
+    """
+    limit = max(1, min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE))
+    statement = (
+        select(Notification.id, Notification.kind, Notification.message, Notification.created_on, Notification.read)
+        .where(Notification.user_id == user_id)
+    )
+    if unread_only:
+        statement = statement.where(Notification.read == False)
+    position = decode_cursor(cursor)
+    if position:
+        statement = statement.where(tuple_(Notification.created_on, Notification.id) < position)
+
+    rows = db.session.execute(
+        statement.order_by(Notification.created_on.desc(), Notification.id.desc()).limit(limit + 1)
+    ).all()
+    return {
+        'notifications': rows[:limit],
+        'next_cursor': encode_cursor(rows[limit - 1]) if len(rows) > limit else None,
+    }
+
+def mark_read(user_id, ids=None):
+    """
+    Mark notifications as read in one UPDATE.
+
+    Args:
+        user_id (int): The id of the user.
+        ids (list, optional): Notification ids, all unread ones if omitted.
+
+    Returns:
+        int: The number of notifications marked.
+    """
+    statement = update(Notification).where(Notification.user_id == user_id, Notification.read == False)
+    if ids is not None:
+        statement = statement.where(Notification.id.in_(ids))
+    return db.session.execute(statement.values(read=True).execution_options(synchronize_session=False)).rowcount
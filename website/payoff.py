@@ -0,0 +1,234 @@
+from .models import Loan, Debt, CreditCard
+from .amortization import get_amortization_summaries
+from .statements import card_minimum_payments
+from .recurrence import add_months, to_datetime64, to_dates
+from website import db
+from sqlalchemy import select
+from types import SimpleNamespace
+import numpy as np
+
+STRATEGIES = ('avalanche', 'snowball', 'custom')
+MAX_MONTHS = 600  # Plans that take longer than 50 years count as never paid off
+MAX_BUDGET_LEVELS = 500
+PAID_OFF = 0.005  # Balances below half a cent count as cleared
+
+def load_payoff_debts(user_id, today):
+    """
+    Collect everything a user owes: debts, loans taken and credit card balances.
+
+    Loans and debts with dates start from their remaining principal and have
+    their scheduled payment as minimum, the rest start from their amount with
+    no minimum.
+
+    Args:
+        user_id (int): The id of the user.
+        today (datetime.date): The user's current date.
+
+    Returns:
+        list: SimpleNamespace(key, name, balance, annual_rate, minimum) per
+            outstanding balance, with keys like 'debt:3', 'loan:1' or 'card:2'.
+    """
+    summaries = get_amortization_summaries(user_id, today)
+    debts = []
+
+    def add(kind, id, name, amount, rate, summary=None):
+        balance = summary.remaining_principal if summary else float(amount or 0)
+        minimum = min(summary.payment, balance) if summary else 0.0
+        if balance > PAID_OFF:
+            debts.append(SimpleNamespace(key=f'{kind}:{id}', name=name, balance=balance, annual_rate=rate or 0, minimum=minimum))
+
+    for row in db.session.execute(
+        select(Debt.id, Debt.type, Debt.amount, Debt.interest_rate).where(Debt.user_id == user_id)
+    ).all():
+        add('debt', row.id, row.type, row.amount, row.interest_rate, summaries['debts'].get(row.id))
+    for row in db.session.execute(
+        select(Loan.id, Loan.counterparty_name, Loan.amount, Loan.interest_rate)
+        .where(Loan.user_id == user_id, Loan.type != 'Given')
+    ).all():
+        add('loan', row.id, row.counterparty_name, row.amount, row.interest_rate, summaries['loans'].get(row.id))
+    cards = db.session.execute(
+        select(CreditCard.id, CreditCard.name, CreditCard.current_balance, CreditCard.interest_rate)
+        .where(CreditCard.user_id == user_id, CreditCard.current_balance > 0)
+    ).all()
+    for row, minimum in zip(cards, card_minimum_payments([row.current_balance for row in cards])):
+        debts.append(SimpleNamespace(
+            key=f'card:{row.id}', name=row.name, balance=float(row.current_balance),
+            annual_rate=row.interest_rate or 0, minimum=float(minimum),
+        ))
+    return debts
+
+def payoff_order(debts, strategy, custom_order=None):
+    """
+    Get the order in which extra money goes to the debts.
+
+    Avalanche targets the highest rate first, snowball the smallest balance.
+    Custom follows the given keys, then avalanche for anything not listed.
+
+    Args:
+        debts (list): As returned by load_payoff_debts.
+        strategy (str): One of STRATEGIES.
+        custom_order (list, optional): Debt keys, for the custom strategy.
+
+    Returns:
+        array: Indexes into debts.
+
+    Raises:
+        ValueError: If the strategy is unknown.
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f'Unknown strategy {strategy!r}.')
+    rates = np.array([debt.annual_rate for debt in debts], dtype=float)
+    balances = np.array([debt.balance for debt in debts], dtype=float)
+    if strategy == 'snowball':
+        return np.lexsort((-rates, balances))
+    avalanche = np.lexsort((balances, -rates))
+    if strategy == 'avalanche':
+        return avalanche
+    positions = {key: position for position, key in enumerate(custom_order or [])}
+    rank = np.array([positions.get(debt.key, len(positions)) for debt in debts])
+    return avalanche[np.argsort(rank[avalanche], kind='stable')]
+
+def simulate_payoff(balances, annual_rates, minimums, order, budgets, max_months=MAX_MONTHS, history=False):
+    """
+    Simulate paying debts down month by month for one or many monthly budgets.
+
+    Each month interest is added, every minimum is paid, and whatever is left
+    of the budget goes to the debts in order. A cleared debt's minimum rolls
+    into the extra for the next one. Budgets below the sum of minimums pay
+    each minimum pro rata. Every month is one array step across all budgets
+    and debts, so sweeping hundreds of budgets costs about as much as one.
+
+    Args:
+        balances (array): Starting balance of each debt.
+        annual_rates (array): Yearly interest rates in percent.
+        minimums (array): Minimum monthly payment of each debt.
+        order (array): Indexes of the debts, first to receive extra money first.
+        budgets (array | float): Monthly amounts to simulate.
+        max_months (int, optional): Give up after this many months.
+        history (bool, optional): Also return the payments and balances of every month.
+
+    Returns:
+        SimpleNamespace: months (to clear everything, -1 if never), payoff_months
+            (per budget and debt, -1 if never), total_interest and total_paid per
+            budget, and with history, payments and balances shaped (months, budgets, debts).
+    """
+    budgets = np.atleast_1d(np.asarray(budgets, dtype=float))
+    rates = np.asarray(annual_rates, dtype=float) / 1200
+    minimums = np.asarray(minimums, dtype=float)
+    order = np.asarray(order, dtype=np.int64)
+    balance = np.tile(np.asarray(balances, dtype=float), (len(budgets), 1))
+    payoff_months = np.where(balance > PAID_OFF, -1, 0)
+    total_interest = np.zeros(len(budgets))
+    total_paid = np.zeros(len(budgets))
+    payments, balances_by_month = [], []
+
+    month = 0
+    while month < max_months and (balance > PAID_OFF).any():
+        interest = balance * rates
+        balance += interest
+        total_interest += interest.sum(axis=1)
+
+        minimum = np.minimum(minimums, balance)
+        due = minimum.sum(axis=1)
+        scale = np.divide(budgets, due, out=np.ones_like(budgets), where=due > budgets)
+        payment = minimum * np.minimum(scale, 1)[:, None]
+        extra = np.maximum(budgets - payment.sum(axis=1), 0)
+
+        # Fill the remaining balances in order until the extra runs out
+        left = (balance - payment)[:, order]
+        before = np.cumsum(left, axis=1) - left
+        payment[:, order] += np.clip(extra[:, None] - before, 0, left)
+
+        balance -= payment
+        balance[balance < PAID_OFF] = 0
+        total_paid += payment.sum(axis=1)
+        month += 1
+        payoff_months[(payoff_months < 0) & (balance == 0)] = month
+        if history:
+            payments.append(payment)
+            balances_by_month.append(balance.copy())
+
+    months = np.where((payoff_months >= 0).all(axis=1), payoff_months.max(axis=1, initial=0), -1)
+    result = SimpleNamespace(
+        months=months, payoff_months=payoff_months,
+        total_interest=np.round(total_interest, 2), total_paid=np.round(total_paid, 2),
+    )
+    if history:
+        shape = (0, len(budgets), len(minimums))
+        result.payments = np.round(np.array(payments), 2) if payments else np.zeros(shape)
+        result.balances = np.round(np.array(balances_by_month), 2) if payments else np.zeros(shape)
+    return result
+
+def plan_payoff(debts, budget, today, strategy='avalanche', custom_order=None):
+    """
+    Build the month-by-month plan of paying off debts with a monthly budget.
+
+    Args:
+        debts (list): As returned by load_payoff_debts.
+        budget (float): Amount to spend on debts each month.
+        today (datetime.date): Payments fall monthly from a month after this date.
+        strategy (str, optional): One of STRATEGIES.
+        custom_order (list, optional): Debt keys, for the custom strategy.
+
+    Returns:
+        dict: order (debt keys), minimum_total, months, payoff_date (None if
+            never), total_interest, total_paid, per debt payoff dates, and the
+            schedule as a list of {date, payments, balances} per month.
+    """
+    order = payoff_order(debts, strategy, custom_order)
+    result = simulate_payoff(
+        [debt.balance for debt in debts], [debt.annual_rate for debt in debts],
+        [debt.minimum for debt in debts], order, budget, history=True,
+    )
+    month_dates = to_dates(add_months(to_datetime64(today), np.arange(1, len(result.payments) + 1)))
+    months = int(result.months[0])
+
+    def month_date(month):
+        return month_dates[month - 1] if month > 0 else None
+
+    return {
+        'order': [debts[index].key for index in order],
+        'minimum_total': round(sum(debt.minimum for debt in debts), 2),
+        'months': months if months >= 0 else None,
+        'payoff_date': month_date(months),
+        'total_interest': float(result.total_interest[0]),
+        'total_paid': float(result.total_paid[0]),
+        'debts': [
+            {'key': debt.key, 'name': debt.name, 'balance': debt.balance, 'annual_rate': debt.annual_rate,
+             'minimum': round(debt.minimum, 2), 'payoff_date': month_date(int(month))}
+            for debt, month in zip(debts, result.payoff_months[0])
+        ],
+        'schedule': [
+            {'date': day, 'payments': payments[0].tolist(), 'balances': balances[0].tolist()}
+            for day, payments, balances in zip(month_dates, result.payments, result.balances)
+        ],
+    }
+
+def sweep_budgets(debts, budgets, strategy='avalanche', custom_order=None):
+    """
+    Simulate many monthly budgets at once, e.g. to plot payoff time against payment.
+
+    Args:
+        debts (list): As returned by load_payoff_debts.
+        budgets (array): Monthly budgets, at most MAX_BUDGET_LEVELS.
+        strategy (str, optional): One of STRATEGIES.
+        custom_order (list, optional): Debt keys, for the custom strategy.
+
+    Returns:
+        dict: budgets, months (-1 where never paid off) and total_interest lists.
+
+    Raises:
+        ValueError: If there are too many budgets or the strategy is unknown.
+    """
+    budgets = np.asarray(budgets, dtype=float)
+    if len(budgets) > MAX_BUDGET_LEVELS:
+        raise ValueError(f'At most {MAX_BUDGET_LEVELS} budget levels can be simulated at once.')
+    result = simulate_payoff(
+        [debt.balance for debt in debts], [debt.annual_rate for debt in debts],
+        [debt.minimum for debt in debts], payoff_order(debts, strategy, custom_order), budgets,
+    )
+    return {
+        'budgets': budgets.round(2).tolist(),
+        'months': result.months.tolist(),
+        'total_interest': result.total_interest.tolist(),
+    }
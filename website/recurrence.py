@@ -0,0 +1,174 @@
+import numpy as np
+
+# Frequency -> (days, months) per step. Exactly one of the two is non-zero.
+FREQUENCY_STEPS = {
+    'Daily': (1, 0),
+    'Weekly': (7, 0),
+    'Biweekly': (14, 0),
+    'Monthly': (0, 1),
+    'Quarterly': (0, 3),
+    'Biannual': (0, 6),
+    'Annual': (0, 12),
+}
+
+def to_datetime64(dates):
+    """Convert dates (datetime.date, str or datetime64, scalar or sequence) to a datetime64[D] array."""
+    return np.asarray(dates, dtype='datetime64[D]')
+
+def to_dates(array):
+    """Convert a datetime64[D] array back to a list of datetime.date."""
+    return to_datetime64(array).astype(object).tolist()
+
+def frequency_steps(frequencies):
+    """
+    Look up the step of each frequency.
+
+    Args:
+        frequencies (sequence): Frequency names, see FREQUENCY_STEPS.
+
+    Returns:
+        tuple: (day steps, month steps) as int arrays.
+
+    Raises:
+        ValueError: If a frequency is unknown.
+    """
+    try:
+        steps = np.array([FREQUENCY_STEPS[frequency] for frequency in np.ravel(frequencies)], dtype=np.int64)
+    except KeyError as e:
+        raise ValueError(f"Unknown frequency {str(e.args[0])!r}.") from None
+    steps = steps.reshape(-1, 2)
+    return steps[:, 0], steps[:, 1]
+
+def add_months(dates, months):
+    """
+    Add whole months to dates, clamping to the end of shorter months.
+
+    Jan 31 + 1 month is Feb 28 (29 in leap years), the same rule as
+    dateutil's relativedelta, but for whole arrays at once.
+
+    Args:
+        dates (array): datetime64[D] dates.
+        months (array | int): Months to add to each date.
+
+    Returns:
+        array: datetime64[D] dates.
+    """
+    dates = to_datetime64(dates)
+    month = dates.astype('datetime64[M]')
+    day = (dates - month.astype('datetime64[D]')).astype(np.int64)
+    target = month + np.asarray(months, dtype=np.int64)
+    month_length = ((target + 1).astype('datetime64[D]') - target.astype('datetime64[D]')).astype(np.int64)
+    return target.astype('datetime64[D]') + np.minimum(day, month_length - 1)
+
+def advance(anchors, day_steps, month_steps, k):
+    """
+    Get the k-th occurrence after each anchor.
+
+    Occurrences are counted from the anchor, not chained one step at a time,
+    so within one call a schedule anchored on the 31st comes back to the 31st
+    after passing through shorter months. Callers store only the next date
+    and anchor on it the next time, so once a date is clamped (Jan 31 ->
+    Feb 28) the stored schedule stays on the clamped day.
+
+    Args:
+        anchors (array): datetime64[D] anchor dates (occurrence 0).
+        day_steps (array): Days per step, from frequency_steps.
+        month_steps (array): Months per step, from frequency_steps.
+        k (array | int): Occurrence numbers.
+
+    Returns:
+        array: datetime64[D] dates.
+    """
+    anchors = to_datetime64(anchors)
+    k = np.asarray(k, dtype=np.int64)
+    by_days = anchors + (day_steps * k).astype('timedelta64[D]')
+    by_months = add_months(anchors, month_steps * k)
+    return np.where(month_steps > 0, by_months, by_days)
+
+def next_occurrences(dates, frequencies, steps=1):
+    """
+    Get the date one step (or any number of steps) after each date.
+
+    Args:
+        dates (sequence): Current dates.
+        frequencies (sequence): Frequency of each date.
+        steps (int, optional): Steps to move, negative to go back.
+
+    Returns:
+        array: datetime64[D] next dates.
+
+    Raises:
+        ValueError: If a frequency is unknown.
+    """
+    day_steps, month_steps = frequency_steps(frequencies)
+    return advance(to_datetime64(dates).ravel(), day_steps, month_steps, steps)
+
+def next_date(current_date, frequency, steps=1):
+    """
+    Get the date one step after a single date.
+
+    Args:
+        current_date (datetime.date): The current date.
+        frequency (str): One of FREQUENCY_STEPS.
+        steps (int, optional): Steps to move, -1 for the previous date.
+
+    Returns:
+        datetime.date: The next date.
+
+    Raises:
+        ValueError: If the frequency is unknown.
+    """
+    return to_dates(next_occurrences([current_date], [frequency], steps))[0]
+
+def occurrence_counts(anchors, frequencies, horizon):
+    """
+    Count the occurrences of each schedule on or before a horizon.
+
+    Args:
+        anchors (sequence): First occurrence of each schedule.
+        frequencies (sequence): Frequency of each schedule.
+        horizon (datetime.date | array): Last date to count, shared or per schedule.
+
+    Returns:
+        tuple: (counts, day steps, month steps) as int arrays.
+    """
+    anchors = to_datetime64(anchors).ravel()
+    horizon = np.broadcast_to(to_datetime64(horizon), anchors.shape)
+    day_steps, month_steps = frequency_steps(frequencies)
+
+    days = (horizon - anchors).astype(np.int64)
+    months = (horizon.astype('datetime64[M]') - anchors.astype('datetime64[M]')).astype(np.int64)
+    by_days = days // np.maximum(day_steps, 1) + 1
+    by_months = months // np.maximum(month_steps, 1) + 1
+    counts = np.where(month_steps > 0, by_months, by_days)
+    # The month estimate can overshoot by one when the anchor's day is past the horizon's
+    overshoot = (month_steps > 0) & (counts > 0) & (advance(anchors, day_steps, month_steps, counts - 1) > horizon)
+    counts = np.maximum(counts - overshoot, 0)
+    return counts, day_steps, month_steps
+
+def occurrences_until(anchors, frequencies, horizon, start=None):
+    """
+    Expand schedules into every occurrence up to a horizon, in one pass.
+
+    Args:
+        anchors (sequence): First occurrence of each schedule.
+        frequencies (sequence): Frequency of each schedule.
+        horizon (datetime.date | array): Last date to include, shared or per schedule.
+        start (datetime.date, optional): Drop occurrences before this date.
+
+    Returns:
+        tuple: (schedule index, dates, following) arrays. index and dates list
+            the occurrences ordered by schedule then date, following holds the
+            first occurrence after the horizon of every schedule.
+    """
+    anchors = to_datetime64(anchors).ravel()
+    counts, day_steps, month_steps = occurrence_counts(anchors, frequencies, horizon)
+    following = advance(anchors, day_steps, month_steps, counts)
+
+    index = np.repeat(np.arange(len(anchors)), counts)
+    k = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    dates = advance(anchors[index], day_steps[index], month_steps[index], k)
+    if start is not None:
+        keep = dates >= to_datetime64(start)
+        index, dates = index[keep], dates[keep]
+    return index, dates, following
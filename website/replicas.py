@@ -0,0 +1,90 @@
+from .database import REPLICA_BIND
+from website import db
+from flask import current_app, request, session
+from flask.cli import with_appcontext
+from os import environ
+import click
+import sqlite3
+import time
+
+READ_ONLY_METHODS = ('GET', 'HEAD', 'OPTIONS')
+DEFAULT_STICKY_SECONDS = 10  # How long a user's reads stay on the primary after they write
+
+def reads_from_replica():
+    """
+    Decide whether the current request may read from the replica.
+
+    Only read-only methods qualify, and not within the sticky window after
+    the same browser session last wrote, so users always see their own
+    changes even while the replica lags behind.
+
+    Returns:
+        bool: True to route this request's reads to the replica.
+    """
+    if request.method not in READ_ONLY_METHODS:
+        return False
+    last_write_at = session.get('last_write_at')
+    sticky_seconds = current_app.config.get('REPLICA_STICKY_SECONDS', DEFAULT_STICKY_SECONDS)
+    return last_write_at is None or time.time() - last_write_at > sticky_seconds
+
+def init_replica_routing(app):
+    """
+    Route read-only requests to the replica bind, if one is configured.
+
+    Args:
+        app: The Flask application instance.
+    """
+    if REPLICA_BIND not in app.config.get('SQLALCHEMY_BINDS', {}):
+        return
+    app.config.setdefault('REPLICA_STICKY_SECONDS', int(environ.get('REPLICA_STICKY_SECONDS', DEFAULT_STICKY_SECONDS)))
+
+    @app.before_request
+    def mark_read_only():
+        db.session.info['read_only'] = reads_from_replica()
+
+    @app.after_request
+    def remember_write(response):
+        if db.session.info.get('wrote'):
+            session['last_write_at'] = time.time()
+        return response
+
+def sync_sqlite_replica(primary_path, replica_path):
+    """
+    Copy a SQLite primary onto a replica file, a stand-in for real replication.
+
+    Uses SQLite's online backup, so the copy is consistent and the primary
+    stays writable while it runs.
+
+    Args:
+        primary_path (str): Path of the primary database file.
+        replica_path (str): Path of the replica database file.
+    """
+    source = sqlite3.connect(primary_path)
+    target = sqlite3.connect(replica_path)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+
+@click.group('replica')
+def replica_cli():
+    """Read replica commands."""
+
+@replica_cli.command('sync')
+@click.option('--interval', type=float, default=0, help='Keep syncing every this many seconds. Syncs once if 0.')
+@with_appcontext
+def sync_replica_command(interval):
+    """Copy the SQLite primary onto the SQLite replica, for local testing."""
+    if REPLICA_BIND not in db.engines:
+        raise click.ClickException('No replica configured, set REPLICA_DATABASE_URL.')
+    primary, replica = db.engines[None], db.engines[REPLICA_BIND]
+    if primary.dialect.name != 'sqlite' or replica.dialect.name != 'sqlite':
+        raise click.ClickException('The stub replicator only copies SQLite files.')
+
+    while True:
+        sync_sqlite_replica(primary.url.database, replica.url.database)
+        click.echo(f'Synced {primary.url.database} to {replica.url.database}.')
+        if not interval:
+            break
+        time.sleep(interval)
@@ -0,0 +1,156 @@
+from .models import Transaction, MonthlyRollup
+from website import db
+from sqlalchemy import select, insert, delete, func, case, literal_column
+from datetime import date
+import click
+from flask.cli import with_appcontext
+
+# The expressions of the uq_monthly_rollup_key index, the ON CONFLICT target of apply_rollup_delta
+ROLLUP_KEY = [
+    MonthlyRollup.user_id,
+    MonthlyRollup.month,
+    MonthlyRollup.type,
+    func.coalesce(MonthlyRollup.budget_category_id, literal_column('0')),
+    func.coalesce(MonthlyRollup.account_id, literal_column('0')),
+]
+
+def month_start(value):
+    """
+    Get the first day of the month for a date or datetime.
+
+    Args:
+        value (datetime.date | datetime.datetime): Any day in the month.
+
+    Returns:
+        datetime.date: The first day of that month.
+    """
+    return date(value.year, value.month, 1)
+
+def _to_id(value):
+    return int(value) if value else None
+
+def rollup_account_id(type, account_from_id, account_to_id):
+    """
+    Get the account a transaction is rolled up under.
+
+    Income is counted against the account it lands in, expenses and transfers
+    against the account the money leaves.
+    """
+    return _to_id(account_to_id) if type == 'Income' else _to_id(account_from_id)
+
+def apply_rollup_delta(user_id, txn_date, type, amount, budget_category_id=None, account_id=None, sign=1, count=1):
+    """
+    Add (or with sign=-1, remove) transactions to the monthly rollup.
+
+    The change is made on the current session and is committed together with
+    the transaction write that caused it.
+
+    Args:
+        user_id (int): The id of the user.
+        txn_date (datetime.date): The transaction date.
+        type (str): The transaction type.
+        amount (float): The transaction amount, or the summed amount when count > 1.
+        budget_category_id (int, optional): The budget category of the transaction.
+        account_id (int, optional): The account the transaction is rolled up under.
+        sign (int, optional): 1 to add the transaction, -1 to remove it.
+        count (int, optional): Number of transactions the amount covers.
+    """
+    key = {
+        'user_id': int(user_id),
+        'month': month_start(txn_date),
+        'type': type,
+        'budget_category_id': _to_id(budget_category_id),
+        'account_id': _to_id(account_id),
+    }
+    from .utils import dialect_insert  # utils imports this module at load time
+
+    # One upsert, so two first writes to the same bucket cannot both insert
+    statement = dialect_insert(MonthlyRollup).values(total_amount=sign * amount, transaction_count=sign * count, **key)
+    db.session.execute(statement.on_conflict_do_update(
+        index_elements=ROLLUP_KEY,
+        set_={
+            'total_amount': MonthlyRollup.total_amount + statement.excluded.total_amount,
+            'transaction_count': MonthlyRollup.transaction_count + statement.excluded.transaction_count,
+        },
+    ))
+    if sign < 0:
+        # The bucket's last transaction went away, drop the row so it no longer pins the category or account
+        conditions = [
+            getattr(MonthlyRollup, name).is_(None) if value is None else getattr(MonthlyRollup, name) == value
+            for name, value in key.items()
+        ]
+        db.session.execute(delete(MonthlyRollup).where(*conditions, MonthlyRollup.transaction_count == 0))
+
+def apply_transaction_rollup(transaction, sign=1):
+    """
+    Add (or remove) a transaction-like object to the monthly rollup.
+
+    Args:
+        transaction: Any object with user_id, date, type, amount, budget_category_id,
+            account_from_id and account_to_id attributes.
+        sign (int, optional): 1 to add the transaction, -1 to remove it.
+    """
+    apply_rollup_delta(
+        transaction.user_id,
+        transaction.date,
+        transaction.type,
+        transaction.amount,
+        budget_category_id=transaction.budget_category_id,
+        account_id=rollup_account_id(transaction.type, transaction.account_from_id, transaction.account_to_id),
+        sign=sign,
+    )
+
+def rebuild_monthly_rollups(user_id=None):
+    """
+    Rebuild the monthly rollup from the transaction table.
+
+    Args:
+        user_id (int, optional): Only rebuild this user's rows. Rebuilds everything if omitted.
+
+    Returns:
+        int: The number of rollup rows written.
+    """
+    # Group by day in SQL and fold the days into months here: truncating a date
+    # to its month has no expression that works on every database.
+    account_id = case((Transaction.type == 'Income', Transaction.account_to_id), else_=Transaction.account_from_id)
+    source = select(
+        Transaction.user_id,
+        Transaction.date,
+        Transaction.type,
+        Transaction.budget_category_id,
+        account_id,
+        func.sum(Transaction.amount),
+        func.count(Transaction.id),
+    ).group_by(Transaction.user_id, Transaction.date, Transaction.type, Transaction.budget_category_id, account_id)
+
+    clear = delete(MonthlyRollup)
+    if user_id is not None:
+        source = source.where(Transaction.user_id == user_id)
+        clear = clear.where(MonthlyRollup.user_id == user_id)
+
+    totals = {}
+    for row_user_id, txn_date, type, budget_category_id, row_account_id, amount, count in db.session.execute(source):
+        key = (row_user_id, month_start(txn_date), type, budget_category_id, row_account_id)
+        total_amount, transaction_count = totals.get(key, (0, 0))
+        totals[key] = (total_amount + amount, transaction_count + count)
+
+    db.session.execute(clear)
+    if totals:
+        db.session.execute(insert(MonthlyRollup), [
+            {
+                'user_id': row_user_id, 'month': month, 'type': type, 'budget_category_id': budget_category_id,
+                'account_id': row_account_id, 'total_amount': total_amount, 'transaction_count': transaction_count,
+            }
+            for (row_user_id, month, type, budget_category_id, row_account_id), (total_amount, transaction_count)
+            in totals.items()
+        ])
+    db.session.commit()
+    return len(totals)
+
+@click.command('rebuild-rollups')
+@click.option('--user-id', type=int, default=None, help='Only rebuild rollups for this user.')
+@with_appcontext
+def rebuild_rollups_command(user_id):
+    """Rebuild the monthly transaction rollups from scratch."""
+    count = rebuild_monthly_rollups(user_id)
+    click.echo(f'Rebuilt {count} monthly rollup rows.')
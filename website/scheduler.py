@@ -0,0 +1,333 @@
+from .models import User, Subscription, BudgetCategory, CreditCard, SchedulerLock
+from .utils import reset_budgets, add_auto_transactions, insert_ignoring_duplicates, FREQUENCIES
+from .balances import take_balance_snapshots
+from .statements import close_statements
+from .notifications import generate_notifications
+from website import db
+from apscheduler.schedulers.background import BackgroundScheduler
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import select, update, func, or_
+from .timezones import get_zone
+from datetime import datetime, time, timedelta, timezone
+from uuid import uuid4
+import click
+import heapq
+import os
+import socket
+import threading
+import time as clock
+
+JOB_ID = 'due-jobs'
+HEARTBEAT_JOB_ID = 'scheduler-heartbeat'
+REFRESH_INTERVAL = timedelta(hours=1)  # Longest sleep, so rows added meanwhile are picked up
+RETRY_DELAY = timedelta(minutes=5)  # Wait before retrying a job that failed
+LEASE_NAME = 'scheduler'
+LEASE_TTL = timedelta(seconds=90)
+HEARTBEAT_SECONDS = 30
+
+_start_lock = threading.Lock()
+
+def local_midnight_utc(day, time_zone):
+    """
+    Get the UTC instant at which a date starts in a time zone.
+
+    Args:
+        day (datetime.date): The local date.
+        time_zone (str): The time zone name.
+
+    Returns:
+        datetime.datetime: Midnight of day in time_zone, as an aware UTC datetime.
+    """
+    return datetime.combine(day, time.min, tzinfo=get_zone(time_zone)).astimezone(timezone.utc)
+
+def get_next_due_dates(kind, time_zones=None):
+    """
+    Get the earliest pending date per time zone for one kind of job.
+
+    Args:
+        kind (str): 'budgets', 'subscriptions', 'snapshots', 'statements' or 'notifications'.
+        time_zones (iterable, optional): Only look at these time zones.
+
+    Returns:
+        list: (time_zone, date) pairs.
+    """
+    if kind == 'snapshots':
+        # Daily at UTC midnight, independent of any user's rows
+        return [('UTC', datetime.now(timezone.utc).date() + timedelta(days=1))]
+    if kind == 'notifications':
+        # Daily at each user's local midnight
+        statement = select(User.time_zone).distinct()
+        if time_zones is not None:
+            statement = statement.where(User.time_zone.in_(time_zones))
+        now_utc = datetime.now(timezone.utc)
+        return [
+            (time_zone, now_utc.astimezone(get_zone(time_zone)).date() + timedelta(days=1))
+            for time_zone in db.session.execute(statement).scalars().all()
+        ]
+    if kind == 'budgets':
+        column = BudgetCategory.next_date
+        statement = (
+            select(User.time_zone, func.min(column))
+            .join(BudgetCategory, BudgetCategory.user_id == User.id)
+            .where(BudgetCategory.auto_reset == True, BudgetCategory.time_period.in_(FREQUENCIES))
+        )
+    elif kind == 'statements':
+        column = CreditCard.statement_due_date
+        statement = (
+            select(User.time_zone, func.min(column))
+            .join(CreditCard, CreditCard.user_id == User.id)
+            .where(CreditCard.billing_cycle_days > 0)
+        )
+    else:
+        column = Subscription.next_payment_date
+        statement = (
+            select(User.time_zone, func.min(column))
+            .join(Subscription, Subscription.user_id == User.id)
+            .where(Subscription.auto_add_transaction == True, Subscription.frequency.in_(FREQUENCIES))
+        )
+    if time_zones is not None:
+        statement = statement.where(User.time_zone.in_(time_zones))
+    return db.session.execute(statement.group_by(User.time_zone)).all()
+
+class Lease:
+    """
+    A named lease row in the database that at most one process holds at a time.
+
+    The holder renews it on every heartbeat. If the holder dies, the lease
+    expires after LEASE_TTL and the next process to heartbeat takes it over.
+    This works across processes and hosts that share the database.
+    """
+
+    def __init__(self, app, name=LEASE_NAME, ttl=LEASE_TTL):
+        self.app = app
+        self.name = name
+        self.ttl = ttl
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}"
+        self.held = False
+        self.acquired_at = None
+
+    def acquire(self):
+        """
+        Take the lease if it is free or expired, or renew it if we already hold it.
+
+        Returns:
+            bool: True if this process holds the lease.
+        """
+        with self.app.app_context():
+            now = datetime.now(timezone.utc).replace(tzinfo=None)
+            expires_at = now + self.ttl
+            result = db.session.execute(
+                update(SchedulerLock)
+                .where(
+                    SchedulerLock.name == self.name,
+                    or_(SchedulerLock.holder == self.holder, SchedulerLock.expires_at < now),
+                )
+                .values(holder=self.holder, expires_at=expires_at)
+            )
+            if result.rowcount == 0:
+                db.session.execute(
+                    insert_ignoring_duplicates(SchedulerLock, ['name'])
+                    .values(name=self.name, holder=self.holder, expires_at=expires_at)
+                )
+            db.session.commit()
+            holder = db.session.execute(
+                select(SchedulerLock.holder).where(SchedulerLock.name == self.name)
+            ).scalar()
+        self.held = holder == self.holder
+        if self.held:
+            self.acquired_at = clock.monotonic()
+        return self.held
+
+    def check(self):
+        """
+        Check that we still hold the lease, between chunks of a long job.
+
+        Renews it at most every HEARTBEAT_SECONDS, so calling it after every
+        chunk stays cheap.
+
+        Returns:
+            bool: True if this process still holds the lease.
+        """
+        if self.held and clock.monotonic() - self.acquired_at < HEARTBEAT_SECONDS:
+            return True
+        return self.acquire()
+
+    def release(self):
+        """Give the lease up so another process can take over straight away."""
+        with self.app.app_context():
+            db.session.execute(
+                update(SchedulerLock)
+                .where(SchedulerLock.name == self.name, SchedulerLock.holder == self.holder)
+                .values(expires_at=datetime(1970, 1, 1))
+            )
+            db.session.commit()
+        self.held = False
+
+class DueJobScheduler:
+    """
+    Run budget resets and automatic transactions when they become due.
+
+    A heap holds the next due instant per (job, time zone), i.e. local midnight
+    of the earliest pending date in that zone converted to UTC. The scheduler
+    sleeps until the top of the heap, runs the jobs only for the zones that
+    came due, pushes those zones' next instants back, and sleeps again. Work is
+    spread across the day as midnight moves around the world instead of
+    spiking once a month.
+
+    With a lease, only the process holding it runs jobs. The others keep
+    heartbeating and take over when the leader's lease expires. Jobs check
+    the lease between chunks and stop early once it is lost, so a stalled
+    leader does not keep writing next to the one that took over.
+    """
+
+    JOBS = {
+        'budgets': reset_budgets,
+        'subscriptions': add_auto_transactions,
+        'snapshots': take_balance_snapshots,
+        'statements': close_statements,
+        'notifications': generate_notifications,
+    }
+
+    def __init__(self, app, scheduler=None, lease=None):
+        self.app = app
+        self.scheduler = scheduler or BackgroundScheduler(timezone='UTC')
+        self.lease = lease
+        self.heap = []
+        self.refreshed_at = None
+
+    def push(self, kind, time_zones=None):
+        """Push the next due instant of every matching zone onto the heap."""
+        for time_zone, next_date in get_next_due_dates(kind, time_zones):
+            heapq.heappush(self.heap, (local_midnight_utc(next_date, time_zone), kind, time_zone))
+
+    def refresh(self, now):
+        """Rebuild the heap from the database."""
+        self.heap = []
+        with self.app.app_context():
+            for kind in self.JOBS:
+                self.push(kind)
+        self.refreshed_at = now
+
+    def run_due(self):
+        """
+        Run every job whose instant has passed, then schedule the next wake-up.
+
+        Each job runs on its own, so one failing (e.g. the database is locked)
+        neither skips the others nor loses its zones: they are logged and
+        retried after RETRY_DELAY. The next wake-up is always scheduled.
+        """
+        now = datetime.now(timezone.utc)
+        retry_at = None
+        try:
+            if self.lease is not None and not self.lease.acquire():
+                # Not the leader, heartbeat() reschedules us if we take over
+                self.refreshed_at = None
+                return
+
+            if self.refreshed_at is None or now - self.refreshed_at >= REFRESH_INTERVAL:
+                self.refresh(now)
+
+            due = {}
+            while self.heap and self.heap[0][0] <= now:
+                _, kind, time_zone = heapq.heappop(self.heap)
+                due.setdefault(kind, set()).add(time_zone)
+
+            should_continue = self.lease.check if self.lease is not None else None
+            for kind, time_zones in due.items():
+                if self.lease is not None and not self.lease.held:
+                    # Lost the lease mid-pass, the new leader rebuilds its own heap
+                    self.refreshed_at = None
+                    break
+                try:
+                    self.JOBS[kind](self.app, time_zones=time_zones, should_continue=should_continue)
+                    with self.app.app_context():
+                        self.push(kind, time_zones)
+                except Exception:
+                    self.app.logger.exception('Scheduled %s job failed for %s, retrying in %s', kind, sorted(time_zones), RETRY_DELAY)
+                    for time_zone in time_zones:
+                        heapq.heappush(self.heap, (now + RETRY_DELAY, kind, time_zone))
+        except Exception:
+            self.app.logger.exception('Scheduler pass failed, retrying in %s', RETRY_DELAY)
+            self.heap, self.refreshed_at = [], None  # Rebuild the heap on the next pass
+            retry_at = now + RETRY_DELAY
+        finally:
+            if retry_at is not None or self.lease is None or self.lease.held:
+                self.schedule_next(now, retry_at)
+
+    def schedule_next(self, now, run_at=None):
+        """Wake up at the top of the heap, or after REFRESH_INTERVAL (or at run_at) at the latest."""
+        run_at = run_at or now + REFRESH_INTERVAL
+        if self.heap:
+            run_at = min(run_at, max(self.heap[0][0], now))
+        self.scheduler.add_job(func=self.run_due, trigger='date', run_date=run_at, id=JOB_ID, replace_existing=True)
+
+    def heartbeat(self):
+        """Renew (or try to take) the lease, and start running jobs if we just became leader."""
+        was_leader = self.lease.held
+        if self.lease.acquire() and not was_leader:
+            self.scheduler.add_job(func=self.run_due, trigger='date', id=JOB_ID, replace_existing=True)
+
+    def start(self):
+        """Start the underlying scheduler and run the first pass right away."""
+        self.scheduler.start()
+        if self.lease is not None:
+            self.scheduler.add_job(
+                func=self.heartbeat, trigger='interval', seconds=HEARTBEAT_SECONDS,
+                id=HEARTBEAT_JOB_ID, replace_existing=True
+            )
+        self.scheduler.add_job(func=self.run_due, trigger='date', id=JOB_ID, replace_existing=True)
+
+    def shutdown(self):
+        """Stop the scheduler and hand the lease over."""
+        self.scheduler.shutdown(wait=False)
+        if self.lease is not None and self.lease.held:
+            self.lease.release()
+
+def start_scheduler(app):
+    """
+    Start the leader-elected job scheduler for an app, once per process.
+
+    Args:
+        app: The Flask application instance.
+
+    Returns:
+        DueJobScheduler: The running scheduler.
+    """
+    with _start_lock:
+        if 'due_job_scheduler' not in app.extensions:
+            scheduler = DueJobScheduler(app, lease=Lease(app))
+            scheduler.start()
+            app.extensions['due_job_scheduler'] = scheduler
+    return app.extensions['due_job_scheduler']
+
+def init_scheduler(app):
+    """
+    Start the scheduler when the app serves its first request.
+
+    CLI commands such as `flask db upgrade` create the app too but never serve
+    a request, so they don't start a scheduler.
+
+    Args:
+        app: The Flask application instance.
+    """
+    @app.before_request
+    def ensure_scheduler():
+        if 'due_job_scheduler' not in app.extensions:
+            start_scheduler(app)
+
+@click.group('scheduler')
+def scheduler_cli():
+    """Background job scheduler commands."""
+
+@scheduler_cli.command('run')
+@with_appcontext
+def run_scheduler_command():
+    """Run the job scheduler in the foreground as a dedicated process."""
+    scheduler = start_scheduler(current_app._get_current_object())
+    click.echo(f'Scheduler running as {scheduler.lease.holder}. Press Ctrl+C to stop.')
+    try:
+        while True:
+            clock.sleep(60)
+    except (KeyboardInterrupt, SystemExit):
+        scheduler.shutdown()
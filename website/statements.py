@@ -0,0 +1,213 @@
+from .models import User, CreditCard, CreditCardPayment, CreditCardStatement
+from .money import Money
+from .cache import bump_data_versions
+from .recurrence import to_datetime64, to_dates
+from .utils import get_local_dates, insert_ignoring_duplicates, BATCH_SIZE
+from website import db
+from sqlalchemy import select, update, func, case, literal, and_, or_
+from datetime import datetime, timezone
+import numpy as np
+
+CARD_MINIMUM_RATE = 0.02  # Share of a card's statement balance due as minimum payment
+CARD_MINIMUM_FLOOR = 25
+DAYS_PER_YEAR = 365  # APR is charged as a daily rate over the days of the cycle
+
+def card_minimum_payments(balances):
+    """
+    Get the minimum payment of credit card balances.
+
+    Args:
+        balances (array): Statement balances.
+
+    Returns:
+        array: The larger of CARD_MINIMUM_RATE of the balance and CARD_MINIMUM_FLOOR, capped at the balance.
+    """
+    balances = np.asarray(balances, dtype=float)
+    return np.minimum(np.maximum(balances * CARD_MINIMUM_RATE, CARD_MINIMUM_FLOOR), np.maximum(balances, 0))
+
+def latest_statements():
+    """Subquery of the closing date, balance and minimum payment of each card's latest statement."""
+    latest = (
+        select(CreditCardStatement.credit_card_id, func.max(CreditCardStatement.closing_date).label('closing_date'))
+        .group_by(CreditCardStatement.credit_card_id)
+        .subquery()
+    )
+    return (
+        select(
+            CreditCardStatement.credit_card_id, CreditCardStatement.closing_date,
+            CreditCardStatement.statement_balance, CreditCardStatement.minimum_payment,
+        )
+        .join(latest, and_(
+            latest.c.credit_card_id == CreditCardStatement.credit_card_id,
+            latest.c.closing_date == CreditCardStatement.closing_date,
+        ))
+        .subquery()
+    )
+
+def close_cycles(cards, payments, local_date):
+    """
+    Close every billing cycle of a batch of cards that ended by a date.
+
+    Interest accrues at the daily APR over the cycle on whatever part of the
+    previous statement was not paid by the closing date, so paying statements
+    in full keeps the card interest free. Cards more than one cycle behind get
+    one statement per missed cycle. All cards move forward together, one array
+    step per cycle.
+
+    Args:
+        cards (list): Rows with id, current_balance, interest_rate, statement_due_date,
+            minimum_payment_due_date, billing_cycle_days, and the latest statement's
+            previous_closing_date and previous_balance (None without one).
+        payments (list): Rows with credit_card_id, date and amount of the cards' payments.
+        local_date (datetime.date): Close cycles ending on or before this date.
+
+    Returns:
+        tuple: (statements, next_dates). statements is a list of dicts ready to
+            insert as CreditCardStatement rows, less user_id. next_dates maps card
+            ids to the advanced (statement_due_date, minimum_payment_due_date).
+    """
+    ids = np.array([card.id for card in cards], dtype=np.int64)
+    balance = np.array([card.current_balance or 0 for card in cards], dtype=float)
+    daily_rates = np.array([card.interest_rate or 0 for card in cards], dtype=float) / 100 / DAYS_PER_YEAR
+    cycle = np.array([card.billing_cycle_days for card in cards], dtype=np.int64)
+    closing = to_datetime64([card.statement_due_date for card in cards])
+    payment_due = to_datetime64([card.minimum_payment_due_date or card.statement_due_date for card in cards])
+    has_previous = np.array([card.previous_closing_date is not None for card in cards])
+    previous_closing = np.where(has_previous, to_datetime64([card.previous_closing_date or card.statement_due_date for card in cards]), closing)
+    previous_balance = np.array([card.previous_balance or 0 for card in cards], dtype=float)
+
+    position = {id: i for i, id in enumerate(ids.tolist())}
+    payment_card = np.array([position[payment.credit_card_id] for payment in payments], dtype=np.int64)
+    payment_dates = to_datetime64([payment.date for payment in payments])
+    payment_amounts = np.array([payment.amount for payment in payments], dtype=float)
+
+    statements = []
+    active = closing <= to_datetime64(local_date)
+    while active.any():
+        # Payments made during each active card's cycle
+        in_cycle = (
+            active[payment_card]
+            & (~has_previous[payment_card] | (payment_dates > previous_closing[payment_card]))
+            & (payment_dates <= closing[payment_card])
+        )
+        paid = np.bincount(payment_card[in_cycle], weights=payment_amounts[in_cycle], minlength=len(ids))
+        unpaid = np.where(has_previous, np.maximum(previous_balance - paid, 0), 0)
+        interest = np.where(active, np.round(unpaid * daily_rates * cycle, 2), 0)
+        balance += interest
+        minimum = np.round(card_minimum_payments(balance), 2)
+
+        for i in np.flatnonzero(active).tolist():
+            statements.append({
+                'credit_card_id': int(ids[i]),
+                'closing_date': closing[i].item(),
+                'interest': float(interest[i]),
+                'statement_balance': round(float(balance[i]), 2),
+                'minimum_payment': float(minimum[i]),
+                'payment_due_date': payment_due[i].item(),
+            })
+
+        step = np.where(active, cycle, 0).astype('timedelta64[D]')
+        previous_closing = np.where(active, closing, previous_closing)
+        previous_balance = np.where(active, balance, previous_balance)
+        has_previous = has_previous | active
+        closing, payment_due = closing + step, payment_due + step
+        active = closing <= to_datetime64(local_date)
+
+    next_dates = {
+        id: (statement_due_date, minimum_payment_due_date)
+        for id, statement_due_date, minimum_payment_due_date in zip(ids.tolist(), to_dates(closing), to_dates(payment_due))
+    }
+    return statements, next_dates
+
+def close_statements(app, batch_size=BATCH_SIZE, time_zones=None, should_continue=None):
+    """
+    Close the billing cycles of all credit cards whose statement date has come.
+
+    Cards are streamed in id order, batch_size at a time, with their latest
+    statement joined in. For each chunk the payments since those statements
+    are read in one query, every due cycle is closed with close_cycles, the
+    statements are inserted in one executemany, and balances and due dates
+    move with one UPDATE ... CASE. The unique (credit_card_id, closing_date)
+    constraint makes closing idempotent: only interest of statements actually
+    inserted is added to balances.
+
+    Args:
+        app: The Flask application instance.
+        batch_size (int, optional): Number of cards handled per transaction.
+        time_zones (iterable, optional): Only close cycles for users in these time zones.
+        should_continue (callable, optional): Checked before each chunk, the job stops once it returns False.
+    """
+    with app.app_context():
+        now_utc = datetime.now(timezone.utc)
+        if time_zones is None:
+            time_zones = db.session.execute(
+                select(User.time_zone).distinct().join(CreditCard, CreditCard.user_id == User.id)
+            ).scalars().all()
+
+        latest = latest_statements()
+        for local_date, zones in get_local_dates(time_zones, now_utc).items():
+            last_id = 0
+            while True:
+                if should_continue is not None and not should_continue():
+                    return
+                cards = db.session.execute(
+                    select(
+                        CreditCard.id, CreditCard.user_id, CreditCard.current_balance, CreditCard.interest_rate,
+                        CreditCard.statement_due_date, CreditCard.minimum_payment_due_date, CreditCard.billing_cycle_days,
+                        latest.c.closing_date.label('previous_closing_date'),
+                        latest.c.statement_balance.label('previous_balance'),
+                    )
+                    .outerjoin(latest, latest.c.credit_card_id == CreditCard.id)
+                    .where(
+                        CreditCard.id > last_id,
+                        CreditCard.statement_due_date <= local_date,
+                        CreditCard.billing_cycle_days > 0,
+                        CreditCard.user_id.in_(select(User.id).where(User.time_zone.in_(zones))),
+                    )
+                    .order_by(CreditCard.id)
+                    .limit(batch_size)
+                ).all()
+                if not cards:
+                    break
+                last_id = cards[-1].id
+
+                payments = db.session.execute(
+                    select(CreditCardPayment.credit_card_id, CreditCardPayment.date, CreditCardPayment.amount)
+                    .outerjoin(latest, latest.c.credit_card_id == CreditCardPayment.credit_card_id)
+                    .where(
+                        CreditCardPayment.credit_card_id.in_([card.id for card in cards]),
+                        CreditCardPayment.date <= local_date,
+                        or_(latest.c.closing_date.is_(None), CreditCardPayment.date > latest.c.closing_date),
+                    )
+                ).all()
+
+                statements, next_dates = close_cycles(cards, payments, local_date)
+                user_ids = {card.id: card.user_id for card in cards}
+                for statement in statements:
+                    statement['user_id'] = user_ids[statement['credit_card_id']]
+                inserted = db.session.execute(
+                    insert_ignoring_duplicates(CreditCardStatement, ['credit_card_id', 'closing_date'])
+                    .returning(CreditCardStatement.credit_card_id, CreditCardStatement.interest),
+                    statements
+                ).all()
+
+                interest = {}
+                for row in inserted:
+                    interest[row.credit_card_id] = interest.get(row.credit_card_id, 0) + row.interest
+                values = {
+                    'statement_due_date': case({id: dates[0] for id, dates in next_dates.items()}, value=CreditCard.id),
+                    'minimum_payment_due_date': case({id: dates[1] for id, dates in next_dates.items()}, value=CreditCard.id),
+                }
+                interest = {id: amount for id, amount in interest.items() if amount}
+                if interest:
+                    values['current_balance'] = CreditCard.current_balance + case(
+                        {id: literal(amount, Money()) for id, amount in interest.items()}, value=CreditCard.id, else_=0
+                    )
+                db.session.execute(
+                    update(CreditCard)
+                    .where(CreditCard.id.in_(next_dates))
+                    .values(**values)
+                    .execution_options(synchronize_session=False)
+                )
+                bump_data_versions(user_ids.values())
+                db.session.commit()
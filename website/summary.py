@@ -0,0 +1,93 @@
+from .models import Transaction
+from website import db
+from sqlalchemy import select, func
+from .timezones import get_zone
+from datetime import datetime, timedelta
+
+PERIODS = {
+    'month': 'This Month',
+    '30d': 'Last 30 Days',
+    'ytd': 'Year to Date',
+}
+DEFAULT_PERIOD = 'month'
+
+def get_user_today(time_zone):
+    """
+    Get today's date in the given time zone.
+
+    Args:
+        time_zone (str): The user's time zone name.
+
+    Returns:
+        datetime.date: The local date for the user.
+    """
+    return datetime.now(get_zone(time_zone or 'UTC')).date()
+
+def get_period_range(period, today):
+    """
+    Get the inclusive date range covered by a summary period.
+
+    Args:
+        period (str): One of the keys in PERIODS.
+        today (datetime.date): The user's local date.
+
+    Returns:
+        tuple: (start_date, end_date) as datetime.date objects.
+    """
+    if period == 'month':
+        start_date = today.replace(day=1)
+    elif period == '30d':
+        start_date = today - timedelta(days=29)
+    elif period == 'ytd':
+        start_date = today.replace(month=1, day=1)
+    else:
+        raise ValueError(f"Unknown summary period: {period}")
+
+    return start_date, today
+
+def get_period_summary(user_id, period=DEFAULT_PERIOD, today=None, time_zone='UTC'):
+    """
+    Compute income, expenses and net for a user over a period.
+
+    The totals are summed in SQL with a single GROUP BY on the transaction type,
+    which is served by the (user_id, date, type) index, so the Python side only
+    ever sees one row per transaction type.
+
+    Args:
+        user_id (int): The id of the user.
+        period (str, optional): One of the keys in PERIODS. Unknown values fall back to DEFAULT_PERIOD.
+        today (datetime.date, optional): The user's local date. Computed from time_zone if omitted.
+        time_zone (str, optional): The user's time zone name.
+
+    Returns:
+        dict: total_income, total_expenses, net_balance, and the period that was used.
+    """
+    if period not in PERIODS:
+        period = DEFAULT_PERIOD
+    if today is None:
+        today = get_user_today(time_zone)
+    start_date, end_date = get_period_range(period, today)
+
+    rows = db.session.execute(
+        select(Transaction.type, func.coalesce(func.sum(Transaction.amount), 0))
+        .where(
+            Transaction.user_id == user_id,
+            Transaction.date >= start_date,
+            Transaction.date <= end_date,
+            Transaction.type.in_(('Income', 'Expense')),
+        )
+        .group_by(Transaction.type)
+    ).all()
+    totals = dict(rows)
+
+    total_income = totals.get('Income', 0)
+    total_expenses = totals.get('Expense', 0)
+    return {
+        'total_income': total_income,
+        'total_expenses': total_expenses,
+        'net_balance': total_income - total_expenses,
+        'period': period,
+        'period_label': PERIODS[period],
+        'start_date': start_date,
+        'end_date': end_date,
+    }
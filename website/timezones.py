@@ -0,0 +1,76 @@
+from functools import lru_cache
+from datetime import timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from markupsafe import Markup, escape
+import logging
+import pytz
+
+logger = logging.getLogger(__name__)  # A child of the app logger
+
+OTHER_GROUP = 'Other'  # Zones without a region prefix, like UTC
+
+@lru_cache(maxsize=1024)
+def get_zone(name):
+    """
+    Get a tz object by name, memoized.
+
+    Args:
+        name (str): An IANA time zone name.
+
+    Returns:
+        tzinfo: The zone, UTC for unknown or empty names.
+    """
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError, TypeError):
+        # Logged once per name thanks to the cache. If every zone falls back,
+        # the system has no tz database and the tzdata package is missing.
+        if name:
+            logger.warning('Unknown time zone %r, using UTC', name)
+        return timezone.utc
+
+@lru_cache(maxsize=None)
+def get_timezone_groups():
+    """
+    Get the selectable time zones grouped by region.
+
+    Returns:
+        list: (region, [(zone name, label)]) pairs, e.g. ('America', [('America/New_York', 'New York')]).
+    """
+    groups = {}
+    for name in pytz.common_timezones:
+        region, _, place = name.partition('/')
+        if not place:
+            region, place = OTHER_GROUP, name
+        groups.setdefault(region, []).append((name, place.replace('_', ' ').replace('/', ' / ')))
+    return sorted(groups.items(), key=lambda item: (item[0] == OTHER_GROUP, item[0]))
+
+@lru_cache(maxsize=None)
+def _rendered_options():
+    return Markup(''.join(
+        f'<optgroup label="{escape(region)}">'
+        + ''.join(f'<option value="{escape(name)}">{escape(label)}</option>' for name, label in zones)
+        + '</optgroup>'
+        for region, zones in get_timezone_groups()
+    ))
+
+def timezone_options(selected=None):
+    """
+    Get the <option> tags for a time zone select, rendered once per process.
+
+    Args:
+        selected (str, optional): Zone to mark as selected. Zones outside the
+            list, like old aliases saved earlier, are added at the top.
+
+    Returns:
+        Markup: The options HTML.
+    """
+    options = _rendered_options()
+    if not selected:
+        return options
+    # Plain str operations, Markup.replace would escape the replacement
+    value = str(escape(selected))
+    option = f'<option value="{value}">'
+    if option in options:
+        return Markup(str(options).replace(option, f'<option value="{value}" selected>', 1))
+    return Markup(f'<option value="{value}" selected>{value}</option>' + str(options))
@@ -0,0 +1,141 @@
+from .models import Account, Transaction, BudgetCategory
+from website import db
+from sqlalchemy import select, tuple_, literal
+from sqlalchemy.orm import aliased
+from datetime import datetime
+
+TRANSACTION_TYPES = ('Income', 'Expense', 'Transfer')
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+def _parse_int(value):
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+    except ValueError:
+        return None
+
+def encode_cursor(row):
+    """
+    Encode the position of a row in the (date, id) ordering.
+
+    Args:
+        row: A transaction row with date and id.
+
+    Returns:
+        str: An opaque cursor such as '2024-06-30.1234'.
+    """
+    return f"{row.date.isoformat()}.{row.id}"
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor produced by encode_cursor.
+
+    Returns:
+        tuple: (date, id), or None if the cursor is missing or malformed.
+    """
+    if not cursor:
+        return None
+    date_part, _, id_part = cursor.partition('.')
+    cursor_date, cursor_id = _parse_date(date_part), _parse_int(id_part)
+    if cursor_date is None or cursor_id is None:
+        return None
+    return cursor_date, cursor_id
+
+def parse_transaction_filters(args):
+    """
+    Read list filters from request arguments, ignoring anything invalid.
+
+    Args:
+        args: A mapping such as request.args.
+
+    Returns:
+        dict: account_id, budget_category_id, type, start_date, end_date (any may be None).
+    """
+    type = args.get('type')
+    return {
+        'account_id': _parse_int(args.get('account_id')),
+        'budget_category_id': _parse_int(args.get('budget_category_id')),
+        'type': type if type in TRANSACTION_TYPES else None,
+        'start_date': _parse_date(args.get('start_date')),
+        'end_date': _parse_date(args.get('end_date')),
+    }
+
+def get_transactions_page(user_id, filters=None, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    Get one page of a user's transactions, newest first, using keyset pagination.
+
+    Instead of an OFFSET the query seeks past the last (date, id) of the
+    previous page, so every page costs the same index range scan on
+    (user_id, date) no matter how deep into the history it is. The seek is a
+    row-value comparison and the account filter keeps the columns on the
+    right of IN, so neither is planned as an OR that loses the date range.
+
+    Args:
+        user_id (int): The id of the user.
+        filters (dict, optional): As returned by parse_transaction_filters.
+        cursor (str, optional): The next_cursor of the previous page.
+        limit (int, optional): Page size, capped at MAX_PAGE_SIZE.
+
+    Returns:
+        dict: 'transactions' (list of read-only rows) and 'next_cursor' (None on the last page).
+    """
+    filters = filters or {}
+    limit = max(1, min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE))
+    account_from = aliased(Account)
+    account_to = aliased(Account)
+
+    statement = (
+        select(
+            Transaction.id,
+            Transaction.date,
+            Transaction.description,
+            Transaction.amount,
+            Transaction.type,
+            Transaction.currency,
+            Transaction.account_from_id,
+            Transaction.account_to_id,
+            Transaction.budget_category_id,
+            account_from.name.label('account_from_name'),
+            account_to.name.label('account_to_name'),
+            BudgetCategory.name.label('budget_category_name'),
+        )
+        .outerjoin(account_from, Transaction.account_from_id == account_from.id)
+        .outerjoin(account_to, Transaction.account_to_id == account_to.id)
+        .outerjoin(BudgetCategory, Transaction.budget_category_id == BudgetCategory.id)
+        .where(Transaction.user_id == user_id)
+    )
+
+    if filters.get('account_id'):
+        statement = statement.where(
+            literal(filters['account_id']).in_([Transaction.account_from_id, Transaction.account_to_id])
+        )
+    if filters.get('budget_category_id'):
+        statement = statement.where(Transaction.budget_category_id == filters['budget_category_id'])
+    if filters.get('type'):
+        statement = statement.where(Transaction.type == filters['type'])
+    if filters.get('start_date'):
+        statement = statement.where(Transaction.date >= filters['start_date'])
+    if filters.get('end_date'):
+        statement = statement.where(Transaction.date <= filters['end_date'])
+
+    position = decode_cursor(cursor)
+    if position:
+        statement = statement.where(tuple_(Transaction.date, Transaction.id) < position)
+
+    # Fetch one extra row to know whether there is another page
+    rows = db.session.execute(
+        statement.order_by(Transaction.date.desc(), Transaction.id.desc()).limit(limit + 1)
+    ).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    return {
+        'transactions': rows,
+        'next_cursor': encode_cursor(rows[-1]) if has_more else None,
+    }
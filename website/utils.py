@@ -1,95 +1,239 @@
 from .models import User, Account, Transaction, Subscription, BudgetCategory
-import pytz
-from datetime import datetime
+from .rollups import apply_rollup_delta, month_start
+from .ledger import apply_balance_deltas
+from .cache import bump_data_versions
+from .timezones import get_zone
+from .recurrence import FREQUENCY_STEPS, next_occurrences, occurrences_until, to_dates
+from datetime import datetime, timezone
 from website import db
-from dateutil.relativedelta import relativedelta
+from sqlalchemy import select, update, case
 
-def get_next_date(current_date, frequency):
+FREQUENCIES = tuple(FREQUENCY_STEPS)
+BATCH_SIZE = 1000
+
+def get_local_dates(time_zones, now_utc):
     """
-    Calculate the next date based on the given frequency.
+    Group time zones by the local date they are currently on.
+
+    There are only ever two or three distinct local dates at any instant, so
+    callers can run one set-based query per date instead of one per user.
 
     Args:
-        current_date (datetime.date): The current date.
-        frequency (str): The reset frequency (e.g., 'Monthly', 'Quarterly', etc.).
-        reset_day (int, optional): The day of the month to reset on.
+        time_zones (iterable): Time zone names.
+        now_utc (datetime.datetime): The current time in UTC.
 
     Returns:
-        datetime.date: The next reset date.
+        dict: Local date -> list of time zone names on that date.
     """
+    zones_by_date = {}
+    for zone_name in time_zones:
+        zones_by_date.setdefault(now_utc.astimezone(get_zone(zone_name)).date(), []).append(zone_name)
+    return zones_by_date
 
-    if frequency == 'Daily':
-        next_date = current_date + relativedelta(days=1)
-    elif frequency == 'Weekly':
-        next_date = current_date + relativedelta(weeks=1)
-    elif frequency == 'Biweekly':
-        next_date = current_date + relativedelta(weeks=1)
-    elif frequency == 'Monthly':
-        next_date = current_date + relativedelta(months=1)
-    elif frequency == 'Quarterly':
-        next_date = current_date + relativedelta(months=3)
-    elif frequency == 'Biannual':
-        next_date = current_date + relativedelta(months=6)
-    elif frequency == 'Annual':
-        next_date = current_date + relativedelta(years=1)
-    else:
-        print("Error getting next date.")
-
-    return next_date
-
-def reset_budgets(app):
+def reset_budgets(app, batch_size=BATCH_SIZE, time_zones=None, should_continue=None):
     """
     Reset budgets for all users where the reset is due.
 
+    Due categories are found per local date, not per user, and are pushed forward
+    with one UPDATE per (next_date, time_period) group in each chunk. Every chunk
+    is committed on its own so the write lock is only held briefly, and the scan
+    repeats until nothing is due, so categories that missed several periods
+    catch up in a single run.
+
     Args:
         app: The Flask application instance.
+        batch_size (int, optional): Number of categories updated per transaction.
+        time_zones (iterable, optional): Only reset budgets of users in these time zones.
+        should_continue (callable, optional): Checked before each chunk, the job stops once it returns False.
     """
     with app.app_context():
-        now_utc = datetime.now(pytz.utc)
-        categories = BudgetCategory.query.filter_by(auto_reset=True).all()
-        
-        for category in categories:
-            user = User.query.get(category.user_id)
-            user_timezone = pytz.timezone(user.time_zone)
-            user_now = user_timezone.localize(now_utc.replace(tzinfo=None))
-            
-            if category.next_date <= user_now.date():
-                category.remaining_amount = category.budget_amount
-                category.last_reset = category.next_date
-                category.next_date = get_next_date(category.next_date, category.time_period)
-        
-        db.session.commit()
-
-def add_auto_transactions(app):
+        now_utc = datetime.now(timezone.utc)
+        if time_zones is None:
+            time_zones = db.session.execute(
+                select(User.time_zone).distinct()
+                .join(BudgetCategory, BudgetCategory.user_id == User.id)
+                .where(BudgetCategory.auto_reset == True)
+            ).scalars().all()
+
+        for local_date, zones in get_local_dates(time_zones, now_utc).items():
+            due = (
+                select(BudgetCategory.id, BudgetCategory.user_id, BudgetCategory.next_date, BudgetCategory.time_period)
+                .where(
+                    BudgetCategory.auto_reset == True,
+                    BudgetCategory.next_date <= local_date,
+                    BudgetCategory.time_period.in_(FREQUENCIES),
+                    BudgetCategory.user_id.in_(select(User.id).where(User.time_zone.in_(zones))),
+                )
+                .order_by(BudgetCategory.id)
+                .limit(batch_size)
+            )
+
+            while True:
+                if should_continue is not None and not should_continue():
+                    return
+                rows = db.session.execute(due).all()
+                if not rows:
+                    break
+
+                groups = {}
+                for row in rows:
+                    groups.setdefault((row.next_date, row.time_period), []).append(row.id)
+
+                # One step forward for every group at once
+                keys = list(groups)
+                next_dates = to_dates(next_occurrences([key[0] for key in keys], [key[1] for key in keys]))
+
+                for ((next_date, time_period), ids), following in zip(groups.items(), next_dates):
+                    db.session.execute(
+                        update(BudgetCategory)
+                        .where(BudgetCategory.id.in_(ids))
+                        .values(
+                            remaining_amount=BudgetCategory.budget_amount,
+                            last_reset=next_date,
+                            next_date=following,
+                        )
+                        .execution_options(synchronize_session=False)
+                    )
+                bump_data_versions(row.user_id for row in rows)
+                db.session.commit()
+
+def dialect_insert(model):
+    """
+    Build an INSERT for model in the current backend's dialect, which supports ON CONFLICT.
+
+    Args:
+        model: The model class to insert into.
+
+    Returns:
+        An insert statement for the current database backend.
+    """
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(model)
+
+def insert_ignoring_duplicates(model, index_elements, index_where=None):
+    """
+    Build an INSERT for model that skips rows violating the given unique key.
+
+    Args:
+        model: The model class to insert into.
+        index_elements (list): Column names of the unique constraint.
+        index_where (optional): The WHERE clause of a partial unique index.
+
+    Returns:
+        An insert statement for the current database backend.
+    """
+    return dialect_insert(model).on_conflict_do_nothing(index_elements=index_elements, index_where=index_where)
+
+def add_auto_transactions(app, batch_size=BATCH_SIZE, time_zones=None, should_continue=None):
     """
     Add automatic transactions for all subscriptions with auto_add_transaction enabled.
 
+    Subscriptions are streamed in id order, batch_size at a time. For each chunk
+    every overdue occurrence is posted with batched multi-row INSERTs, account balances
+    are moved with one UPDATE ... CASE, and payment dates are advanced with
+    another. The unique (subscription_id, date) index over auto-posted rows
+    makes posting idempotent: if two runs overlap, the second one inserts
+    nothing and only the rows it actually inserted count towards balances.
+
     Args:
         app: The Flask application instance.
+        batch_size (int, optional): Number of subscriptions handled per transaction.
+        time_zones (iterable, optional): Only post for users in these time zones.
+        should_continue (callable, optional): Checked before each chunk, the job stops once it returns False.
     """
     with app.app_context():
-        now_utc = datetime.now(pytz.utc)
-        subscriptions = Subscription.query.filter_by(auto_add_transaction=True).all()
-        
-        for subscription in subscriptions:
-            user = User.query.get(subscription.user_id)
-            user_timezone = pytz.timezone(user.time_zone)
-            user_now = user_timezone.localize(now_utc.replace(tzinfo=None))
-            
-            if subscription.next_payment_date <= user_now.date():
-                new_transaction = Transaction(
-                    user_id=subscription.user_id,
-                    account_from_id=subscription.account_id,
-                    type='Expense',
-                    amount=subscription.amount,
-                    description=f"Automatic payment for {subscription.name}",
-                    date=subscription.next_payment_date,
-                    subscription_id=subscription.id
+        now_utc = datetime.now(timezone.utc)
+        if time_zones is None:
+            time_zones = db.session.execute(
+                select(User.time_zone).distinct()
+                .join(Subscription, Subscription.user_id == User.id)
+                .where(Subscription.auto_add_transaction == True)
+            ).scalars().all()
+
+        for local_date, zones in get_local_dates(time_zones, now_utc).items():
+            last_id = 0
+            while True:
+                if should_continue is not None and not should_continue():
+                    return
+                subscriptions = db.session.execute(
+                    select(
+                        Subscription.id, Subscription.user_id, Subscription.account_id, Subscription.name,
+                        Subscription.amount, Subscription.frequency, Subscription.next_payment_date,
+                        Subscription.currency,
+                    )
+                    .where(
+                        Subscription.id > last_id,
+                        Subscription.auto_add_transaction == True,
+                        Subscription.next_payment_date <= local_date,
+                        Subscription.frequency.in_(FREQUENCIES),
+                        Subscription.user_id.in_(select(User.id).where(User.time_zone.in_(zones))),
+                    )
+                    .order_by(Subscription.id)
+                    .limit(batch_size)
+                ).all()
+                if not subscriptions:
+                    break
+                last_id = subscriptions[-1].id
+
+                # Every due date of the whole chunk, plus each subscription's next one, in one pass
+                index, due_dates, following = occurrences_until(
+                    [subscription.next_payment_date for subscription in subscriptions],
+                    [subscription.frequency for subscription in subscriptions],
+                    local_date,
+                )
+                new_rows = []
+                last_payment_dates = {}
+                for i, due_date in zip(index.tolist(), to_dates(due_dates)):
+                    subscription = subscriptions[i]
+                    last_payment_dates[subscription.id] = due_date
+                    new_rows.append({
+                        'user_id': subscription.user_id,
+                        'account_from_id': subscription.account_id,
+                        'type': 'Expense',
+                        'amount': subscription.amount,
+                        'description': f"Automatic payment for {subscription.name}",
+                        'date': due_date,
+                        'subscription_id': subscription.id,
+                        'auto_posted': True,
+                        'currency': subscription.currency,
+                    })
+                next_payment_dates = {
+                    subscription.id: next_payment_date
+                    for subscription, next_payment_date in zip(subscriptions, to_dates(following))
+                }
+
+                # Executed as batched multi-row INSERTs, sized to the backend's parameter limit
+                inserted = db.session.execute(
+                    insert_ignoring_duplicates(Transaction, ['subscription_id', 'date'], index_where=Transaction.auto_posted)
+                    .returning(Transaction.user_id, Transaction.account_from_id, Transaction.amount, Transaction.date),
+                    new_rows
+                ).all()
+
+                # Sum what was actually posted per account and per rollup bucket
+                account_deltas = {}
+                rollup_deltas = {}
+                for row in inserted:
+                    if row.account_from_id:
+                        account_deltas[row.account_from_id] = account_deltas.get(row.account_from_id, 0) - row.amount
+                    key = (row.user_id, month_start(row.date), row.account_from_id)
+                    amount, count = rollup_deltas.get(key, (0, 0))
+                    rollup_deltas[key] = (amount + row.amount, count + 1)
+
+                apply_balance_deltas(account_deltas)  # Spans many users, so no user_id filter
+                for (user_id, month, account_id), (amount, count) in rollup_deltas.items():
+                    apply_rollup_delta(user_id, month, 'Expense', amount, account_id=account_id, count=count)
+
+                db.session.execute(
+                    update(Subscription)
+                    .where(Subscription.id.in_(next_payment_dates))
+                    .values(
+                        last_payment_date=case(last_payment_dates, value=Subscription.id),
+                        next_payment_date=case(next_payment_dates, value=Subscription.id),
+                    )
+                    .execution_options(synchronize_session=False)
                 )
-                db.session.add(new_transaction)
-                account_from = Account.query.get(subscription.account_id)
-                if account_from:
-                    account_from.current_balance -= subscription.amount
-                subscription.last_payment_date = subscription.next_payment_date
-                subscription.next_payment_date = get_next_date(subscription.next_payment_date, subscription.frequency)
-
-        db.session.commit()
+                bump_data_versions(row.user_id for row in inserted)
+                db.session.commit()
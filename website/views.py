@@ -1,36 +1,45 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for
+from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify, Response, stream_with_context, abort, current_app
 from flask_login import login_required, current_user
 from datetime import datetime
-from dateutil.relativedelta import relativedelta
-from .models import User, Account, Transaction, BudgetCategory, Subscription, Loan, Debt, CreditCard
+from types import SimpleNamespace
+from .models import User, Account, Transaction, BudgetCategory, MonthlyRollup, Subscription, Loan, Debt, CreditCard, CreditCardPayment, CreditCardStatement, LoanPayment, DebtPayment
+from .money import Money
+from .dashboard import load_dashboard_data
+from .summary import get_period_summary, get_user_today, PERIODS, DEFAULT_PERIOD
+from .cache import cached_page, get_data_version, invalidate_user
+from .timezones import timezone_options
+from .recurrence import next_date, to_dates, FREQUENCY_STEPS
+from .ledger import post_transaction
+from .forecast import forecast_cash_flow, DEFAULT_HORIZON_MONTHS
+from .payoff import load_payoff_debts, plan_payoff, sweep_budgets, MAX_BUDGET_LEVELS
+from .amortization import get_amortization_summaries, get_schedule, invalidate_schedule, reconcile_payments, SCHEDULE_COLUMNS
+from .transactions import get_transactions_page, parse_transaction_filters
+from .notifications import count_unread, get_notifications_page, mark_read
+from .imports import import_transactions as run_import
+from .exports import generate_export, EXPORTS, EXPORT_FORMATS
 from website import db
-import pytz
+from sqlalchemy import select, update, delete, func, literal
+import numpy as np
+import math
 
 views = Blueprint('views', __name__)
 
 # Helper functions
 def get_user_data():
-    user_id = current_user.id
-    data = {
-        'accounts': Account.query.filter_by(user_id=user_id).all(),
-        'transactions': Transaction.query.filter_by(user_id=user_id).order_by(Transaction.date.desc()).limit(5).all(),
-        'budget_categories': BudgetCategory.query.filter_by(user_id=user_id).all(),
-        'subscriptions': Subscription.query.filter_by(user_id=user_id).all(),
-        'loans': Loan.query.filter_by(user_id=user_id).all(),
-        'debts': Debt.query.filter_by(user_id=user_id).all(),
-        'credit_cards': CreditCard.query.filter_by(user_id=user_id).all(),
-    }
-    return data
+    return load_dashboard_data(current_user.id)
 
 def calculate_total_balance(accounts):
     return sum(account.current_balance or 0 for account in accounts)
 
 def parse_float(value, field_name):
     try:
-        return float(value)
+        number = float(value)
     except (ValueError, TypeError):
+        number = None
+    if number is None or not math.isfinite(number):  # float() takes 'nan' and 'inf'
         flash(f"{field_name} must be a valid number.", category='error')
         return None
+    return number
 
 def parse_date(date_str):
     try:
@@ -43,37 +52,139 @@ def parse_date(date_str):
 @views.route('/', methods=['GET'])
 @login_required
 def dashboard():
-    data = get_user_data()
-    total_balance = calculate_total_balance(data['accounts'])
-    labels = [category.name for category in data['budget_categories']]
-    remaining_amounts = [category.remaining_amount for category in data['budget_categories']]
-    budget_amounts = [category.budget_amount for category in data['budget_categories']]
-
-    # Calculate summary
-    total_income = sum(t.amount for t in data['transactions'] if t.type == 'Income')
-    total_expenses = sum(t.amount for t in data['transactions'] if t.type == 'Expense')
-    net_balance = total_income - total_expenses
-    summary = {
-        'total_income': total_income,
-        'total_expenses': total_expenses,
-        'net_balance': net_balance
-    }
-
-    return render_template(
-        "dashboard.html", 
-        total_balance=total_balance, 
-        labels=labels, 
-        remaining_amounts=remaining_amounts, 
-        budget_amounts=budget_amounts, 
-        summary=summary,
-        **data
-    )
+    period = request.args.get('period')
+    if period not in PERIODS:
+        period = DEFAULT_PERIOD
+    today = get_user_today(current_user.time_zone)
+
+    def render():
+        data = get_user_data()
+        total_balance = calculate_total_balance(data['accounts'])
+        labels = [category.name for category in data['budget_categories']]
+        remaining_amounts = [category.remaining_amount for category in data['budget_categories']]
+        budget_amounts = [category.budget_amount for category in data['budget_categories']]
+
+        # Calculate summary
+        summary = get_period_summary(current_user.id, period=period, today=today)
+        amortization = get_amortization_summaries(current_user.id, today)
+
+        return render_template(
+            "dashboard.html", 
+            total_balance=total_balance, 
+            labels=labels, 
+            remaining_amounts=remaining_amounts, 
+            budget_amounts=budget_amounts, 
+            summary=summary,
+            amortization=amortization,
+            **data
+        )
+
+    # Same user, data version, day and period means the same page
+    version = get_data_version(current_user.id)
+    return cached_page(f'dashboard:{current_user.id}:{version}:{today.isoformat()}:{period}', render)
+
+@views.route('/api/cache-stats', methods=['GET'])
+@login_required
+def cache_stats():
+    # Process-wide counters, not per user, so they are opt-in for debugging
+    if not current_app.config['CACHE_STATS_ENABLED']:
+        abort(404)
+    # Counters are per process, so this shows the worker that served the request
+    stats = {'user_cache': current_app.extensions['user_cache'].stats()}
+    response_cache = current_app.extensions['response_cache']
+    if hasattr(response_cache, 'stats'):
+        stats['response_cache'] = response_cache.stats()
+    return jsonify(stats)
+
+@views.route('/api/forecast', methods=['GET'])
+@login_required
+def cash_flow_forecast():
+    months = request.args.get('months', DEFAULT_HORIZON_MONTHS, type=int)
+    forecast = forecast_cash_flow(current_user.id, months=months, time_zone=current_user.time_zone)
+    return jsonify({
+        'dates': [day.isoformat() for day in to_dates(forecast['dates'])],
+        'balance': forecast['balance'].round(2).tolist(),
+        'flows': {source: flow.round(2).tolist() for source, flow in forecast['flows'].items()},
+        'starting_balance': forecast['starting_balance'],
+        'lowest_date': forecast['lowest_date'].isoformat(),
+        'lowest_balance': round(forecast['lowest_balance'], 2),
+    })
+
+@views.route('/api/amortization/<kind>/<int:id>', methods=['GET'])
+@login_required
+def amortization_schedule(kind, id):
+    models = {'loan': (Loan, LoanPayment, LoanPayment.loan_id), 'debt': (Debt, DebtPayment, DebtPayment.debt_id)}
+    if kind not in models:
+        abort(404)
+    model, payment_model, parent_id = models[kind]
+    row = db.session.execute(
+        select(model.amount, model.interest_rate, model.start_date, model.end_date)
+        .where(model.id == id, model.user_id == current_user.id)
+    ).first()
+    if row is None:
+        abort(404)
+    if row.start_date is None or row.end_date is None:
+        return jsonify({'error': 'Start and end dates are needed for a schedule.'}), 400
+
+    paid = db.session.execute(
+        select(func.coalesce(func.sum(payment_model.amount), 0)).where(parent_id == id)
+    ).scalar()
+    schedule = get_schedule(row.amount, row.interest_rate, row.start_date, row.end_date)
+    reconciliation = reconcile_payments(schedule, row.amount, float(paid or 0), get_user_today(current_user.time_zone))
+    columns = {column: schedule[column].tolist() for column in SCHEDULE_COLUMNS}
+    columns['dates'] = [day.isoformat() for day in to_dates(schedule['dates'])]
+    return jsonify({
+        'schedule': columns,
+        'reconciliation': {
+            key: value.isoformat() if key == 'next_due_date' and value else value
+            for key, value in vars(reconciliation).items()
+        },
+    })
+
+def _payoff_options():
+    custom_order = [key for key in request.args.get('order', '').split(',') if key]
+    return request.args.get('strategy', 'avalanche'), custom_order
+
+@views.route('/api/payoff', methods=['GET'])
+@login_required
+def payoff_plan():
+    strategy, custom_order = _payoff_options()
+    budget = request.args.get('budget', type=float)
+    if budget is None or budget <= 0:
+        return jsonify({'error': 'A positive monthly budget is required.'}), 400
+    today = get_user_today(current_user.time_zone)
+    try:
+        plan = plan_payoff(load_payoff_debts(current_user.id, today), budget, today, strategy, custom_order)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    plan['payoff_date'] = plan['payoff_date'] and plan['payoff_date'].isoformat()
+    for debt in plan['debts']:
+        debt['payoff_date'] = debt['payoff_date'] and debt['payoff_date'].isoformat()
+    for month in plan['schedule']:
+        month['date'] = month['date'].isoformat()
+    return jsonify(plan)
+
+@views.route('/api/payoff/sweep', methods=['GET'])
+@login_required
+def payoff_sweep():
+    strategy, custom_order = _payoff_options()
+    debts = load_payoff_debts(current_user.id, get_user_today(current_user.time_zone))
+    # Defaults span from just the minimums to clearing everything in one month
+    low = request.args.get('min', type=float) or max(sum(debt.minimum for debt in debts), 1)
+    high = request.args.get('max', type=float) or max(sum(debt.balance for debt in debts), low)
+    levels = request.args.get('levels', 100, type=int)
+    if levels < 1 or levels > MAX_BUDGET_LEVELS or low <= 0 or high < low:
+        return jsonify({'error': f'Use 1 to {MAX_BUDGET_LEVELS} levels between a positive min and a max above it.'}), 400
+    try:
+        return jsonify(sweep_budgets(debts, np.linspace(low, high, levels), strategy, custom_order))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
 @views.route('/user-settings', methods=['GET'])
 @login_required
 def user_settings():
-    timezones = pytz.all_timezones
-    return render_template("user-settings.html", current_user=current_user, timezones=timezones)
+    return render_template("user-settings.html", current_user=current_user,
+                           timezone_options=timezone_options(current_user.time_zone))
 
 @views.route('/update-profile', methods=['POST'])
 @login_required
@@ -87,13 +198,16 @@ def update_profile():
         currency = request.form.get('currency')
 
         try:
-            current_user.name_prefix = name_prefix
-            current_user.first_name = first_name
-            current_user.last_name = last_name
-            current_user.email = email
-            current_user.time_zone = timezone
-            current_user.currency = currency
+            # current_user is a cached read-only record, change the real row
+            user = db.session.get(User, current_user.id)
+            user.name_prefix = name_prefix
+            user.first_name = first_name
+            user.last_name = last_name
+            user.email = email
+            user.time_zone = timezone
+            user.currency = currency
             db.session.commit()
+            invalidate_user(user.id)
             flash("Profile updated successfully!", category='success')
         except Exception as e:
             flash(f"An error occurred: {str(e)}", category='error')
@@ -191,20 +305,8 @@ def add_budget_category():
         else:
             if auto_reset:
                 last_date = None
-                if time_period == "Daily":
-                    last_date = next_reset_date - relativedelta(days=1)
-                elif time_period == "Weekly":
-                    last_date = next_reset_date - relativedelta(weeks=1)
-                elif time_period == "Biweekly":
-                    last_date = next_reset_date - relativedelta(weeks=2)
-                elif time_period == "Monthly":
-                    last_date = next_reset_date - relativedelta(months=1)
-                elif time_period == "Quarterly":
-                    last_date = next_reset_date - relativedelta(months=3)
-                elif time_period == "Biannual":
-                    last_date = next_reset_date - relativedelta(months=6)
-                elif time_period == "Annual":
-                    last_date = next_reset_date - relativedelta(years=1)
+                if time_period in FREQUENCY_STEPS:
+                    last_date = next_date(next_reset_date, time_period, steps=-1)
 
             new_budget_category = BudgetCategory(
                 user_id=current_user.id,
@@ -250,20 +352,8 @@ def update_budget_category(id):
         else:
             last_date = None
             if auto_reset:
-                if time_period == "Daily":
-                    last_date = next_reset_date - relativedelta(days=1)
-                elif time_period == "Weekly":
-                    last_date = next_reset_date - relativedelta(weeks=1)
-                elif time_period == "Biweekly":
-                    last_date = next_reset_date - relativedelta(weeks=2)
-                elif time_period == "Monthly":
-                    last_date = next_reset_date - relativedelta(months=1)
-                elif time_period == "Quarterly":
-                    last_date = next_reset_date - relativedelta(months=3)
-                elif time_period == "Biannual":
-                    last_date = next_reset_date - relativedelta(months=6)
-                elif time_period == "Annual":
-                    last_date = next_reset_date - relativedelta(years=1)
+                if time_period in FREQUENCY_STEPS:
+                    last_date = next_date(next_reset_date, time_period, steps=-1)
 
             budget_category.name = name
             budget_category.description = description
@@ -292,6 +382,8 @@ def delete_budget_category(id):
         flash("Cannot delete budget category with existing transactions.", category='error')
         return redirect(url_for('views.dashboard'))
 
+    # Rollup rows emptied by deleted transactions still reference the category
+    db.session.execute(delete(MonthlyRollup).where(MonthlyRollup.budget_category_id == budget_category.id))
     db.session.delete(budget_category)
     db.session.commit()
     flash("Budget Category deleted successfully.", category='success')
@@ -321,20 +413,6 @@ def add_transaction():
         elif type == "Transfer" and (not account_from_id or not account_to_id):
             flash("'Account From' and 'Account To' are required fields for Transfer transactions.", category='error')
         else:
-            account_from = Account.query.get(account_from_id) if account_from_id else None
-            account_to = Account.query.get(account_to_id) if account_to_id else None
-            budget_category = BudgetCategory.query.get(budget_category_id) if budget_category_id else None
-
-            if type == "Income":
-                account_to.current_balance += amount
-            elif type == "Expense":
-                account_from.current_balance -= amount
-                if budget_category:
-                    budget_category.remaining_amount -= amount
-            elif type == "Transfer":
-                account_from.current_balance -= amount
-                account_to.current_balance += amount
-
             new_transaction = Transaction(
                 user_id=current_user.id,
                 type=type,
@@ -347,6 +425,7 @@ def add_transaction():
                 subscription_id=subscription_id if subscription_id else None
             )
             db.session.add(new_transaction)
+            post_transaction(new_transaction)
             db.session.commit()
             flash("Transaction added successfully.", category='success')
             return redirect(url_for('views.dashboard'))
@@ -357,6 +436,177 @@ def add_transaction():
     
     return render_template('add-transaction.html', accounts=accounts, budget_categories=budget_categories, subscriptions=subscriptions)
 
+@views.route('/transactions', methods=['GET'])
+@login_required
+def transactions():
+    filters = parse_transaction_filters(request.args)
+    page = get_transactions_page(
+        current_user.id,
+        filters=filters,
+        cursor=request.args.get('cursor'),
+        limit=request.args.get('limit', type=int)
+    )
+
+    accounts = Account.query.filter_by(user_id=current_user.id).all()
+    budget_categories = BudgetCategory.query.filter_by(user_id=current_user.id).all()
+    # Filters without the cursor, for the "Older" and "Newest" links
+    filter_args = {key: value for key, value in request.args.items() if key != 'cursor' and value}
+
+    return render_template(
+        'transactions.html',
+        transactions=page['transactions'],
+        next_cursor=page['next_cursor'],
+        filters=filters,
+        filter_args=filter_args,
+        accounts=accounts,
+        budget_categories=budget_categories
+    )
+
+@views.app_context_processor
+def inject_unread_notifications():
+    # One indexed count per page, for the navbar badge
+    if current_user.is_authenticated:
+        return {'unread_notifications': count_unread(current_user.id)}
+    return {}
+
+@views.route('/notifications', methods=['GET'])
+@login_required
+def notifications():
+    page = get_notifications_page(
+        current_user.id,
+        cursor=request.args.get('cursor'),
+        limit=request.args.get('limit', type=int)
+    )
+    return render_template('notifications.html', notifications=page['notifications'], next_cursor=page['next_cursor'])
+
+@views.route('/notifications/mark-read', methods=['POST'])
+@login_required
+def mark_notifications_read():
+    mark_read(current_user.id)
+    db.session.commit()
+    return redirect(url_for('views.notifications'))
+
+@views.route('/api/notifications', methods=['GET'])
+@login_required
+def notifications_json():
+    page = get_notifications_page(
+        current_user.id,
+        unread_only=request.args.get('unread') in ('1', 'true'),
+        cursor=request.args.get('cursor'),
+        limit=request.args.get('limit', type=int)
+    )
+    return jsonify({
+        'unread': count_unread(current_user.id),
+        'notifications': [
+            {
+                'id': row.id,
+                'kind': row.kind,
+                'message': row.message,
+                'created_on': row.created_on.isoformat() if row.created_on else None,
+                'read': bool(row.read),
+            }
+            for row in page['notifications']
+        ],
+        'next_cursor': page['next_cursor'],
+    })
+
+@views.route('/api/notifications/unread-count', methods=['GET'])
+@login_required
+def notifications_unread_count():
+    return jsonify({'unread': count_unread(current_user.id)})
+
+@views.route('/api/notifications/read', methods=['POST'])
+@login_required
+def notifications_read_json():
+    ids = (request.get_json(silent=True) or {}).get('ids')
+    if ids is not None and (not isinstance(ids, list) or not all(isinstance(id, int) for id in ids)):
+        return jsonify({'error': 'ids must be a list of notification ids.'}), 400
+    marked = mark_read(current_user.id, ids)
+    db.session.commit()
+    return jsonify({'marked': marked, 'unread': count_unread(current_user.id)})
+
+@views.route('/api/transactions', methods=['GET'])
+@login_required
+def transactions_json():
+    page = get_transactions_page(
+        current_user.id,
+        filters=parse_transaction_filters(request.args),
+        cursor=request.args.get('cursor'),
+        limit=request.args.get('limit', type=int)
+    )
+    return jsonify({
+        'transactions': [
+            {
+                'id': row.id,
+                'date': row.date.isoformat(),
+                'description': row.description,
+                'amount': row.amount,
+                'type': row.type,
+                'currency': row.currency,
+                'account_from_id': row.account_from_id,
+                'account_from': row.account_from_name,
+                'account_to_id': row.account_to_id,
+                'account_to': row.account_to_name,
+                'budget_category_id': row.budget_category_id,
+                'budget_category': row.budget_category_name,
+            }
+            for row in page['transactions']
+        ],
+        'next_cursor': page['next_cursor'],
+    })
+
+@views.route('/export/<name>', methods=['GET'])
+@login_required
+def export(name):
+    file_format = request.args.get('format', 'csv')
+    if name not in EXPORTS or file_format not in EXPORT_FORMATS:
+        abort(404)
+
+    compress = request.args.get('compress') == 'gzip'
+    body = generate_export(
+        name,
+        current_user.id,
+        file_format,
+        filters=parse_transaction_filters(request.args),
+        compress=compress
+    )
+
+    filename = f"{name}.{file_format}" + (".gz" if compress else "")
+    mimetype = 'application/gzip' if compress else ('application/json' if file_format == 'json' else 'text/csv')
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
+@views.route('/import-transactions', methods=['GET', 'POST'])
+@login_required
+def import_transactions():
+    if request.method == 'POST':
+        upload = request.files.get('file')
+        account_id = request.form.get('account_id')
+        file_format = request.form.get('format')
+
+        if not upload or not upload.filename:
+            flash("Select a file to import.", category='error')
+        elif account_id and not account_id.isdigit():
+            flash("Select a valid default account.", category='error')
+        elif file_format not in ('csv', 'ofx'):
+            flash("File format must be CSV or OFX.", category='error')
+        else:
+            result = run_import(current_user, upload.stream, file_format, default_account_id=int(account_id) if account_id else None)
+            flash(
+                f"Imported {result['inserted']} of {result['processed']} rows "
+                f"({result['duplicates']} duplicates skipped, {result['error_count']} errors).",
+                category='success' if result['inserted'] or not result['error_count'] else 'error'
+            )
+            for line_number, message in result['errors']:
+                flash(f"Line {line_number}: {message}", category='error')
+            return redirect(url_for('views.transactions'))
+
+    accounts = Account.query.filter_by(user_id=current_user.id).all()
+    return render_template('import-transactions.html', accounts=accounts)
+
 @views.route('/update-transaction/<int:id>', methods=['GET', 'POST'])
 @login_required
 def update_transaction(id):
@@ -364,6 +614,9 @@ def update_transaction(id):
     
     if request.method == 'POST':
         old_data = {
+            'id': transaction.id,
+            'user_id': transaction.user_id,
+            'date': transaction.date,
             'type': transaction.type,
             'amount': transaction.amount,
             'account_from_id': transaction.account_from_id,
@@ -384,14 +637,11 @@ def update_transaction(id):
             return redirect(url_for('views.update_transaction', id=id))
         elif new_type not in ['Income', 'Expense', 'Transfer']:
             flash("Transaction has to be one of these: Income, Expense, Transfer.", category='error')
-
-        # Fetch accounts and budget categories involved
-        old_account_from = Account.query.get(old_data['account_from_id']) if old_data['account_from_id'] else None
-        old_account_to = Account.query.get(old_data['account_to_id']) if old_data['account_to_id'] else None
-        old_budget_category = BudgetCategory.query.get(old_data['budget_category_id']) if old_data['budget_category_id'] else None
-        new_account_from = Account.query.get(new_account_from_id) if new_account_from_id else None
-        new_account_to = Account.query.get(new_account_to_id) if new_account_to_id else None
-        new_budget_category = BudgetCategory.query.get(new_budget_category_id) if new_budget_category_id else None
+            return redirect(url_for('views.update_transaction', id=id))
+        elif new_date is None:
+            if not request.form.get('date'):
+                flash("Date is a required field.", category='error')
+            return redirect(url_for('views.update_transaction', id=id))
 
         if new_type == "Income" and not new_account_to_id:
             flash("'Account To' is a required field for Income transactions.", category='error')
@@ -400,38 +650,21 @@ def update_transaction(id):
         elif new_type == "Transfer" and (not new_account_from_id or not new_account_to_id):
             flash("'Account From' and 'Account To' are required fields for Transfer transactions.", category='error')
         else:
-            # Revert the changes made to the accounts and budget category
-            if old_data['type'] == "Income":
-                old_account_to.current_balance -= old_data['amount']
-            elif old_data['type'] == "Expense":
-                old_account_from.current_balance += old_data['amount']
-                if old_budget_category:
-                    old_budget_category.remaining_amount += old_data['amount']
-            elif old_data['type'] == "Transfer":
-                old_account_from.current_balance += old_data['amount']
-                old_account_to.current_balance -= old_data['amount']
-
-            # Apply the new changes to the accounts and budget category
-            if new_type == "Income":
-                new_account_to.current_balance += new_amount
-            elif new_type == "Expense":
-                new_account_from.current_balance -= new_amount
-                if new_budget_category:
-                    new_budget_category.remaining_amount -= new_amount
-            elif new_type == "Transfer":
-                new_account_from.current_balance -= new_amount
-                new_account_to.current_balance += new_amount
-
-            # Update the transaction with the new data
-            transaction.type = new_type
-            transaction.amount = new_amount
-            transaction.description = new_description
-            transaction.date = new_date
-            transaction.account_from_id = new_account_from_id if new_account_from_id else None
-            transaction.account_to_id = new_account_to_id if new_account_to_id else None
-            transaction.budget_category_id = new_budget_category_id if new_budget_category_id else None
-
             try:
+                # Update the transaction with the new data
+                transaction.type = new_type
+                transaction.amount = new_amount
+                transaction.description = new_description
+                transaction.date = new_date
+                transaction.account_from_id = new_account_from_id if new_account_from_id else None
+                transaction.account_to_id = new_account_to_id if new_account_to_id else None
+                transaction.budget_category_id = new_budget_category_id if new_budget_category_id else None
+
+                # Revert the old version's balances and rollups, then post the new one.
+                # Autoflush can fail here already, so it is inside the try too.
+                post_transaction(SimpleNamespace(**old_data), sign=-1)
+                post_transaction(transaction)
+
                 db.session.commit()
                 flash("Transaction updated successfully.", category='success')
             except Exception as e:
@@ -452,31 +685,26 @@ def update_transaction(id):
         budget_categories=budget_categories
     )
 
-@views.route('/delete-transaction/int:id', methods=['POST'])
+@views.route('/delete-transaction/<int:id>', methods=['POST'])
 @login_required
 def delete_transaction(id):
     transaction = Transaction.query.get_or_404(id)
-    type = transaction.type
-    amount = transaction.amount
-    account_from_id = transaction.account_from_id
-    account_to_id = transaction.account_to_id
-    budget_category_id = transaction.budget_category_id
-
-    if type == "Income":
-        account_to = Account.query.get(account_to_id)
-        account_to.current_balance -= amount
-    elif type == "Expense":
-        account_from = Account.query.get(account_from_id)
-        account_from.current_balance += amount
-        if budget_category_id:
-            budget_category = BudgetCategory.query.get(budget_category_id)
-            budget_category.remaining_amount += amount
-    elif type == "Transfer":
-        account_from = Account.query.get(account_from_id)
-        account_to = Account.query.get(account_to_id)
-        account_from.current_balance += amount
-        account_to.current_balance -= amount
     try:
+        post_transaction(transaction, sign=-1)
+        # A deleted payment was never made, so its record goes and the card owes it again
+        card_payments = db.session.execute(
+            delete(CreditCardPayment).where(CreditCardPayment.transaction_id == transaction.id)
+            .returning(CreditCardPayment.credit_card_id, CreditCardPayment.amount)
+        ).all()
+        for payment in card_payments:
+            db.session.execute(
+                update(CreditCard)
+                .where(CreditCard.id == payment.credit_card_id)
+                .values(current_balance=CreditCard.current_balance + literal(payment.amount, Money()))
+                .execution_options(synchronize_session=False)
+            )
+        db.session.execute(delete(LoanPayment).where(LoanPayment.transaction_id == transaction.id))
+        db.session.execute(delete(DebtPayment).where(DebtPayment.transaction_id == transaction.id))
         db.session.delete(transaction)
         db.session.commit()
         flash("Transaction deleted successfully.", category='success')
@@ -560,6 +788,13 @@ def update_subscription(id):
 @login_required
 def delete_subscription(id):
     subscription = Subscription.query.get_or_404(id)
+    # Past payments stay in the history, unlinked
+    db.session.execute(
+        update(Transaction)
+        .where(Transaction.subscription_id == subscription.id)
+        .values(subscription_id=None, auto_posted=False)
+        .execution_options(synchronize_session=False)
+    )
     db.session.delete(subscription)
     db.session.commit()
     flash("Subscription deleted successfully.", category='success')
@@ -624,6 +859,7 @@ def update_loan(id):
         elif end_date < start_date:
             flash("End date must be after the start date.", category='error')
         else:
+            invalidate_schedule(loan)
             loan.name = name
             loan.amount = amount
             loan.interest_rate = interest_rate
@@ -642,6 +878,9 @@ def update_loan(id):
 @login_required
 def delete_loan(id):
     loan = Loan.query.get_or_404(id)
+    invalidate_schedule(loan)
+    # Payment records go with the loan, the payment transactions stay
+    db.session.execute(delete(LoanPayment).where(LoanPayment.loan_id == loan.id))
     db.session.delete(loan)
     db.session.commit()
     flash("Loan deleted successfully.", category='success')
@@ -704,6 +943,7 @@ def update_debt(id):
         elif end_date < start_date:
             flash("End date must be after the start date.", category='error')
         else:
+            invalidate_schedule(debt)
             debt.name = name
             debt.amount = amount
             debt.interest_rate = interest_rate
@@ -722,6 +962,9 @@ def update_debt(id):
 @login_required
 def delete_debt(id):
     debt = Debt.query.get_or_404(id)
+    invalidate_schedule(debt)
+    # Payment records go with the debt, the payment transactions stay
+    db.session.execute(delete(DebtPayment).where(DebtPayment.debt_id == debt.id))
     db.session.delete(debt)
     db.session.commit()
     flash("Debt deleted successfully.", category='success')
@@ -737,7 +980,7 @@ def add_credit_card():
         interest_rate = parse_float(request.form.get('interest-rate'), "Interest Rate")
         next_statement_due_date = parse_date(request.form.get('statement-due-date'))
         next_min_payment_due_date = parse_date(request.form.get('min-payment-due-date'))
-        billing_days = request.form.get('billing-cycle-days')
+        billing_days = request.form.get('billing-cycle-days', type=int)
 
         if not name or limit is None or current_balance is None or interest_rate is None or next_statement_due_date is None or next_min_payment_due_date is None or billing_days is None:
             flash("All fields are required.", category='error')
@@ -775,17 +1018,22 @@ def add_credit_card():
 @views.route('/update-credit-card/<int:id>', methods=['GET', 'POST'])
 @login_required
 def update_credit_card(id):
-    credit_card = CreditCard.query.get_or_404(id)
+    credit_card = CreditCard.query.filter_by(id=id, user_id=current_user.id).first_or_404()
 
     if request.method == 'POST':
         name = request.form.get('name')
         limit = parse_float(request.form.get('limit'), "Limit")
         current_balance = parse_float(request.form.get('current-balance'), "Current Balance")
         interest_rate = parse_float(request.form.get('interest-rate'), "Interest Rate")
-        due_date = parse_date(request.form.get('due-date'))
-        account_id = request.form.get('account_id')
+        next_statement_due_date = parse_date(request.form.get('statement-due-date'))
+        next_min_payment_due_date = parse_date(request.form.get('min-payment-due-date'))
+        billing_days = request.form.get('billing-cycle-days', type=int)
+        last_closing_date = db.session.execute(
+            select(func.max(CreditCardStatement.closing_date)).where(CreditCardStatement.credit_card_id == credit_card.id)
+        ).scalar()
+        today = get_user_today(current_user.time_zone)
 
-        if not name or limit is None or current_balance is None or interest_rate is None or due_date is None or not account_id:
+        if not name or limit is None or current_balance is None or interest_rate is None or next_statement_due_date is None or next_min_payment_due_date is None or billing_days is None:
             flash("All fields are required.", category='error')
         elif limit <= 0 or limit > 1000000000000.00:
             flash("Credit card limit must be positive and less than 1 Trillion.", category='error')
@@ -793,16 +1041,24 @@ def update_credit_card(id):
             flash("Current balance cannot be negative or exceed the credit card limit.", category='error')
         elif interest_rate < 0 or interest_rate > 100:
             flash("Interest rate must be between 0 and 100.", category='error')
-        elif due_date < datetime.now().date():
-            flash("Due date must be in the future.", category='error')
+        elif next_min_payment_due_date < next_statement_due_date:
+            flash("Minimum payment due date cannot be before the statement due date.", category='error')
+        elif billing_days < 25 or billing_days > 32:
+            flash("Billing days must be between 25 and 32.", category='error')
+        elif last_closing_date is not None and next_statement_due_date <= last_closing_date:
+            flash("Statement due date must be after the latest statement's closing date.", category='error')
+        elif (today - next_statement_due_date).days > billing_days:
+            # Each elapsed cycle would be closed with interest on the next pass
+            flash("Statement due date cannot be more than one billing cycle in the past.", category='error')
         else:
             credit_card.name = name
             credit_card.limit = limit
             credit_card.current_balance = current_balance
             credit_card.interest_rate = interest_rate
-            credit_card.due_date = due_date
-            credit_card.account_id = account_id
-            
+            credit_card.statement_due_date = next_statement_due_date
+            credit_card.minimum_payment_due_date = next_min_payment_due_date
+            credit_card.billing_cycle_days = billing_days
+
             db.session.commit()
             flash("Credit Card updated successfully.", category='success')
             return redirect(url_for('views.dashboard'))
@@ -810,10 +1066,58 @@ def update_credit_card(id):
     accounts = Account.query.filter_by(user_id=current_user.id).all()
     return render_template('update-credit-card.html', credit_card=credit_card, accounts=accounts)
 
+@views.route('/pay-credit-card/<int:id>', methods=['POST'])
+@login_required
+def pay_credit_card(id):
+    credit_card = CreditCard.query.filter_by(id=id, user_id=current_user.id).first_or_404()
+    amount = parse_float(request.form.get('amount'), "Amount")
+    date = parse_date(request.form.get('date'))
+    account_id = request.form.get('account_id', type=int)
+    account = db.session.get(Account, account_id) if account_id else None
+
+    if amount is None or date is None or account is None or account.user_id != current_user.id:
+        flash("Account, amount, and date are required fields.", category='error')
+    elif amount <= 0 or amount > (credit_card.current_balance or 0):
+        flash("Payment must be positive and no more than the card's current balance.", category='error')
+    else:
+        transaction = Transaction(
+            user_id=current_user.id,
+            type='Expense',
+            amount=amount,
+            description=f"Payment to {credit_card.name}",
+            date=date,
+            account_from_id=account_id,
+            currency=credit_card.currency,
+        )
+        db.session.add(transaction)
+        db.session.flush()
+        post_transaction(transaction)
+        db.session.add(CreditCardPayment(
+            user_id=current_user.id,
+            account_id=account_id,
+            credit_card_id=credit_card.id,
+            transaction_id=transaction.id,
+            amount=amount,
+            date=date,
+        ))
+        db.session.execute(
+            update(CreditCard)
+            .where(CreditCard.id == credit_card.id)
+            .values(current_balance=CreditCard.current_balance - literal(amount, Money()))
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        flash("Payment recorded successfully.", category='success')
+        return redirect(url_for('views.dashboard'))
+    return redirect(url_for('views.update_credit_card', id=id))
+
 @views.route('/delete-credit-card/<int:id>', methods=['POST'])
 @login_required
 def delete_credit_card(id):
-    credit_card = CreditCard.query.get_or_404(id)
+    credit_card = CreditCard.query.filter_by(id=id, user_id=current_user.id).first_or_404()
+    # Statements and payment records go with the card, the payment transactions stay
+    db.session.execute(delete(CreditCardStatement).where(CreditCardStatement.credit_card_id == credit_card.id))
+    db.session.execute(delete(CreditCardPayment).where(CreditCardPayment.credit_card_id == credit_card.id))
     db.session.delete(credit_card)
     db.session.commit()
     flash("Credit Card deleted successfully.", category='success')